@@ -0,0 +1,45 @@
+"""Служебные эндпоинты для администраторов (/api/admin) и назначение ролей (flask user-role)."""
+import sys
+import click
+from flask import Blueprint, jsonify
+from cas_pool import cas_pool
+from memory import governor, rss_bytes
+from models import User
+from db_config import write_transaction
+from utils.Auth.auth import login_required, admin_required
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+
+@admin_bp.route('/memory', methods=['GET'])
+@login_required
+@admin_required
+def memory_stats():
+    """Память этого воркера (RSS, кэши sympy и выражений, лимиты) и RSS процессов его CAS-пула."""
+    governor.check()
+    checker = sys.modules.get("checker")
+    return jsonify({
+        "worker": governor.stats(),
+        "expr_cache": checker.expr_cache.stats() if checker is not None else None,
+        "cas_pool": cas_pool.stats(),
+        "cas_workers": [{"pid": pid, "rss_bytes": rss_bytes(pid)} for pid in cas_pool.worker_pids()],
+    })
+
+
+ROLES = ("student", "admin")
+
+
+def init_app(app):
+    app.register_blueprint(admin_bp)
+
+    @app.cli.command("user-role")
+    @click.argument("username")
+    @click.argument("role", type=click.Choice(ROLES))
+    def user_role(username, role):
+        """Назначает роль пользователю (регистрация всегда создаёт студента)."""
+        with write_transaction():
+            user = User.query.filter_by(username=username).first()
+            if user is None:
+                raise click.ClickException(f"Пользователь {username} не найден")
+            user.role = role
+        click.echo(f"{username}: {role}")
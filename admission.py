@@ -0,0 +1,148 @@
+"""
+Допуск к дорогим CAS-эндпоинтам (проверка решений и шагов). В процессе одновременно
+выполняется не больше ADMISSION_MAX_INFLIGHT проверок, ещё ADMISSION_MAX_QUEUE ждут в очереди,
+у одного пользователя — не больше ADMISSION_PER_USER проверок (выполняемых и ожидающих).
+Сверх этого запрос сразу получает 429 с Retry-After, поэтому тяжёлые запросы не занимают
+все потоки воркера, и дешёвые эндпоинты (/api/tasks, вход) обслуживаются без задержки.
+"""
+import math
+import time
+import threading
+from collections import Counter
+from functools import wraps
+from flask import jsonify, g, make_response
+from config import Config
+import metrics
+
+
+class Overloaded(Exception):
+    """Запрос не допущен: reason — user_limit, queue_full или timeout."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    __slots__ = ("controller", "user_id", "started", "released")
+
+    def __init__(self, controller, user_id):
+        self.controller = controller
+        self.user_id = user_id
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+
+class AdmissionController:
+    def __init__(self, max_inflight, max_queue, per_user, queue_timeout):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.per_user = per_user
+        self.queue_timeout = queue_timeout
+        self.inflight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = Counter()
+        self._per_user = Counter()
+        self._cond = threading.Condition()
+        self._avg_seconds = 1.0  # скользящее среднее длительности проверки, для Retry-After
+
+    def _retry_after(self):
+        waves = (self.queued + self.inflight) / max(self.max_inflight, 1)
+        return max(1, math.ceil(waves * self._avg_seconds))
+
+    def _reject(self, reason):
+        self.rejected[reason] += 1
+        metrics.admission_rejections.inc(reason=reason)
+        raise Overloaded(reason, self._retry_after())
+
+    def acquire(self, user_id):
+        """Допускает проверку (при необходимости ждёт в очереди) или бросает Overloaded."""
+        started = time.monotonic()
+        with self._cond:
+            if self.per_user and self._per_user[user_id] >= self.per_user:
+                self._reject("user_limit")
+            if self.inflight >= self.max_inflight and self.queued >= self.max_queue:
+                self._reject("queue_full")
+            self._per_user[user_id] += 1
+            if self.inflight >= self.max_inflight:
+                self.queued += 1
+                deadline = started + self.queue_timeout
+                try:
+                    while self.inflight >= self.max_inflight:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._forget(user_id)
+                            self._reject("timeout")
+                        self._cond.wait(remaining)
+                finally:
+                    self.queued -= 1
+            self.inflight += 1
+            self.admitted += 1
+        metrics.phase_seconds.observe(time.monotonic() - started, phase="admission_wait")
+        return _Ticket(self, user_id)
+
+    def _forget(self, user_id):
+        self._per_user[user_id] -= 1
+        if self._per_user[user_id] <= 0:
+            del self._per_user[user_id]
+
+    def _release(self, ticket):
+        with self._cond:
+            self.inflight -= 1
+            self._forget(ticket.user_id)
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.monotonic() - ticket.started)
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "inflight": self.inflight,
+                "queued": self.queued,
+                "max_inflight": self.max_inflight,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                **{f"rejected_{reason}": count for reason, count in self.rejected.items()},
+            }
+
+
+admission = AdmissionController(
+    max_inflight=Config.ADMISSION_MAX_INFLIGHT,
+    max_queue=Config.ADMISSION_MAX_QUEUE,
+    per_user=Config.ADMISSION_PER_USER,
+    queue_timeout=Config.ADMISSION_QUEUE_TIMEOUT,
+)
+
+
+def admission_required(view):
+    """
+    Пропускает запрос через admission (ставится после login_required). Для потоковых ответов
+    место освобождается, когда ответ закрыт, а не когда view вернул генератор.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            ticket = admission.acquire(g.current_user["id"])
+        except Overloaded as e:
+            response = jsonify({"message": "Слишком много проверок одновременно, повторите позже",
+                                "reason": e.reason, "retry_after": e.retry_after})
+            response.status_code = 429
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response
+        try:
+            response = make_response(view(*args, **kwargs))
+        except BaseException:
+            ticket.release()
+            raise
+        if response.is_streamed:
+            response.call_on_close(ticket.release)
+        else:
+            ticket.release()
+        return response
+    return wrapper
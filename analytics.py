@@ -0,0 +1,263 @@
+"""
+Агрегаты по задачам, студентам, типам ошибок и дням и JSON API дашборда (/api/analytics).
+
+Приращения копятся в StatsDelta и записываются upsert'ом (INSERT ... ON CONFLICT DO UPDATE)
+в той же транзакции, что и сами решения и шаги, поэтому агрегаты согласованы с историей.
+Запросы API читают только агрегаты: их объём зависит от числа задач и дней, а не от числа решений.
+Сводки по задачам, типам ошибок и дням — только для администраторов; студент видит лишь свою статистику.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+import click
+from flask import Blueprint, request, jsonify, g
+from sqlalchemy import select, insert, update, delete, func, case, and_
+from models import db, Task, Solution, Step, TaskStats, StudentStats, ErrorTypeStats, DailyStats
+from db_config import write_transaction
+from utils.Auth.auth import login_required, admin_required
+
+analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
+
+# Таблица агрегатов -> её ключевые колонки
+STATS_KEYS = {
+    TaskStats: ("task_id",),
+    StudentStats: ("user_id",),
+    ErrorTypeStats: ("task_id", "error_type"),
+    DailyStats: ("day", "task_id"),
+}
+DEFAULT_ERROR_TYPE = "ошибка"
+MAX_DAYS = 366
+
+
+def _day(value):
+    if value is None:
+        return datetime.utcnow().date()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])  # SQLite отдаёт date(...) строкой
+
+
+class StatsDelta:
+    """Приращения агрегатов, накопленные в рамках одной транзакции."""
+
+    def __init__(self):
+        self._rows = defaultdict(lambda: defaultdict(int))  # (модель, ключ) -> {колонка: приращение}
+
+    def add(self, model, key, **increments):
+        row = self._rows[(model, key)]
+        for column, value in increments.items():
+            if value:
+                row[column] += value
+
+    def solution(self, task_id, user_id, created_at, status=None, attempts=1, error_types=()):
+        """
+        Решение: попытка (attempts), итоговый статус (completed/error) и ошибочные шаги по типам.
+        Для смены статуса уже учтённого решения передаётся attempts=0.
+        """
+        counts = {
+            "attempts": attempts,
+            "completions": int(status == "completed"),
+            "errors": int(status == "error"),
+        }
+        self.add(TaskStats, (task_id,), error_steps=len(error_types), **counts)
+        self.add(StudentStats, (user_id,), error_steps=len(error_types), **counts)
+        self.add(DailyStats, (_day(created_at), task_id), **counts)
+        for error_type in error_types:
+            self.add(ErrorTypeStats, (task_id, error_type or DEFAULT_ERROR_TYPE), count=1)
+
+    def checked_solution(self, solution, step_rows):
+        """Решение, сохранённое целиком (persistence.build_step_rows)."""
+        error_types = [row["error_type"] for row in step_rows if row["error_type"] is not None]
+        self.solution(solution.task_id, solution.user_id, solution.created_at, solution.status,
+                      error_types=error_types)
+
+    def apply(self, executor=None):
+        """Записывает приращения через executor (сессия или соединение) и очищает их."""
+        executor = executor or db.session
+        dialect = getattr(executor, "dialect", None) or executor.get_bind().dialect
+        grouped = defaultdict(list)
+        for (model, key), increments in self._rows.items():
+            if increments:
+                columns = tuple(sorted(increments))
+                grouped[(model, columns)].append(dict(zip(STATS_KEYS[model], key), **increments))
+        for (model, columns), rows in grouped.items():
+            _upsert(executor, dialect.name, model, columns, rows)
+        self._rows.clear()
+
+
+def _upsert(executor, dialect_name, model, columns, rows):
+    table = model.__table__
+    keys = STATS_KEYS[model]
+    if dialect_name in ("sqlite", "postgresql"):
+        if dialect_name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: table.c[column] + stmt.excluded[column] for column in columns},
+        )
+        executor.execute(stmt, rows)
+        return
+    # Прочие СУБД: UPDATE, а если строки ещё нет — INSERT (запись и так идёт в сериализованной транзакции)
+    for row in rows:
+        result = executor.execute(
+            update(table)
+            .where(and_(*(table.c[key] == row[key] for key in keys)))
+            .values({column: table.c[column] + row[column] for column in columns})
+        )
+        if result.rowcount == 0:
+            executor.execute(insert(table).values(row))
+
+
+def rebuild(executor):
+    """Пересчитывает все агрегаты по solutions и steps: для уже существующих баз и после ручных правок."""
+    for model in STATS_KEYS:
+        executor.execute(delete(model.__table__))
+    delta = StatsDelta()
+    day = func.date(Solution.created_at)
+    solutions = executor.execute(
+        select(Solution.task_id, Solution.user_id, day, func.count(),
+               func.sum(case((Solution.status == "completed", 1), else_=0)),
+               func.sum(case((Solution.status == "error", 1), else_=0)))
+        .group_by(Solution.task_id, Solution.user_id, day)
+    )
+    for task_id, user_id, created, attempts, completions, errors in solutions:
+        counts = {"attempts": attempts, "completions": completions or 0, "errors": errors or 0}
+        delta.add(TaskStats, (task_id,), **counts)
+        delta.add(StudentStats, (user_id,), **counts)
+        if created is not None:
+            delta.add(DailyStats, (_day(created), task_id), **counts)
+    error_steps = executor.execute(
+        select(Solution.task_id, Solution.user_id, Step.error_type, func.count())
+        .join(Step, Step.solution_id == Solution.id)
+        .where(Step.is_correct.is_(False), Step.error_type.isnot(None))
+        .group_by(Solution.task_id, Solution.user_id, Step.error_type)
+    )
+    for task_id, user_id, error_type, count in error_steps:
+        delta.add(TaskStats, (task_id,), error_steps=count)
+        delta.add(StudentStats, (user_id,), error_steps=count)
+        delta.add(ErrorTypeStats, (task_id, error_type or DEFAULT_ERROR_TYPE), count=count)
+    delta.apply(executor)
+
+
+def _rate(part, whole):
+    return round(part / whole, 4) if whole else 0.0
+
+
+def _counts(stats):
+    return {
+        "attempts": stats.attempts,
+        "completions": stats.completions,
+        "errors": stats.errors,
+        "error_steps": stats.error_steps,
+        "error_rate": _rate(stats.errors, stats.attempts),
+        "completion_rate": _rate(stats.completions, stats.attempts),
+    }
+
+
+def _days_param():
+    days = request.args.get("days", 30, type=int)
+    return max(1, min(days or 30, MAX_DAYS))
+
+
+def _daily(days, task_id=None):
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    query = (select(DailyStats.day, func.sum(DailyStats.attempts), func.sum(DailyStats.completions),
+                    func.sum(DailyStats.errors))
+             .where(DailyStats.day >= since)
+             .group_by(DailyStats.day).order_by(DailyStats.day))
+    if task_id is not None:
+        query = query.where(DailyStats.task_id == task_id)
+    return [
+        {"day": _day(day).isoformat(), "attempts": attempts, "completions": completions, "errors": errors}
+        for day, attempts, completions, errors in db.session.execute(query)
+    ]
+
+
+@analytics_bp.route('/tasks', methods=['GET'])
+@login_required
+@admin_required
+def task_overview():
+    """
+    Сводка по всем задачам. ?order=error_rate (по умолчанию) | attempts | completion_rate | error_steps —
+    сортировка по убыванию, ?limit=N — только первые N задач.
+    """
+    order = request.args.get("order", "error_rate")
+    if order not in ("error_rate", "attempts", "completion_rate", "error_steps"):
+        return jsonify({"message": "order: error_rate, attempts, completion_rate или error_steps"}), 400
+    rows = db.session.execute(select(TaskStats, Task.title).join(Task, Task.id == TaskStats.task_id)).all()
+    tasks = [dict(task_id=stats.task_id, title=title, **_counts(stats)) for stats, title in rows]
+    tasks.sort(key=lambda t: (t[order], t["attempts"]), reverse=True)
+    limit = request.args.get("limit", type=int)
+    return jsonify({"tasks": tasks[:limit] if limit else tasks})
+
+
+@analytics_bp.route('/tasks/<int:task_id>', methods=['GET'])
+@login_required
+@admin_required
+def task_details(task_id):
+    """Задача: счётчики, типы ошибок (по убыванию частоты) и активность по дням за ?days=30."""
+    stats = db.session.get(TaskStats, task_id)
+    if stats is None:
+        if db.session.get(Task, task_id) is None:
+            return jsonify({"message": "Task not found"}), 404
+        stats = TaskStats(task_id=task_id, attempts=0, completions=0, errors=0, error_steps=0)
+    error_types = db.session.execute(
+        select(ErrorTypeStats.error_type, ErrorTypeStats.count)
+        .where(ErrorTypeStats.task_id == task_id).order_by(ErrorTypeStats.count.desc())
+    ).all()
+    return jsonify({
+        "task_id": task_id,
+        **_counts(stats),
+        "error_types": [{"error_type": t, "count": c} for t, c in error_types],
+        "daily": _daily(_days_param(), task_id),
+    })
+
+
+@analytics_bp.route('/students/<int:user_id>', methods=['GET'])
+@login_required
+def student_details(user_id):
+    """Успехи студента. Студент видит только себя, администратор — всех."""
+    if user_id != g.current_user["id"] and g.current_user["role"] != "admin":
+        return jsonify({"message": "Forbidden"}), 403
+    stats = db.session.get(StudentStats, user_id)
+    if stats is None:
+        stats = StudentStats(user_id=user_id, attempts=0, completions=0, errors=0, error_steps=0)
+    return jsonify({"user_id": user_id, **_counts(stats)})
+
+
+@analytics_bp.route('/error_types', methods=['GET'])
+@login_required
+@admin_required
+def error_type_overview():
+    """Частота типов ошибок по всем задачам (или по ?task_id=N)."""
+    query = (select(ErrorTypeStats.error_type, func.sum(ErrorTypeStats.count).label("total"))
+             .group_by(ErrorTypeStats.error_type).order_by(func.sum(ErrorTypeStats.count).desc()))
+    task_id = request.args.get("task_id", type=int)
+    if task_id is not None:
+        query = query.where(ErrorTypeStats.task_id == task_id)
+    return jsonify({"error_types": [{"error_type": t, "count": c} for t, c in db.session.execute(query)]})
+
+
+@analytics_bp.route('/daily', methods=['GET'])
+@login_required
+@admin_required
+def daily_overview():
+    """Попытки, решения и ошибки по дням за ?days=30 (по всем задачам или по ?task_id=N)."""
+    return jsonify({"daily": _daily(_days_param(), request.args.get("task_id", type=int))})
+
+
+def init_app(app):
+    app.register_blueprint(analytics_bp)
+
+    @app.cli.command("stats-rebuild")
+    def stats_rebuild():
+        """Пересчитывает таблицы агрегатов по всей истории решений."""
+        with write_transaction():
+            rebuild(db.session)
+        logging.info("Агрегаты пересчитаны")
+        click.echo("Агрегаты пересчитаны")
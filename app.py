@@ -2,26 +2,50 @@ from flask import Flask
 from flask_cors import CORS
 from config import Config
 from models import db
+import db_config
+import migrations
+import metrics
+import warmup
+import analytics
+import chat
+import memory
+import task_import
 from utils.Auth.auth import auth_bp
 from tasks import tasks_bp
 from solutions import solutions_bp
 from reports import reports_bp
+from routes import routes_bp
+import admin
 
 app = Flask(__name__)
 app.config.from_object(Config)
 CORS(app)
 
-db.init_app(app)
+db_config.init_app(app)
 
 # Регистрация Blueprints
 app.register_blueprint(auth_bp)
 app.register_blueprint(tasks_bp)
 app.register_blueprint(solutions_bp)
 app.register_blueprint(reports_bp)
+app.register_blueprint(routes_bp)
 
-# Создание таблиц, если их ещё нет
+migrations.init_app(app)
+admin.init_app(app)
+analytics.init_app(app)
+chat.init_app(app)
+memory.init_app(app)
+task_import.init_app(app)
+metrics.init_app(app)
+warmup.init_app(app)
+
+# Создание таблиц, если их ещё нет, и миграции схемы (индексы и т.п.)
 with app.app_context():
     db.create_all()
+    migrations.run_migrations()
+
+if Config.WARMUP_ENABLED:
+    warmup.warm_up(app)
 
 if __name__ == "__main__":
     # Локально
@@ -0,0 +1,112 @@
+"""
+Сравнение fast_limit.limit_at_infinity с sp.limit на сгенерированном корпусе задач курса:
+(ax+b)/(cx+d), ((ax+b)/(cx+d))^(px+q) (включая случаи 1^∞, когда a = c),
+а также те же выражения в записи студентов: ((a + b/x)/(c + d/x))^(px+q).
+
+Для каждого выражения проверяется совпадение пределов, печатаются время обоих путей,
+ускорение и число выражений, для которых быстрый движок отказался (ушли в sp.limit).
+
+Пример:
+    python benchmarks/limit_bench.py --count 300 --seed 7
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+import sympy as sp
+from sympy.core.cache import clear_cache
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT_DIR)
+
+from fast_limit import limit_at_infinity  # noqa: E402
+from math_parser import parse_math  # noqa: E402
+
+x = sp.Symbol('x')
+
+
+def _nonzero(rng, low, high):
+    value = 0
+    while value == 0:
+        value = rng.randint(low, high)
+    return value
+
+
+def generate_corpus(count, seed):
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        a, c = _nonzero(rng, 1, 9), _nonzero(rng, 1, 9)
+        if i % 4 == 0:
+            c = a  # основание стремится к 1: неопределённость 1^∞
+        b, d = rng.randint(-9, 9), rng.randint(-9, 9)
+        p, q = _nonzero(rng, -5, 5), rng.randint(-5, 5)
+        shape = i % 3
+        if shape == 0:
+            text = f"({a}*x + {b})/({c}*x + {d})"
+        elif shape == 1:
+            text = f"(({a}*x + {b})/({c}*x + {d}))^({p}*x + {q})"
+        else:
+            text = f"(({a} + {b}/x)/({c} + {d}/x))^({p}*x + {q})"
+        corpus.append(text)
+    return corpus
+
+
+def same(a, b):
+    if a == b:
+        return True
+    try:
+        return bool(sp.simplify(a - b) == 0)
+    except Exception:
+        return False
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100.0 * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    expressions = [parse_math(text) for text in generate_corpus(args.count, args.seed)]
+
+    clear_cache()
+    fast_times, fast_values = [], []
+    for expr in expressions:
+        started = time.perf_counter()
+        fast_values.append(limit_at_infinity(expr, x))
+        fast_times.append(time.perf_counter() - started)
+
+    clear_cache()
+    sympy_times, sympy_values = [], []
+    for expr in expressions:
+        started = time.perf_counter()
+        sympy_values.append(sp.limit(expr, x, sp.oo))
+        sympy_times.append(time.perf_counter() - started)
+
+    fallbacks = sum(value is None for value in fast_values)
+    mismatches = [
+        (expr, fast, reference) for expr, fast, reference in zip(expressions, fast_values, sympy_values)
+        if fast is not None and not same(fast, reference)
+    ]
+
+    print(f"Выражений: {len(expressions)} (seed {args.seed})")
+    print(f"{'движок':10} {'всего, с':>10} {'среднее, мс':>12} {'p95, мс':>10}")
+    for name, times in (("fast", fast_times), ("sp.limit", sympy_times)):
+        print(f"{name:10} {sum(times):>10.3f} {sum(times) / len(times) * 1000:>12.2f} {percentile(times, 95) * 1000:>10.2f}")
+    print(f"Ускорение: x{sum(sympy_times) / sum(fast_times):.1f}; отказов быстрого движка: {fallbacks}; "
+          f"расхождений с sp.limit: {len(mismatches)}")
+    for expr, fast, reference in mismatches:
+        print(f"  {expr}: fast={fast}, sp.limit={reference}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Нагрузочный тест HTTP API.
+
+Поднимает приложение на копии SQLite-базы во временном каталоге и прогоняет трафик:
+либо из JSONL-файла (по строке на запрос), либо синтетическую смесь
+(логин, список задач, проверка решений, пошаговая проверка, PDF-отчёты).
+Для каждого эндпоинта считает p50/p95/p99, пропускную способность и долю ошибок
+и сохраняет результат в JSON, чтобы два прогона можно было сравнить.
+
+Формат строки JSONL:
+    {"method": "POST", "path": "/api/solutions/check", "json": {...}, "name": "check", "auth": true}
+
+Примеры:
+    python benchmarks/load_test.py --synthetic 2000 --concurrency 16 --output bench.json
+    python benchmarks/load_test.py --replay traffic.jsonl --compare bench.json
+"""
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT_DIR)
+
+SYNTHETIC_CHAINS = {
+    1: ["((2*x + 3)/(5*x + 7))**(x+1)", "((2 + 3/x)/(5 + 7/x))**(x+1)", "LIMIT", "0"],
+    2: ["((2*x + 1)/(x - 1))**(3*x)", "(2 + 3/(x - 1))**(3*x)", "LIMIT", "oo"],
+    3: ["(2*x + 1)/(x - 1)", "(2 + 1/x)/(1 - 1/x)", "LIMIT", "2"],
+    6: ["((x + 1)/(3*x + 7))**(4*x)", "((1 + 1/x)/(3 + 7/x))**(4*x)", "LIMIT", "0"],
+}
+# Доли операций в синтетической смеси
+SYNTHETIC_MIX = [
+    ("login", 0.05),
+    ("tasks", 0.30),
+    ("check", 0.30),
+    ("check_step", 0.25),
+    ("report", 0.10),
+]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    # Метод ближайшего ранга
+    rank = math.ceil(p / 100.0 * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+def endpoint_name(method, path):
+    route = re.sub(r"/\d+", "/<id>", path.split("?")[0])
+    return f"{method} {route}"
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name, seconds, status):
+        with self._lock:
+            self.latencies[name].append(seconds)
+            self.statuses[name][str(status)] += 1
+            if status is None or status >= 400:
+                self.errors[name] += 1
+
+    def summary(self, elapsed):
+        endpoints = {}
+        total_count = 0
+        total_errors = 0
+        for name, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            count = len(values)
+            total_count += count
+            total_errors += self.errors[name]
+            endpoints[name] = {
+                "count": count,
+                "errors": self.errors[name],
+                "error_rate": round(self.errors[name] / count, 4),
+                "throughput_rps": round(count / elapsed, 2),
+                "mean_ms": round(sum(values) / count * 1000, 2),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "statuses": dict(self.statuses[name]),
+            }
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "requests": total_count,
+            "errors": total_errors,
+            "error_rate": round(total_errors / total_count, 4) if total_count else 0.0,
+            "throughput_rps": round(total_count / elapsed, 2) if elapsed else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+def boot_app(source_db):
+    """Копирует базу во временный каталог и запускает приложение на свободном порту."""
+    workdir = tempfile.mkdtemp(prefix="math_checker_bench_")
+    db_copy = os.path.join(workdir, "math_checker.db")
+    shutil.copyfile(source_db, db_copy)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_copy}"
+    os.environ.setdefault("REPORT_CACHE_DIR", os.path.join(workdir, "reports"))
+
+    from werkzeug.serving import make_server
+    from app import app
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}", workdir
+
+
+class Client:
+    """HTTP-клиент одного виртуального пользователя со своим токеном."""
+
+    def __init__(self, base_url, recorder, username):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.http = requests.Session()
+        self.username = username
+        self.token = None
+
+    def request(self, method, path, name=None, auth=True, **kwargs):
+        headers = kwargs.pop("headers", {})
+        if auth and self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        started = time.perf_counter()
+        status = None
+        response = None
+        try:
+            response = self.http.request(method, self.base_url + path, headers=headers, timeout=120, **kwargs)
+            response.content  # дочитываем тело (важно для потоковых отчётов)
+            status = response.status_code
+        except requests.RequestException:
+            response = None  # сетевая ошибка считается ошибкой со статусом None
+        finally:
+            self.recorder.record(name or endpoint_name(method, path), time.perf_counter() - started, status)
+        return response
+
+    def signup_and_login(self):
+        self.http.post(self.base_url + "/api/auth/signup", json={
+            "firstname": "Bench", "lastname": "User", "username": self.username,
+            "email": f"{self.username}@bench.local", "password": "bench-password",
+        }, timeout=30)
+        self.login()
+
+    def login(self):
+        response = self.request("POST", "/api/auth/login", name="login", auth=False,
+                                json={"username": self.username, "password": "bench-password"})
+        if response is not None and response.ok:
+            self.token = response.json()["token"]
+
+
+def run_synthetic_operation(client, rng):
+    roll = rng.random()
+    for op, weight in SYNTHETIC_MIX:
+        roll -= weight
+        if roll <= 0:
+            break
+    if op == "login":
+        client.login()
+    elif op == "tasks":
+        client.request("GET", "/api/tasks", name="tasks")
+    elif op == "check":
+        task_id, chain = rng.choice(list(SYNTHETIC_CHAINS.items()))
+        client.request("POST", "/api/solutions/check", name="check", json={"taskId": task_id, "steps": chain})
+    elif op == "check_step":
+        task_id, chain = rng.choice(list(SYNTHETIC_CHAINS.items()))
+        response = client.request("POST", f"/api/tasks/{task_id}/start", name="start")
+        if response is None or not response.ok:
+            return
+        solution_id = response.json()["solution_id"]
+        for step in chain:
+            client.request("POST", f"/api/solutions/{solution_id}/check_step", name="check_step",
+                           json={"curr_expr": step})
+    elif op == "report":
+        client.request("POST", "/api/reports/pdf", name="report", json={"task_id": rng.choice(list(SYNTHETIC_CHAINS))})
+
+
+def load_replay(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run(args):
+    boot_started = time.perf_counter()
+    server, base_url, workdir = boot_app(args.db)
+    boot_seconds = time.perf_counter() - boot_started
+    # Время до первого ответа: импорт и прогрев приложения плюс первый (холодный) запрос
+    requests.get(base_url + "/api/tasks", timeout=120)
+    first_response_seconds = time.perf_counter() - boot_started
+
+    recorder = Recorder()
+    clients = [Client(base_url, Recorder(), f"bench_{i}") for i in range(args.concurrency)]
+    for client in clients:
+        client.signup_and_login()
+        client.recorder = recorder  # логины при подготовке в статистику не попадают
+
+    replay = load_replay(args.replay) if args.replay else None
+    total = len(replay) if replay else args.synthetic
+    counter = iter(range(total))
+    counter_lock = threading.Lock()
+
+    def worker(client_index):
+        client = clients[client_index]
+        rng = random.Random(args.seed + client_index)
+        while True:
+            with counter_lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            if replay:
+                item = replay[i]
+                client.request(item.get("method", "GET"), item["path"], name=item.get("name"),
+                               auth=item.get("auth", True), json=item.get("json"))
+            else:
+                run_synthetic_operation(client, rng)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(worker, range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    server.shutdown()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        "meta": {
+            "source": args.replay or "synthetic",
+            "operations": total,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "boot_s": round(boot_seconds, 3),
+            "time_to_first_response_s": round(first_response_seconds, 3),
+        },
+        **recorder.summary(elapsed),
+    }
+    return result
+
+
+def compare(current, baseline, max_regression):
+    """Печатает сравнение p95 по эндпоинтам; возвращает список регрессий."""
+    regressions = []
+    print(f"{'endpoint':40} {'base p95':>10} {'new p95':>10} {'delta':>8}")
+    for name, stats in current["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base:
+            continue
+        delta = (stats["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+        print(f"{name:40} {base['p95_ms']:>10} {stats['p95_ms']:>10} {delta:>+8.1%}")
+        if delta > max_regression or stats["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replay", help="JSONL-файл с запросами для воспроизведения")
+    parser.add_argument("--synthetic", type=int, default=1000, help="число операций синтетической смеси")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", default=os.path.join(ROOT_DIR, "database", "math_checker.db"),
+                        help="исходная база (копируется, сама не меняется)")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="допустимый относительный рост p95 при сравнении")
+    args = parser.parse_args()
+
+    result = run(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print(f"{'endpoint':40} {'count':>7} {'err%':>6} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, stats in result["endpoints"].items():
+        print(f"{name:40} {stats['count']:>7} {stats['error_rate'] * 100:>6.1f} {stats['throughput_rps']:>8} "
+              f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}")
+    print(f"Старт приложения: {result['meta']['boot_s']} с, первый ответ через "
+          f"{result['meta']['time_to_first_response_s']} с")
+    print(f"Итого: {result['requests']} запросов за {result['elapsed_s']} с, {result['throughput_rps']} rps, "
+          f"ошибок {result['error_rate']:.1%}. Результат: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.max_regression)
+        if regressions:
+            print("Регрессии:", ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Сравнение скорости разбора выражений: math_parser.parse_math против прежнего пути
+(str.replace для e^{ и \\ln, затем sp.sympify). Замеряется только разбор, без simplify.
+
+Корпус — шаги из таблицы steps и выражения задач из базы, а также (необязательно) файл:
+по выражению на строку или JSONL с полем "steps" (как запросы /api/solutions/check).
+
+Примеры:
+    python benchmarks/parse_bench.py
+    python benchmarks/parse_bench.py --corpus steps.jsonl --repeat 20
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+
+import sympy as sp
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT_DIR)
+
+from math_parser import parse_math  # noqa: E402
+
+
+def legacy_sympify(expr):
+    expr = expr.replace("e^{", "exp(").replace(r"\ln", "log")
+    return sp.sympify(expr)
+
+
+def load_db_corpus(db_path):
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        steps = [row[0] for row in conn.execute("SELECT input_expr FROM steps")]
+        for expression, expected_limit in conn.execute("SELECT expression, expected_limit FROM tasks"):
+            steps.extend([expression, expected_limit])
+    finally:
+        conn.close()
+    return steps
+
+
+def load_file_corpus(path):
+    expressions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                expressions.extend(json.loads(line).get("steps", []))
+            else:
+                expressions.append(line)
+    return expressions
+
+
+def time_parser(parse, corpus, repeat):
+    """Возвращает (лучшее время прохода по корпусу, результаты разбора или исключения)."""
+    results = []
+    for expr in corpus:
+        try:
+            results.append(parse(expr))
+        except Exception as e:
+            results.append(e)
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for expr in corpus:
+            try:
+                parse(expr)
+            except Exception:
+                pass
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def agree(a, b):
+    if sp.srepr(a) == sp.srepr(b):
+        return True
+    try:
+        return sp.simplify(a - b) == 0
+    except Exception:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.path.join(ROOT_DIR, "database", "math_checker.db"))
+    parser.add_argument("--corpus", help="файл с выражениями (строки или JSONL с полем steps)")
+    parser.add_argument("--repeat", type=int, default=10, help="число проходов; берётся лучший")
+    args = parser.parse_args()
+
+    corpus = load_db_corpus(args.db)
+    if args.corpus:
+        corpus.extend(load_file_corpus(args.corpus))
+    corpus = [expr for expr in corpus if expr and expr != "LIMIT"]
+    if not corpus:
+        print("Корпус пуст")
+        return
+
+    legacy_time, legacy_results = time_parser(legacy_sympify, corpus, args.repeat)
+    new_time, new_results = time_parser(parse_math, corpus, args.repeat)
+
+    both = [(a, b) for a, b in zip(legacy_results, new_results)
+            if not isinstance(a, Exception) and not isinstance(b, Exception)]
+    legacy_failed = sum(isinstance(r, Exception) for r in legacy_results)
+    new_failed = sum(isinstance(r, Exception) for r in new_results)
+    agreed = sum(agree(a, b) for a, b in both)
+
+    n = len(corpus)
+    print(f"Выражений: {n} (уникальных {len(set(corpus))}), проходов: {args.repeat}")
+    print(f"{'парсер':12} {'мкс/выраж.':>12} {'ошибок':>8}")
+    print(f"{'sympify':12} {legacy_time / n * 1e6:>12.1f} {legacy_failed:>8}")
+    print(f"{'math_parser':12} {new_time / n * 1e6:>12.1f} {new_failed:>8}")
+    print(f"Ускорение: x{legacy_time / new_time:.1f}; совпадений среди разобранных обоими: {agreed}/{len(both)}")
+    for expr, a, b in zip(corpus, legacy_results, new_results):
+        if isinstance(b, Exception) and not isinstance(a, Exception):
+            print(f"  math_parser не разобрал: {expr!r}: {b}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+import multiprocessing
+from config import Config
+
+
+class CASError(Exception):
+    """Ошибка при выполнении операции в CAS-процессе."""
+
+
+class CASTimeout(CASError):
+    """Операция не уложилась в отведённое время (или свободный процесс не дождались)."""
+
+
+def _worker_main(conn, warm_expressions=(), warm_plans=()):
+    """
+    Цикл рабочего процесса: sympy и checker импортируются один раз при старте
+    (и прогреваются, включая выражения и планы проверки задач), затем процесс выполняет операции,
+    присланные по каналу.
+    """
+    import checker
+    import memory
+
+    governor = memory.cas_worker_governor()
+    operations = {
+        "compare_steps": checker.compare_steps,
+        "compare_with_canonical": checker.compare_with_canonical,
+        "canonicalize": checker.canonicalize,
+        "evaluate_limit": checker.evaluate_limit,
+        "evaluate_task_limit": checker.evaluate_task_limit,
+        "validate_task": checker.validate_task,
+        "check_algebraic_step": checker.check_algebraic_step,
+        "check_limit": checker.check_limit,
+        "step_fingerprints": checker.step_fingerprints,
+        "step_key": checker.step_key,
+    }
+    checker.warm_up(warm_expressions, warm_plans)
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None:
+            break
+        op, args = message
+        try:
+            result = operations[op](*args)
+        except Exception as e:
+            conn.send(("error", str(e)))
+            continue
+        if governor.maybe_check():
+            # Бюджет памяти превышен: результат отдаётся с пометкой, пул заменит процесс
+            conn.send(("recycle", result))
+            break
+        conn.send(("ok", result))
+
+
+class _Worker:
+    def __init__(self, ctx, warm_expressions=(), warm_plans=()):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, tuple(warm_expressions), tuple(warm_plans)), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self, timeout):
+        if not self.conn.poll(timeout):
+            return False
+        status, _ = self.conn.recv()
+        self.ready = status == "ready"
+        return self.ready
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(timeout=1)
+        except Exception:
+            pass
+        self.conn.close()
+
+
+class CASPool:
+    """
+    Пул заранее прогретых процессов для тяжёлых вызовов sympy.
+    Каждая операция выполняется с жёстким таймаутом; зависший процесс убивается
+    и заменяется новым в фоне, а вызывающий получает CASTimeout.
+    Процесс, который не запустился, перезапускается с паузой (spawn_backoff, удваивается)
+    до spawn_attempts раз; если все попытки неудачны, место в пуле освобождается и занимается
+    снова при следующей операции. Когда в пуле не осталось ни живых, ни запускаемых
+    процессов, run() сразу бросает CASError, а не ждёт CAS_QUEUE_TIMEOUT.
+    Если size == 0, операции выполняются прямо в текущем потоке без таймаута.
+    """
+
+    def __init__(self, size=2, start_method="spawn", startup_timeout=60, spawn_attempts=3, spawn_backoff=1.0):
+        self.size = size
+        self.start_method = start_method
+        self.startup_timeout = startup_timeout
+        self.spawn_attempts = spawn_attempts
+        self.spawn_backoff = spawn_backoff
+        self._pid = None
+        self._lock = threading.Lock()
+        self._idle = None
+        self._workers = set()
+        self._starting = 0  # места пула, на которые сейчас запускается процесс
+        self.timeouts = 0
+        self.respawns = 0
+        self.recycles = 0
+        self.spawn_failures = 0
+        self.warm_expressions = ()  # выражения, которые новые процессы разбирают при старте
+        self.warm_plans = ()  # планы задач (plan_spec), которые новые процессы компилируют при старте
+
+    def start(self):
+        """Запускает процессы пула заранее, не дожидаясь первой операции."""
+        if self.size > 0:
+            self._ensure_started()
+
+    def _ensure_started(self):
+        # Пул принадлежит конкретному процессу: после fork (gunicorn) создаём свой
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._ctx = multiprocessing.get_context(self.start_method)
+            self._idle = queue.Queue()
+            self._workers = set()
+            self._starting = self.size
+            self._pid = os.getpid()
+            for _ in range(self.size):
+                self._start_spawner()
+
+    def _spawn_async(self):
+        with self._lock:
+            self._starting += 1
+        self._start_spawner()
+
+    def _start_spawner(self):
+        threading.Thread(target=self._spawn, daemon=True).start()
+
+    def _spawn(self):
+        """Запускает процесс на одно место пула, повторяя неудачные запуски с растущей паузой."""
+        delay = self.spawn_backoff
+        for attempt in range(1, self.spawn_attempts + 1):
+            worker = None
+            try:
+                worker = _Worker(self._ctx, self.warm_expressions, self.warm_plans)
+                if worker.wait_ready(self.startup_timeout):
+                    with self._lock:
+                        self._starting -= 1
+                        self._workers.add(worker)
+                    self._idle.put(worker)
+                    return
+                logging.error("CAS-процесс %s не запустился (попытка %s из %s)",
+                              worker.process.pid, attempt, self.spawn_attempts)
+            except Exception as e:
+                logging.error("Ошибка запуска CAS-процесса (попытка %s из %s): %s", attempt, self.spawn_attempts, e)
+            if worker is not None:
+                worker.kill()
+            self.spawn_failures += 1
+            if attempt < self.spawn_attempts:
+                time.sleep(delay)
+                delay *= 2
+        with self._lock:
+            self._starting -= 1
+        logging.error("CAS-процесс не запустился за %s попыток; повтор при следующей операции", self.spawn_attempts)
+
+    def _replenish(self):
+        """Снова занимает места, освобождённые после неудачного запуска; без процессов — CASError."""
+        with self._lock:
+            available = len(self._workers) + self._starting
+            missing = self.size - available
+            self._starting += missing
+        for _ in range(missing):
+            self._start_spawner()
+        if not available:
+            raise CASError("В CAS-пуле нет работающих процессов, запуск повторяется")
+
+    def _discard(self, worker):
+        with self._lock:
+            self._workers.discard(worker)
+        worker.kill()
+        self.respawns += 1
+        self._spawn_async()
+
+    def _retire(self, worker):
+        """Плановая замена процесса, который сам завершился после операции (превышен бюджет памяти)."""
+        with self._lock:
+            self._workers.discard(worker)
+        worker.process.join(timeout=1)
+        worker.kill()
+        self.recycles += 1
+        self._spawn_async()
+
+    def run(self, op, *args, timeout=None, queue_timeout=None):
+        """Выполняет операцию checker.<op>(*args) в пуле и возвращает её результат."""
+        if self.size <= 0:
+            import checker
+            return getattr(checker, op)(*args)
+
+        self._ensure_started()
+        self._replenish()
+        timeout = timeout or Config.CAS_STEP_TIMEOUT
+        queue_timeout = queue_timeout or Config.CAS_QUEUE_TIMEOUT
+        try:
+            worker = self._idle.get(timeout=queue_timeout)
+        except queue.Empty:
+            self.timeouts += 1
+            raise CASTimeout(f"Нет свободного CAS-процесса в течение {queue_timeout} с")
+
+        try:
+            worker.conn.send((op, args))
+            if not worker.conn.poll(timeout):
+                self.timeouts += 1
+                logging.warning("CAS-операция %s превысила %s с, процесс %s будет перезапущен",
+                                op, timeout, worker.process.pid)
+                self._discard(worker)
+                raise CASTimeout(f"Превышено время вычисления ({timeout} с)")
+            status, payload = worker.conn.recv()
+        except CASTimeout:
+            raise
+        except (EOFError, OSError) as e:
+            self._discard(worker)
+            raise CASError(f"CAS-процесс завершился аварийно: {e}")
+
+        if status == "recycle":
+            self._retire(worker)
+            status = "ok"
+        else:
+            self._idle.put(worker)
+        if status == "error":
+            raise CASError(payload)
+        return payload
+
+    def shutdown(self):
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+            self._pid = None
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except Exception:
+                pass
+            worker.kill()
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "alive": len(self._workers),
+            "starting": self._starting,
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "timeouts": self.timeouts,
+            "respawns": self.respawns,
+            "recycles": self.recycles,
+            "spawn_failures": self.spawn_failures,
+        }
+
+    def worker_pids(self):
+        with self._lock:
+            return [worker.process.pid for worker in self._workers]
+
+
+cas_pool = CASPool(size=Config.CAS_POOL_SIZE, start_method=Config.CAS_START_METHOD,
+                   spawn_attempts=Config.CAS_SPAWN_ATTEMPTS, spawn_backoff=Config.CAS_SPAWN_BACKOFF)
+atexit.register(cas_pool.shutdown)
@@ -0,0 +1,189 @@
+"""
+История чата студента: сообщения только добавляются в таблицу chat_messages,
+история читается страницами от новых к старым (по индексу (user_id, id)).
+Старые сообщения удаляются по сроку хранения и лимиту на пользователя (flask chat-prune).
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+import click
+from flask import Blueprint, request, jsonify, g
+from sqlalchemy import select, delete, update, func
+from config import Config
+from models import db, ChatMessage, Task, User
+from db_config import write_transaction
+from utils.Auth.auth import login_required
+from admission import admission_required
+import hints
+
+chat_bp = Blueprint('chat', __name__, url_prefix='/api/chat')
+
+ROLES = ("user", "assistant")
+
+
+def _message_to_dict(m):
+    return {
+        "id": m.id,
+        "role": m.role,
+        "content": m.content,
+        "task_id": m.task_id,
+        "created_at": m.created_at.isoformat() if m.created_at else None,
+    }
+
+
+def append_messages(user_id, messages, task_id=None):
+    """Добавляет сообщения [(role, content), ...] одной транзакцией; история не перечитывается."""
+    with write_transaction():
+        rows = [ChatMessage(user_id=user_id, role=role, content=content, task_id=task_id)
+                for role, content in messages]
+        db.session.add_all(rows)
+    return rows
+
+
+@chat_bp.route('/messages', methods=['GET'])
+@login_required
+def list_messages():
+    """
+    Страница истории текущего пользователя: ?before=<id> (сообщения старше id), ?limit=N.
+    Сообщения на странице — в хронологическом порядке; next_before — курсор следующей (более
+    старой) страницы или null, если история закончилась.
+    """
+    limit = max(1, min(request.args.get("limit", Config.CHAT_PAGE_SIZE, type=int) or Config.CHAT_PAGE_SIZE,
+                       Config.CHAT_PAGE_MAX))
+    query = select(ChatMessage).where(ChatMessage.user_id == g.current_user["id"])
+    before = request.args.get("before", type=int)
+    if before:
+        query = query.where(ChatMessage.id < before)
+    page = db.session.execute(query.order_by(ChatMessage.id.desc()).limit(limit + 1)).scalars().all()
+    has_more = len(page) > limit
+    page = page[:limit]
+    return jsonify({
+        "messages": [_message_to_dict(m) for m in reversed(page)],
+        "next_before": page[-1].id if has_more else None,
+    })
+
+
+def _content(data, field="content"):
+    content = (data.get(field) or "").strip()
+    if not content:
+        return None, (jsonify({"message": f"{field} is required"}), 400)
+    if len(content) > Config.CHAT_MESSAGE_MAX_CHARS:
+        return None, (jsonify({"message": f"{field} is longer than {Config.CHAT_MESSAGE_MAX_CHARS} characters"}), 400)
+    return content, None
+
+
+@chat_bp.route('/messages', methods=['POST'])
+@login_required
+def post_message():
+    """
+    Добавляет сообщение студента {"content": "...", "task_id": N}. Ответы ассистента
+    в историю пишет только сервер (/hint), поэтому роль всегда "user".
+    """
+    data = request.json or {}
+    content, error_response = _content(data)
+    if error_response:
+        return error_response
+    task_id = data.get("task_id")
+    if task_id is not None and (not isinstance(task_id, int) or db.session.get(Task, task_id) is None):
+        return jsonify({"message": "Task not found"}), 404
+    message, = append_messages(g.current_user["id"], [("user", content)], task_id)
+    return jsonify(_message_to_dict(message)), 201
+
+
+@chat_bp.route('/hint', methods=['POST'])
+@login_required
+@admission_required
+def request_hint():
+    """
+    Подсказка к ошибочному шагу: {"task_id": N, "step": "...", "error_type": "...", "question": "..."}.
+    Подсказка берётся из кэша (hints.get_hint); вопрос и ответ добавляются в историю чата.
+    """
+    data = request.json or {}
+    step, error_response = _content(data, "step")
+    if error_response:
+        return error_response
+    task = db.session.get(Task, data.get("task_id")) if data.get("task_id") else None
+    if task is None:
+        return jsonify({"message": "Task not found"}), 404
+    error_type = data.get("error_type") or "algebraic_error"
+    question = (data.get("question") or "").strip()[:Config.CHAT_MESSAGE_MAX_CHARS] \
+        or f"Где ошибка в шаге {step}?"
+
+    hint, cached = hints.get_hint(task, step, error_type)
+    _, answer = append_messages(g.current_user["id"], [("user", question), ("assistant", hint)], task.id)
+    return jsonify({"hint": hint, "cached": cached, "message": _message_to_dict(answer)})
+
+
+def prune_messages(now=None):
+    """
+    Применяет политику хранения: удаляет сообщения старше CHAT_RETENTION_DAYS и всё, что сверх
+    CHAT_MAX_MESSAGES_PER_USER последних сообщений пользователя. Возвращает число удалённых строк.
+    """
+    now = now or datetime.utcnow()
+    removed = 0
+    with write_transaction():
+        if Config.CHAT_RETENTION_DAYS > 0:
+            cutoff = now - timedelta(days=Config.CHAT_RETENTION_DAYS)
+            removed += db.session.execute(delete(ChatMessage).where(ChatMessage.created_at < cutoff)).rowcount
+        cap = Config.CHAT_MAX_MESSAGES_PER_USER
+        if cap > 0:
+            over = db.session.execute(
+                select(ChatMessage.user_id).group_by(ChatMessage.user_id).having(func.count() > cap)
+            ).scalars().all()
+            for user_id in over:
+                # id самого старого из сохраняемых сообщений пользователя
+                oldest_kept = db.session.execute(
+                    select(ChatMessage.id).where(ChatMessage.user_id == user_id)
+                    .order_by(ChatMessage.id.desc()).offset(cap - 1).limit(1)
+                ).scalar()
+                removed += db.session.execute(
+                    delete(ChatMessage).where(ChatMessage.user_id == user_id, ChatMessage.id < oldest_kept)
+                ).rowcount
+    return removed
+
+
+def _legacy_messages(raw):
+    """Сообщения из старого JSON в users.chat_history: список словарей {role, content} или строк."""
+    try:
+        items = json.loads(raw)
+    except (TypeError, ValueError):
+        return [("user", raw)]
+    if isinstance(items, dict):
+        items = items.get("messages", [items])
+    if not isinstance(items, list):
+        return [("user", str(items))]
+    messages = []
+    for item in items:
+        if isinstance(item, dict):
+            role = item.get("role")
+            if role not in ROLES:
+                role = "assistant" if role in ("bot", "model") else "user"
+            content = item.get("content") or item.get("text") or item.get("message") or ""
+        else:
+            role, content = "user", item
+        if content:
+            messages.append((role, str(content)))
+    return messages
+
+
+def import_legacy_history(conn):
+    """Шаг миграции: переносит users.chat_history в chat_messages и очищает старую колонку."""
+    users = conn.execute(select(User.id, User.chat_history).where(User.chat_history.isnot(None),
+                                                                 User.chat_history != "")).all()
+    for user_id, raw in users:
+        rows = [{"user_id": user_id, "role": role, "content": content, "created_at": datetime.utcnow()}
+                for role, content in _legacy_messages(raw)]
+        if rows:
+            conn.execute(ChatMessage.__table__.insert(), rows)
+    if users:
+        conn.execute(update(User.__table__).where(User.id.in_([u for u, _ in users])).values(chat_history=None))
+        logging.info("История чата перенесена для %s пользователей", len(users))
+
+
+def init_app(app):
+    app.register_blueprint(chat_bp)
+
+    @app.cli.command("chat-prune")
+    def chat_prune():
+        """Удаляет сообщения чата по сроку хранения и лимиту на пользователя."""
+        click.echo(f"Удалено сообщений: {prune_messages()}")
@@ -1,46 +1,330 @@
+import sys
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 import sympy as sp
+from config import Config
+from expr_cache import ExpressionCache
+from math_parser import parse_math, parse_limit_var
+from fast_limit import compute_limit, limit_at
+import fingerprint as fp
+from numeric_check import compile_numeric, numeric_compare, DIFFERENT, PLAUSIBLE
+
+# Общий кэш разобранных выражений для checker и solutions
+expr_cache = ExpressionCache(
+    max_entries=Config.EXPR_CACHE_MAX_ENTRIES,
+    max_bytes=Config.EXPR_CACHE_MAX_BYTES,
+    enabled=Config.EXPR_CACHE_ENABLED,
+)
 
 def safe_sympify(expr):
-    """Безопасное преобразование выражения в sympy-формат."""
+    """
+    Безопасное преобразование выражения в sympy-формат: собственный разбор (math_parser)
+    обычной записи и подмножества LaTeX, без eval.
+    """
     try:
         if expr == "LIMIT":
             # Если приходит LIMIT, сразу возвращаем что-то
             # Но лучше вообще не передавать его как expr :)
             return sp.Integer(0)  # заглушка
-        expr = expr.replace("e^{", "exp(").replace(r"\ln", "log")
-        return sp.sympify(expr)
+        return parse_math(expr)
     except Exception as e:
         raise ValueError(f"Ошибка преобразования выражения '{expr}': {e}")
 
+def normalize_expr_text(expr):
+    """Нормализует текст шага: обрезает края и схлопывает последовательности пробелов."""
+    return " ".join(expr.split())
+
+class ParsedExpression:
+    """Разобранное выражение: исходное, упрощённое (вычисляется лениво) и каноническая строка."""
+    __slots__ = ("expr", "_simplified", "_canonical", "_numeric", "_fingerprint")
+
+    def __init__(self, expr):
+        self.expr = expr
+        self._simplified = None
+        self._canonical = None
+        self._numeric = False  # None означает «не компилируется»
+        self._fingerprint = False  # None означает «отпечаток не вычисляется»
+
+    @property
+    def simplified(self):
+        if self._simplified is None:
+            self._simplified = sp.simplify(self.expr)
+        return self._simplified
+
+    @property
+    def canonical(self):
+        if self._canonical is None:
+            self._canonical = sp.srepr(self.simplified)
+        return self._canonical
+
+    @property
+    def numeric(self):
+        """Векторизованная NumPy-функция для числовой предпроверки (см. numeric_check)."""
+        if self._numeric is False:
+            self._numeric = compile_numeric(self.expr)
+        return self._numeric
+
+    @property
+    def fingerprint(self):
+        """Отпечаток эквивалентности (см. fingerprint.py)."""
+        if self._fingerprint is False:
+            self._fingerprint = fp.fingerprint(self.expr)
+        return self._fingerprint
+
+def _parsed_sizeof(key, parsed):
+    # Грубая оценка: дерево sympy занимает в несколько раз больше своей строковой записи
+    return sys.getsizeof(key) + 4 * sys.getsizeof(str(parsed.expr))
+
+def parse_expression(expr_str):
+    """Возвращает ParsedExpression из общего кэша (ключ — нормализованный текст шага)."""
+    key = normalize_expr_text(expr_str)
+    return expr_cache.get_or_create(key, lambda: ParsedExpression(safe_sympify(key)), _parsed_sizeof)
+
+class StageStats:
+    """Время по стадиям проверки шага и то, какая стадия вынесла вердикт."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._decided = {}
+        self.total = 0
+
+    def record(self, result):
+        with self._lock:
+            self.total += 1
+            for stage, seconds in result.get("timings", {}).items():
+                calls, total = self._stages.get(stage, (0, 0.0))
+                self._stages[stage] = (calls + 1, total + seconds)
+            decided_by = result.get("decided_by")
+            if decided_by:
+                self._decided[decided_by] = self._decided.get(decided_by, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checks": self.total,
+                "stages": {
+                    stage: {"calls": calls, "total_ms": round(total * 1000, 3),
+                            "avg_ms": round(total * 1000 / calls, 3) if calls else 0.0}
+                    for stage, (calls, total) in self._stages.items()
+                },
+                "decided_by": {
+                    stage: {"count": count, "share": round(count / self.total, 4)}
+                    for stage, count in self._decided.items()
+                },
+            }
+
+stage_stats = StageStats()
+
+def parse_canonical(canonical):
+    """
+    Восстанавливает уже упрощённое выражение по канонической строке (srepr).
+    Это дешёвый разбор без повторного simplify; результат тоже хранится в общем кэше.
+    """
+    def build():
+        expr = sp.sympify(canonical)
+        parsed = ParsedExpression(expr)
+        parsed._simplified = expr
+        parsed._canonical = canonical
+        return parsed
+    return expr_cache.get_or_create("\0srepr:" + canonical, build, _parsed_sizeof)
+
+def step_fingerprint(expr_str):
+    """Отпечаток шага или None (в том числе для выражений, которые не разбираются)."""
+    try:
+        return parse_expression(expr_str).fingerprint
+    except Exception:
+        return None
+
+def step_fingerprints(steps):
+    """
+    Отпечатки списка шагов по порядку. Разбор и вычисление в точках зависят от ввода студента,
+    поэтому вызывается только как операция CAS-пула (с таймаутом), а не в процессе веб-сервера.
+    """
+    return [step_fingerprint(step) for step in steps]
+
+def step_key(expr_str):
+    """
+    Каноническая форма шага для ключа кэша подсказок (операция CAS-пула): отпечаток
+    эквивалентности, иначе хэш дерева разбора; None — шаг не разбирается.
+    """
+    fingerprint = step_fingerprint(expr_str)
+    if fingerprint:
+        return fingerprint
+    try:
+        tree = sp.srepr(parse_expression(expr_str).expr)
+    except Exception:
+        return None
+    return "s:" + hashlib.blake2b(tree.encode("utf-8"), digest_size=16).hexdigest()
+
+def _compare_parsed(prev, curr, timings):
+    started = time.perf_counter()
+    same = fp.compare(prev.fingerprint, curr.fingerprint)
+    timings["fingerprint"] = time.perf_counter() - started
+    # Отпечатки возвращаются вместе с вердиктом: веб-процесс сохраняет их, не разбирая шаги сам
+    fingerprints = {"prev_fingerprint": prev.fingerprint, "curr_fingerprint": curr.fingerprint}
+    if same is not None:
+        # Отпечатки совпали или точно различны — simplify не нужен
+        return {"equivalent": same, "prev": str(prev.expr), "curr": str(curr.expr),
+                "numeric": None, "decided_by": "fingerprint", "timings": timings, **fingerprints}
+
+    started = time.perf_counter()
+    numeric = numeric_compare(prev.numeric, curr.numeric, prev.expr, curr.expr)
+    timings["numeric"] = time.perf_counter() - started
+    if numeric == DIFFERENT:
+        return {"equivalent": False, "prev": str(prev.expr), "curr": str(curr.expr),
+                "numeric": numeric, "decided_by": "numeric", "timings": timings, **fingerprints}
+
+    started = time.perf_counter()
+    prev_sym = prev.simplified
+    curr_sym = curr.simplified
+    timings["simplify"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    # Совпадение канонических форм избавляет от дорогого equals
+    equivalent = prev.canonical == curr.canonical or bool(prev_sym.equals(curr_sym))
+    timings["equivalence"] = time.perf_counter() - started
+    decided_by = "symbolic"
+    if not equivalent and numeric == PLAUSIBLE:
+        # equals не смог доказать равенство, но выражения совпали во всех точках выборки
+        equivalent, decided_by = True, "numeric"
+    return {"equivalent": equivalent, "prev": str(prev_sym), "curr": str(curr_sym),
+            "numeric": numeric, "decided_by": decided_by, "timings": timings, **fingerprints}
+
+def compare_steps(prev_expr_str, curr_expr_str):
+    """
+    Сравнивает два соседних шага полного решения.
+    Сначала сравниваются отпечатки эквивалентности, затем — векторизованная числовая проверка:
+    заведомо разные шаги отсекаются без simplify.
+    Остальные подтверждаются символьно (simplify + equals); если equals не доказал равенство,
+    а числовая проверка совпала во всех точках (PLAUSIBLE), шаги считаются эквивалентными.
+    Этим же сравнением пользуются compare_with_canonical и check_algebraic_step.
+    Возвращает только строки, bool и числа, чтобы результат можно было передать из процесса CAS-пула.
+    """
+    timings = {}
+    started = time.perf_counter()
+    prev = parse_expression(prev_expr_str)
+    curr = parse_expression(curr_expr_str)
+    timings["parse"] = time.perf_counter() - started
+    return _compare_parsed(prev, curr, timings)
+
+def compare_with_canonical(prev_canonical, curr_expr_str):
+    """
+    Сравнивает новый шаг с предыдущим, заданным канонической строкой (см. step_sessions).
+    Предыдущий шаг заново не упрощается; в результат добавляется каноническая форма нового шага,
+    если она уже посчитана (None, когда вердикт вынесли отпечатки).
+    """
+    timings = {}
+    started = time.perf_counter()
+    prev = parse_canonical(prev_canonical)
+    curr = parse_expression(curr_expr_str)
+    timings["parse"] = time.perf_counter() - started
+    result = _compare_parsed(prev, curr, timings)
+    # Каноническая форма — только если уже посчитана: отпечатки могли решить без simplify
+    result["canonical"] = curr._canonical if result["equivalent"] else None
+    return result
+
+def canonicalize(expr_str):
+    """Каноническая строка (srepr упрощённого выражения) для шага."""
+    return parse_expression(expr_str).canonical
+
+def evaluate_limit(last_expr_str, expected_limit_str, answer_str=None):
+    """
+    Вычисляет предел последнего алгебраического шага при x -> ∞ и сравнивает его с ожидаемым.
+    Если передан answer_str и предел верный, дополнительно сверяет окончательный ответ студента.
+    Предел считается быстрым движком (fast_limit), а для выражений вне его семейств — sp.limit
+    от упрощённого выражения; limit_engine в результате говорит, какой путь сработал.
+    """
+    timings = {}
+    x = sp.Symbol('x')
+    started = time.perf_counter()
+    last_parsed = parse_expression(last_expr_str)
+    expected_parsed = parse_expression(expected_limit_str)
+    timings["parse"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    expected_limit = expected_parsed.simplified
+    timings["simplify"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    computed_limit, engine = compute_limit(last_parsed.expr, x, lambda: last_parsed.simplified)
+    timings["limit"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = {
+        "computed": str(computed_limit),
+        "expected": str(expected_limit),
+        "limit_ok": bool(sp.simplify(computed_limit - expected_limit).is_zero),
+        "answer": None,
+        "answer_ok": None,
+        "limit_engine": engine,
+        "timings": timings,
+    }
+    if answer_str is not None and result["limit_ok"]:
+        student_result = parse_expression(answer_str).simplified
+        result["answer"] = str(student_result)
+        result["answer_ok"] = bool(sp.simplify(student_result - computed_limit).is_zero)
+    timings["equivalence"] = time.perf_counter() - started
+    return result
+
+def same_limit(a, b):
+    """Совпадают ли два значения предела (включая ±∞)."""
+    if a == b:
+        return True
+    if a.is_infinite or b.is_infinite:
+        return False
+    try:
+        return bool(sp.simplify(a - b) == 0)
+    except Exception:
+        return False
+
+def reference_limit(expression_str, limit_var="x->∞", expected_limit_str=None):
+    """
+    Эталонный предел выражения задачи по её limitVar (x->∞, x->0+, x->2 и т.п.).
+    Для x -> +∞ используется быстрый движок, иначе sp.limit. Если передан expected_limit_str,
+    "matches" говорит, совпадает ли он с вычисленным.
+    """
+    symbol, point, direction = parse_limit_var(limit_var)
+    value, engine = limit_at(parse_expression(expression_str).expr, symbol, point, direction)
+    result = {"computed": str(value), "limit_engine": engine, "matches": None}
+    if expected_limit_str is not None:
+        result["matches"] = same_limit(value, parse_expression(str(expected_limit_str)).expr)
+    return result
+
 def check_algebraic_step(prev_expr_str, curr_expr_str, tolerance=1e-6):
     try:
         # Если в prev_expr_str = "LIMIT", можно пропустить проверку
         if prev_expr_str == "LIMIT":
             return {"is_correct": True, "error_type": None, "hint": "LIMIT как предыдущий шаг пропущен."}
 
-        prev_expr = sp.simplify(safe_sympify(prev_expr_str))
-        curr_expr = sp.simplify(safe_sympify(curr_expr_str))
-        if prev_expr.equals(curr_expr):
-            return {"is_correct": True, "error_type": None, "hint": ""}
-        # Доп.числовая проверка
-        for val in [1, 2, 3]:
-            if abs(prev_expr.subs({'x': val}) - curr_expr.subs({'x': val})) > tolerance:
-                return {
-                    "is_correct": False,
-                    "error_type": "algebraic_error",
-                    "hint": "Ошибка в алгебраических преобразованиях. Проверьте сокращение или вынесение множителя."
-                }
+        result = compare_steps(prev_expr_str, curr_expr_str)
+        if not result["equivalent"] and result["decided_by"] == "symbolic":
+            # Числовая предпроверка ничего не решила — доп. проверка подстановкой
+            prev_expr = parse_expression(prev_expr_str).simplified
+            curr_expr = parse_expression(curr_expr_str).simplified
+            equivalent = all(abs(prev_expr.subs({'x': val}) - curr_expr.subs({'x': val})) <= tolerance
+                             for val in [1, 2, 3])
+            result.update(equivalent=equivalent, decided_by="fallback")
+        stage_stats.record(result)
+        if not result["equivalent"]:
+            return {
+                "is_correct": False,
+                "error_type": "algebraic_error",
+                "hint": "Ошибка в алгебраических преобразованиях. Проверьте сокращение или вынесение множителя."
+            }
         return {"is_correct": True, "error_type": None, "hint": ""}
     except Exception as e:
         return {"is_correct": False, "error_type": "parse_error", "hint": f"Ошибка парсинга: {str(e)}"}
 
-def check_limit(last_expr_str, expected_limit_str):
+def check_limit(last_expr_str, expected_limit_str, limit_var="x->∞"):
     try:
-        x = sp.Symbol('x')
-        last_expr = safe_sympify(last_expr_str)
-        computed_limit = sp.limit(last_expr, x, sp.oo)
-        expected_limit = safe_sympify(expected_limit_str)
-        if sp.simplify(computed_limit - expected_limit) == 0:
+        x, point, direction = parse_limit_var(limit_var)
+        last_expr = parse_expression(last_expr_str).expr
+        computed_limit, _ = limit_at(last_expr, x, point, direction)
+        expected_limit = parse_expression(expected_limit_str).expr
+        if same_limit(computed_limit, expected_limit):
             return {"is_correct": True, "computed_limit": computed_limit, "error_type": None, "hint": ""}
         else:
             return {
@@ -55,3 +339,124 @@ def check_limit(last_expr_str, expected_limit_str):
             "error_type": "limit_parse_error",
             "hint": f"Ошибка вычисления предела: {str(e)}"
         }
+
+class TaskPlan:
+    """
+    Скомпилированный план проверки задачи: переменная и точка предела из limitVar и
+    упрощённый ожидаемый предел с его числовым значением. Строится один раз на
+    (expression, limitVar, expected_limit); на проверку решения остаются только шаги студента.
+    Исходное выражение задачи в плане не нужно: с ним сравнивается первый шаг, а не предел.
+    """
+    __slots__ = ("spec", "variable", "point", "direction", "expected", "expected_value")
+
+    def __init__(self, expression, limit_var, expected_limit):
+        self.spec = (expression, limit_var, expected_limit)
+        self.variable, self.point, self.direction = parse_limit_var(limit_var)
+        self.expected = parse_expression(str(expected_limit)).simplified
+        self.expected_value = complex(self.expected) if self.expected.is_number and self.expected.is_finite else None
+
+    def matches(self, value):
+        """Совпадает ли значение предела с ожидаемым (сначала по числу, затем символьно)."""
+        if value == self.expected:
+            return True
+        if self.expected_value is not None and value.is_number and value.is_finite:
+            try:
+                if abs(complex(value) - self.expected_value) > 1e-9 * max(1.0, abs(self.expected_value)):
+                    return False
+            except (TypeError, ValueError):
+                pass
+        return same_limit(value, self.expected)
+
+    def evaluate(self, last_expr_str, answer_str=None):
+        """Как evaluate_limit, но в точке и по переменной задачи, с уже готовым ожидаемым пределом."""
+        timings = {}
+        started = time.perf_counter()
+        last_parsed = parse_expression(last_expr_str)
+        timings["parse"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        computed_limit, engine = limit_at(last_parsed.expr, self.variable, self.point, self.direction,
+                                          lambda: last_parsed.simplified)
+        timings["limit"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        result = {
+            "computed": str(computed_limit),
+            "expected": str(self.expected),
+            "limit_ok": self.matches(computed_limit),
+            "answer": None,
+            "answer_ok": None,
+            "limit_engine": engine,
+            "timings": timings,
+        }
+        if answer_str is not None and result["limit_ok"]:
+            student_result = parse_expression(answer_str).simplified
+            result["answer"] = str(student_result)
+            result["answer_ok"] = same_limit(student_result, computed_limit)
+        timings["equivalence"] = time.perf_counter() - started
+        return result
+
+# Планы по (expression, limitVar, expected_limit): изменение задачи даёт новый ключ,
+# поэтому план перестраивается сам, а старый вытесняется по LRU
+_plans = OrderedDict()
+_plans_lock = threading.Lock()
+
+def compile_plan(expression, limit_var, expected_limit):
+    """План проверки задачи из кэша процесса (строится при первом обращении). Ошибки разбора — исключения."""
+    spec = (expression, limit_var, expected_limit)
+    with _plans_lock:
+        plan = _plans.get(spec)
+        if plan is not None:
+            _plans.move_to_end(spec)
+            return plan
+    plan = TaskPlan(*spec)
+    with _plans_lock:
+        _plans[spec] = plan
+        while len(_plans) > Config.TASK_PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    return plan
+
+def clear_plans():
+    with _plans_lock:
+        _plans.clear()
+
+def validate_task(expression, limit_var, expected_limit):
+    """
+    Операция CAS-пула для создания и правки задачи: разбирает выражение и собирает план
+    проверки (он остаётся в кэше процесса). Ошибки разбора — исключения.
+    """
+    parse_expression(str(expression))
+    compile_plan(expression, limit_var, expected_limit)
+    return True
+
+def evaluate_task_limit(spec, last_expr_str, answer_str=None):
+    """Предел последнего шага по плану задачи spec = (expression, limitVar, expected_limit)."""
+    return compile_plan(*spec).evaluate(last_expr_str, answer_str)
+
+def warm_up(expressions=(), plans=()):
+    """
+    Прогрев: первый вызов simplify/limit заметно дороже последующих. Дополнительно
+    разбирает и упрощает переданные выражения (исходные выражения задач и ожидаемые пределы),
+    чтобы они уже лежали в кэше, и компилирует планы задач (plans — их spec).
+    Возвращает число выражений, которые удалось подготовить.
+    """
+    try:
+        compare_steps("(2*x + 1)/(x - 1)", "(2 + 1/x)/(1 - 1/x)")
+        evaluate_limit("((2*x + 3)/(5*x + 7))**(x+1)", "0")
+    except Exception:
+        pass
+    prepared = 0
+    for expr_str in expressions:
+        try:
+            parsed = parse_expression(expr_str)
+            parsed.canonical
+            parsed.numeric
+            prepared += 1
+        except Exception:
+            continue
+    for spec in plans:
+        try:
+            compile_plan(*spec)
+        except Exception:
+            continue
+    return prepared
@@ -1,23 +1,112 @@
 import os
-
-BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-DATABASE_PATH = os.path.join(BASE_DIR, "database", "math_checker.db")
-
-# Используем абсолютный путь
-print("DATABASE_PATH:", DATABASE_PATH)  # 🔹 Вывод пути в консоль
-
-SQLALCHEMY_DATABASE_URI = f"sqlite:///{DATABASE_PATH}"
-SQLALCHEMY_TRACK_MODIFICATIONS = False
-import os
+import logging
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Размер каждого LRU-кэша sympy: sympy читает переменную при импорте, поэтому она задаётся
+# здесь, до него (процессы CAS-пула наследуют окружение). Общий объём кэша — memory.py.
+os.environ.setdefault("SYMPY_CACHE_SIZE", "500")
+
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 DATABASE_PATH = os.path.join(BASE_DIR, "database", "math_checker.db")
+logging.getLogger(__name__).debug("DATABASE_PATH: %s", DATABASE_PATH)
 
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', '23e629b053aeda6ff423b58a99f861cecd1670e05af7bb9ea55757f419e2a0dcdab40e36e772fbf55ef0ba5533527e4360ad2c25b740336049a9d30667ca126c')
-    SQLALCHEMY_DATABASE_URI = f"sqlite:///{DATABASE_PATH}"
+    # DATABASE_URL переключает на серверную БД (postgres://... у Heroku/Railway приводится к postgresql://)
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', f"sqlite:///{DATABASE_PATH}").replace("postgres://", "postgresql://", 1)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     DEBUG = True
+
+    # Соединения с БД (db_config): пул и параметры SQLite (WAL, busy_timeout, кэш страниц)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+    DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '20000'))
+
+    # Кэш разбора/упрощения выражений (checker.parse_expression)
+    EXPR_CACHE_ENABLED = os.getenv('EXPR_CACHE_ENABLED', '1') == '1'
+    EXPR_CACHE_MAX_ENTRIES = int(os.getenv('EXPR_CACHE_MAX_ENTRIES', '4096'))
+    EXPR_CACHE_MAX_BYTES = int(os.getenv('EXPR_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+    # Кэши проверки JWT и пользователей (utils/Auth/auth.login_required)
+    AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '10000'))
+    AUTH_USER_CACHE_SIZE = int(os.getenv('AUTH_USER_CACHE_SIZE', '10000'))
+    AUTH_USER_CACHE_TTL = float(os.getenv('AUTH_USER_CACHE_TTL', '300'))
+    # Как часто (сек) сверять кэш пользователей с версией "users" в data_versions
+    AUTH_USER_VERSION_INTERVAL = float(os.getenv('AUTH_USER_VERSION_INTERVAL', '1'))
+
+    # Снимок каталога задач (tasks.get_catalogue)
+    TASK_CATALOGUE_TTL = float(os.getenv('TASK_CATALOGUE_TTL', '60'))
+    TASK_PAGE_MAX = int(os.getenv('TASK_PAGE_MAX', '100'))
+
+    # Пул процессов для вызовов sympy (cas_pool); 0 — считать прямо в потоке запроса
+    CAS_POOL_SIZE = int(os.getenv('CAS_POOL_SIZE', '2'))
+    CAS_START_METHOD = os.getenv('CAS_START_METHOD', 'spawn')
+    CAS_STEP_TIMEOUT = float(os.getenv('CAS_STEP_TIMEOUT', '5'))
+    CAS_LIMIT_TIMEOUT = float(os.getenv('CAS_LIMIT_TIMEOUT', '10'))
+    CAS_QUEUE_TIMEOUT = float(os.getenv('CAS_QUEUE_TIMEOUT', '30'))
+    # Повторные попытки запуска CAS-процесса: число попыток и начальная пауза (удваивается)
+    CAS_SPAWN_ATTEMPTS = int(os.getenv('CAS_SPAWN_ATTEMPTS', '3'))
+    CAS_SPAWN_BACKOFF = float(os.getenv('CAS_SPAWN_BACKOFF', '1'))
+
+    # Допуск к CAS-эндпоинтам в процессе (admission.py): выполняемые проверки, очередь,
+    # лимит на пользователя и сколько ждать в очереди до 429
+    ADMISSION_MAX_INFLIGHT = int(os.getenv('ADMISSION_MAX_INFLIGHT', str(max(CAS_POOL_SIZE, 1))))
+    ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '4'))
+    ADMISSION_PER_USER = int(os.getenv('ADMISSION_PER_USER', '2'))
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '10'))
+
+    # Пакетный импорт задач (task_import): процессов для пределов (0 — по числу ядер),
+    # время на предел одной задачи и размер импорта
+    IMPORT_PROCESSES = int(os.getenv('IMPORT_PROCESSES', '0'))
+    IMPORT_LIMIT_TIMEOUT = float(os.getenv('IMPORT_LIMIT_TIMEOUT', '10'))
+    IMPORT_MAX_TASKS = int(os.getenv('IMPORT_MAX_TASKS', '5000'))
+
+    # Пакетная проверка /api/solutions/check_batch
+    BATCH_MAX_SUBMISSIONS = int(os.getenv('BATCH_MAX_SUBMISSIONS', '1000'))
+    BATCH_THREADS = int(os.getenv('BATCH_THREADS', '8'))
+
+    # PDF-отчёты: размер порции при чтении, порог выгрузки на диск и кэш готовых файлов
+    REPORT_CHUNK_SIZE = int(os.getenv('REPORT_CHUNK_SIZE', '200'))
+    REPORT_SPOOL_MAX_BYTES = int(os.getenv('REPORT_SPOOL_MAX_BYTES', str(4 * 1024 * 1024)))
+    REPORT_CACHE_ENABLED = os.getenv('REPORT_CACHE_ENABLED', '1') == '1'
+    REPORT_CACHE_DIR = os.getenv('REPORT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'math_checker_reports'))
+    REPORT_CACHE_MAX_FILES = int(os.getenv('REPORT_CACHE_MAX_FILES', '64'))
+    # Выгрузка /api/reports/export: строк в одной порции серверного курсора
+    EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '1000'))
+
+    # Чат (chat.py): размер страницы истории, длина сообщения и срок хранения (0 — без ограничения)
+    CHAT_PAGE_SIZE = int(os.getenv('CHAT_PAGE_SIZE', '50'))
+    CHAT_PAGE_MAX = int(os.getenv('CHAT_PAGE_MAX', '200'))
+    CHAT_MESSAGE_MAX_CHARS = int(os.getenv('CHAT_MESSAGE_MAX_CHARS', '4000'))
+    CHAT_RETENTION_DAYS = int(os.getenv('CHAT_RETENTION_DAYS', '365'))
+    CHAT_MAX_MESSAGES_PER_USER = int(os.getenv('CHAT_MAX_MESSAGES_PER_USER', '5000'))
+
+    # Подсказки (hints.py): gemini, stub или auto (gemini, если задан ключ)
+    HINT_BACKEND = os.getenv('HINT_BACKEND', 'auto')
+    GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
+    HINT_MODEL = os.getenv('HINT_MODEL', 'gemini-1.5-flash')
+    HINT_TIMEOUT = float(os.getenv('HINT_TIMEOUT', '20'))
+
+    # Сессии пошаговой проверки (step_sessions)
+    STEP_SESSION_MAX = int(os.getenv('STEP_SESSION_MAX', '10000'))
+    STEP_SESSION_TTL = int(os.getenv('STEP_SESSION_TTL', '1800'))
+
+    # Контроль памяти (memory.py): кэши очищаются выше мягкого лимита RSS или числа записей
+    # в кэше sympy, выше жёсткого лимита процесс штатно перезапускается (0 — без лимита)
+    MEMORY_SOFT_LIMIT_MB = float(os.getenv('MEMORY_SOFT_LIMIT_MB', '384'))
+    MEMORY_HARD_LIMIT_MB = float(os.getenv('MEMORY_HARD_LIMIT_MB', '512'))
+    CAS_WORKER_MEMORY_LIMIT_MB = float(os.getenv('CAS_WORKER_MEMORY_LIMIT_MB', '384'))
+    SYMPY_CACHE_MAX_ENTRIES = int(os.getenv('SYMPY_CACHE_MAX_ENTRIES', '50000'))
+    MEMORY_CHECK_SECONDS = float(os.getenv('MEMORY_CHECK_SECONDS', '5'))
+
+    # Скомпилированные планы проверки задач (checker.compile_plan) в каждом процессе
+    TASK_PLAN_CACHE_SIZE = int(os.getenv('TASK_PLAN_CACHE_SIZE', '1024'))
+
+    # Прогрев при импорте приложения (с preload_app в gunicorn — в мастере до fork)
+    WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', '1') == '1'
@@ -0,0 +1,102 @@
+import sqlite3
+import threading
+import contextlib
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from config import Config
+from models import db
+
+# Флаг «следующая транзакция в этом потоке — пишущая» для события begin
+_state = threading.local()
+# Запись в SQLite в пределах процесса идёт по одной: потоки ждут на этой блокировке,
+# а не в цикле busy_timeout внутри SQLite. Между процессами очередь держит сама SQLite.
+_write_lock = threading.RLock()
+
+
+def is_sqlite(url):
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def engine_options(url):
+    """Параметры create_engine для SQLite-файла или серверной БД (DATABASE_URL)."""
+    if is_sqlite(url):
+        if make_url(url).database in (None, "", ":memory:"):
+            return {}
+        return {
+            # Соединения SQLite дешёвые, но с WAL и кэшем страниц их выгодно держать открытыми
+            "pool_size": Config.DB_POOL_SIZE,
+            "max_overflow": Config.DB_MAX_OVERFLOW,
+            "pool_timeout": Config.DB_POOL_TIMEOUT,
+            "connect_args": {
+                "timeout": Config.DB_BUSY_TIMEOUT_MS / 1000,
+                "check_same_thread": False,  # соединение переходит между потоками через пул
+            },
+        }
+    return {
+        "pool_size": Config.DB_POOL_SIZE,
+        "max_overflow": Config.DB_MAX_OVERFLOW,
+        "pool_timeout": Config.DB_POOL_TIMEOUT,
+        "pool_recycle": Config.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def _on_connect(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    # Транзакции открываем сами в _on_begin (pysqlite иначе откладывает BEGIN до первой записи)
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    try:
+        # WAL: читатели (отчёты, каталог) не блокируют запись и наоборот
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(Config.DB_BUSY_TIMEOUT_MS)}")
+        # В режиме WAL NORMAL безопасен при сбое процесса; при сбое ОС теряются лишь последние транзакции
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size=-{int(Config.DB_CACHE_SIZE_KB)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+def _on_begin(conn):
+    if conn.dialect.name != "sqlite":
+        return
+    # Пишущая транзакция сразу берёт блокировку записи: иначе читающая транзакция,
+    # решившая писать, получает SQLITE_BUSY без ожидания, если её снимок уже устарел
+    conn.exec_driver_sql("BEGIN IMMEDIATE" if getattr(_state, "write", False) else "BEGIN")
+
+
+@contextlib.contextmanager
+def write_transaction():
+    """
+    Единый путь записи: with write_transaction(): db.session.add(...).
+    Фиксирует изменения при выходе и откатывает при исключении. Для SQLite
+    запись в процессе сериализуется, а транзакция открывается как BEGIN IMMEDIATE.
+    """
+    session = db.session()
+    sqlite = session.get_bind().dialect.name == "sqlite"
+    with _write_lock if sqlite else contextlib.nullcontext():
+        if sqlite and session.in_transaction() and not (session.new or session.dirty or session.deleted):
+            # Завершаем открытую читающую транзакцию, чтобы запись началась с BEGIN IMMEDIATE
+            session.commit()
+        _state.write = True
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            _state.write = False
+
+
+def init_app(app):
+    """Вызывается вместо db.init_app: параметры движка и обработчики соединений."""
+    url = app.config["SQLALCHEMY_DATABASE_URI"]
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(url))
+    db.init_app(app)
+    with app.app_context():
+        engine = db.engine
+        event.listen(engine, "connect", _on_connect)
+        event.listen(engine, "begin", _on_begin)
@@ -0,0 +1,73 @@
+import sys
+import threading
+from collections import OrderedDict
+
+
+class ExpressionCache:
+    """
+    Потокобезопасный LRU-кэш с ограничением по числу записей и по
+    (приблизительному) объёму памяти. Ведёт счётчики попаданий, промахов и вытеснений.
+    """
+
+    def __init__(self, max_entries=4096, max_bytes=32 * 1024 * 1024, enabled=True):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._data = OrderedDict()  # ключ -> (значение, размер)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_create(self, key, factory, sizeof=None):
+        """
+        Возвращает значение по ключу, а при промахе вычисляет его через factory()
+        и сохраняет. Исключения factory не кэшируются.
+        """
+        if not self.enabled:
+            return factory()
+
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            self.misses += 1
+
+        # Вычисляем вне блокировки: simplify может идти долго
+        value = factory()
+        size = sizeof(key, value) if sizeof else sys.getsizeof(key)
+        if size > self.max_bytes:
+            return value
+
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,169 @@
+"""
+Быстрый предел при x -> +∞ для выражений, из которых состоят задачи курса:
+рациональная функция P(x)/Q(x), степень ((ax+b)/(cx+d))^(px+q) (и вообще R(x)^(px+q)
+с рациональным R), exp(R(x)) и произведения таких множителей.
+
+Предел рациональной функции находится по старшим коэффициентам, для степени —
+по пределу основания L, а неопределённость 1^∞ раскрывается по правилу
+lim R^E = exp(lim E·(R - 1)). Для всего остального limit_at_infinity возвращает None,
+и вызывающий код считает предел общим sp.limit.
+"""
+import sympy as sp
+from sympy.polys.polyerrors import PolynomialError
+
+
+def _polys(expr, x):
+    """(P, Q) — числитель и знаменатель рациональной функции от x с числовыми коэффициентами, иначе None."""
+    if not expr.is_rational_function(x):
+        return None
+    num, den = sp.fraction(sp.together(expr))
+    try:
+        P = sp.Poly(num, x)
+        Q = sp.Poly(den, x)
+    except PolynomialError:
+        return None
+    if Q.is_zero or not all(c.is_number and c.is_extended_real for c in P.coeffs() + Q.coeffs()):
+        return None
+    return P, Q
+
+
+def _rational_limit(P, Q):
+    """Предел P/Q при x -> +∞ и знак P/Q для больших x."""
+    if P.is_zero:
+        return sp.S.Zero, 0
+    ratio = P.LC() / Q.LC()
+    sign = 1 if ratio > 0 else -1
+    dp, dq = P.degree(), Q.degree()
+    if dp < dq:
+        return sp.S.Zero, sign
+    if dp == dq:
+        return ratio, sign
+    return sign * sp.oo, sign
+
+
+def _linear(expr, x):
+    """(p, q) для показателя вида p*x + q с числовыми p, q, иначе None."""
+    try:
+        poly = sp.Poly(expr, x)
+    except PolynomialError:
+        return None
+    if poly.degree() > 1 or not all(c.is_number and c.is_extended_real for c in poly.coeffs()):
+        return None
+    coeffs = poly.all_coeffs()
+    return (coeffs[0], coeffs[1]) if len(coeffs) == 2 else (sp.S.Zero, coeffs[0])
+
+
+def _power_limit(base, exponent, x):
+    polys = _polys(base, x)
+    linear = _linear(exponent, x)
+    if polys is None or linear is None:
+        return None
+    P, Q = polys
+    L, sign = _rational_limit(P, Q)
+    p, q = linear
+
+    if p == 0:
+        # Показатель постоянный
+        if L == sp.oo:
+            return sp.oo if q > 0 else (sp.S.Zero if q < 0 else sp.S.One)
+        if L.is_infinite:
+            return None
+        if L > 0 or (L < 0 and q.is_integer):
+            return L ** q
+        if L == 0 and q > 0:
+            return sp.S.Zero
+        return None
+
+    # Показатель стремится к +∞ (p > 0) или к -∞ (p < 0)
+    grows = p > 0
+    if L == sp.oo:
+        return sp.oo if grows else sp.S.Zero
+    if L.is_infinite or L < 0 or (L == 0 and sign < 0):
+        return None  # отрицательное основание в нецелой степени — вне семейства
+    if L == 1:
+        # 1^∞: lim R^E = exp(lim E·(R - 1)), E·(R - 1) = (p*x + q)(P - Q)/Q — снова рациональная функция
+        M, _ = _rational_limit(sp.Poly(p * x + q, x) * (P - Q), Q)
+        return sp.exp(M)
+    if L > 1:
+        return sp.oo if grows else sp.S.Zero
+    return sp.S.Zero if grows else sp.oo
+
+
+def _factor_limit(factor, x):
+    if x not in factor.free_symbols:
+        return factor
+    if isinstance(factor, sp.exp):
+        polys = _polys(factor.args[0], x)
+        return sp.exp(_rational_limit(*polys)[0]) if polys is not None else None
+    if factor.is_Pow and x in factor.exp.free_symbols:
+        return _power_limit(factor.base, factor.exp, x)
+    polys = _polys(factor, x)
+    if polys is not None:
+        return _rational_limit(*polys)[0]
+    if factor.is_Pow:
+        return _power_limit(factor.base, factor.exp, x)
+    return None
+
+
+def limit_at_infinity(expr, x):
+    """Предел expr при x -> +∞ для распознанных семейств; None — выражение вне их."""
+    if expr.free_symbols - {x}:
+        return None
+    if x not in expr.free_symbols:
+        return expr
+    if not expr.is_Mul:
+        return _factor_limit(expr, x)
+
+    # Произведение: все рациональные множители собираются в одну рациональную функцию,
+    # степени и экспоненты считаются по отдельности, затем пределы перемножаются
+    rational = []
+    limits = []
+    for factor in expr.args:
+        if factor.is_rational_function(x):
+            rational.append(factor)
+            continue
+        value = _factor_limit(factor, x)
+        if value is None:
+            return None
+        limits.append(value)
+    if rational:
+        polys = _polys(sp.Mul(*rational), x)
+        if polys is None:
+            return None
+        limits.append(_rational_limit(*polys)[0])
+
+    has_zero = any(value == 0 for value in limits)
+    has_infinity = any(value.is_infinite for value in limits)
+    if has_zero and has_infinity:
+        return None  # неопределённость 0·∞ — пусть разбирается sp.limit
+    return sp.Mul(*limits)
+
+
+def compute_limit(expr, x, simplified=None):
+    """
+    Предел при x -> +∞: сначала limit_at_infinity, при неудаче — sp.limit
+    (от simplified, если передано). Возвращает (значение, "fast" | "sympy").
+    """
+    value = limit_at_infinity(expr, x)
+    if value is not None:
+        return value, "fast"
+    target = simplified() if callable(simplified) else (simplified if simplified is not None else expr)
+    return sp.limit(target, x, sp.oo), "sympy"
+
+
+def limit_at(expr, x, point=sp.oo, direction="+-", simplified=None):
+    """
+    Предел expr при x -> point (direction: "+", "-" или "+-" для конечной точки).
+    При x -> ±∞ сначала пробуется limit_at_infinity (для -∞ — после замены x на -x),
+    иначе sp.limit (от simplified, если передано). Возвращает (значение, "fast" | "sympy").
+    """
+    if point == sp.oo:
+        return compute_limit(expr, x, simplified)
+    if point == -sp.oo:
+        value = limit_at_infinity(expr.subs(x, -x), x)
+        if value is not None:
+            return value, "fast"
+    target = simplified() if callable(simplified) else (simplified if simplified is not None else expr)
+    if point.is_infinite:
+        return sp.limit(target, x, point), "sympy"
+    return sp.limit(target, x, point, direction), "sympy"
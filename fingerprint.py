@@ -0,0 +1,155 @@
+"""
+Отпечаток эквивалентности выражения: значения в фиксированных точках, сжатые в короткую строку.
+Эквивалентные выражения (в любой записи) дают одинаковый отпечаток, поэтому сравнение
+двух шагов сводится к сравнению строк, а по индексу steps.fingerprint можно искать
+уже проверенные ранее формы.
+
+Два режима:
+  "m:" — рациональные выражения (целые и рациональные коэффициенты, степени с целым
+         показателем, в том числе зависящим от x, как в ((2x+3)/(5x+7))^(x+1)) вычисляются
+         точно по модулю большого простого в целых точках. Разные отпечатки означают
+         разные функции; совпадение — эквивалентность с пренебрежимо малой ошибкой.
+  "f:" — всё остальное (exp, log, корни, десятичные дроби) вычисляется с 40 знаками
+         и округляется до 20. Совпадение надёжно, а различие может быть артефактом
+         округления, поэтому оно решения не выносит.
+Если значение в какой-то точке не определено (полюс, комплексное число), отпечатка нет (None).
+"""
+import random
+import hashlib
+from fractions import Fraction
+import sympy as sp
+
+PRIME = 2 ** 61 - 1
+POINTS = 4
+FLOAT_DPS = 40
+FLOAT_DIGITS = 20
+MAX_EXACT_EXPONENT = 64
+
+_int_points = {}
+_float_points = {}
+
+
+class _NotModular(Exception):
+    """Выражение вне рационального класса — считаем в режиме "f"."""
+
+
+class _Undefined(Exception):
+    """Значение в точке не определено."""
+
+
+def _points_for(name):
+    """Точки для переменной name: детерминированы по имени, одинаковы во всех процессах."""
+    points = _int_points.get(name)
+    if points is None:
+        rng = random.Random(f"fingerprint:{name}")
+        points = _int_points[name] = [rng.randint(2 ** 30, 2 ** 40) for _ in range(POINTS)]
+        _float_points[name] = [sp.Rational(rng.randint(1100, 9900), 1000) for _ in range(POINTS)]
+    return points
+
+
+def _exact(expr, values):
+    """Точное значение (Fraction) показателя степени в целой точке."""
+    if expr.is_Integer:
+        return Fraction(int(expr))
+    if expr.is_Rational:
+        return Fraction(int(expr.p), int(expr.q))
+    if expr.is_Symbol:
+        return Fraction(values[expr.name])
+    if expr.is_Add:
+        return sum((_exact(arg, values) for arg in expr.args), Fraction(0))
+    if expr.is_Mul:
+        result = Fraction(1)
+        for arg in expr.args:
+            result *= _exact(arg, values)
+        return result
+    if expr.is_Pow and expr.exp.is_Integer and abs(int(expr.exp)) <= MAX_EXACT_EXPONENT:
+        base = _exact(expr.base, values)
+        if base == 0 and expr.exp < 0:
+            raise _Undefined()
+        return base ** int(expr.exp)
+    raise _NotModular()
+
+
+def _inverse(value):
+    if value % PRIME == 0:
+        raise _Undefined()
+    return pow(value, PRIME - 2, PRIME)
+
+
+def _modular(expr, values):
+    if expr.is_Integer:
+        return int(expr) % PRIME
+    if expr.is_Rational:
+        return int(expr.p) * _inverse(int(expr.q)) % PRIME
+    if expr.is_Symbol:
+        return values[expr.name] % PRIME
+    if expr.is_Add:
+        return sum(_modular(arg, values) for arg in expr.args) % PRIME
+    if expr.is_Mul:
+        result = 1
+        for arg in expr.args:
+            result = result * _modular(arg, values) % PRIME
+        return result
+    if expr.is_Pow:
+        exponent = _exact(expr.exp, values)
+        if exponent.denominator != 1:
+            raise _NotModular()
+        base = _modular(expr.base, values)
+        if base == 0:
+            if exponent <= 0:
+                raise _Undefined()
+            return 0
+        # base^(p-1) = 1 по малой теореме Ферма, поэтому показатель берётся по модулю p-1
+        return pow(base, int(exponent) % (PRIME - 1), PRIME)
+    raise _NotModular()
+
+
+def _digest(mode, values):
+    payload = repr(values).encode("utf-8")
+    return f"{mode}:{hashlib.blake2b(payload, digest_size=12).hexdigest()}"
+
+
+def _float_fingerprint(expr, names):
+    values = []
+    for i in range(POINTS):
+        # evalf с subs считает в числах с плавающей точкой и не строит точных рациональных степеней
+        point = {sp.Symbol(name): _float_points[name][i] for name in names}
+        value = expr.evalf(FLOAT_DPS, subs=point)
+        if not value.is_Number or not value.is_extended_real or not value.is_finite:
+            return None
+        values.append(str(sp.Float(value, FLOAT_DIGITS)))
+    return _digest("f", tuple(values))
+
+
+def fingerprint(expr):
+    """Отпечаток sympy-выражения или None, если его не удалось вычислить."""
+    names = sorted(symbol.name for symbol in expr.free_symbols)
+    for name in names:
+        _points_for(name)
+    try:
+        residues = tuple(
+            _modular(expr, {name: _int_points[name][i] for name in names}) for i in range(POINTS)
+        )
+        return _digest("m", residues)
+    except _Undefined:
+        return None
+    except _NotModular:
+        pass
+    try:
+        return _float_fingerprint(expr, names)
+    except Exception:
+        return None
+
+
+def compare(a, b):
+    """
+    Сравнение отпечатков двух шагов: True — эквивалентны, False — точно различны,
+    None — отпечатки ничего не решают (нет отпечатка, разные режимы или различие в режиме "f").
+    """
+    if a is None or b is None:
+        return None
+    if a == b:
+        return True
+    if a.startswith("m:") and b.startswith("m:"):
+        return False
+    return None
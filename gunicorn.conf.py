@@ -0,0 +1,28 @@
+import os
+import gc
+
+# Приложение импортируется и прогревается в мастере (app.py -> warmup.warm_up),
+# воркеры получают sympy, шрифты и разобранные выражения задач через copy-on-write.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+# Потоки в воркере (gthread): пока проверки ждут CAS-пул, остальные потоки обслуживают дешёвые
+# запросы. Число потоков должно быть больше ADMISSION_MAX_INFLIGHT + ADMISSION_MAX_QUEUE.
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+
+def pre_fork(server, worker):
+    # Объекты мастера уходят в постоянное поколение GC: сборщик в воркерах их не обходит
+    # и не трогает их заголовки, поэтому общие страницы памяти не копируются
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import warmup
+    import memory
+    # Воркер можно штатно перезапустить (SIGTERM) при превышении бюджета памяти
+    memory.governor.recyclable = True
+    if server.cfg.preload_app:
+        from app import app
+        warmup.after_fork(app)
+    else:
+        warmup.after_fork()
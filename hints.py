@@ -0,0 +1,162 @@
+"""
+Подсказки к ошибкам студентов. Подсказку генерирует бэкенд (Gemini через google-generativeai
+или локальная заглушка), и она сохраняется в hint_cache по ключу
+(задача, тип ошибки, каноническая форма шага). Следующие студенты с той же ошибкой
+получают готовую подсказку из кэша, бэкенд вызывается один раз на различную ошибку.
+
+Эквивалентные шаги разных студентов записаны по-разному, поэтому в кэше хранится текст
+без самого шага: вместо него — метка STEP_MARK, в которую при каждом запросе
+подставляется шаг того, кто спрашивает.
+"""
+import hashlib
+import logging
+import threading
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from config import Config
+from models import db, HintCache
+from db_config import write_transaction
+from cas_pool import cas_pool, CASError
+import metrics
+
+STEP_MARK = "[[step]]"
+
+STUB_HINTS = {
+    "algebraic_error": "Шаг «{step}» не равен предыдущему. Проверьте сокращение дроби и вынесение множителя: "
+                       "подставьте любое x в оба выражения и сравните результаты.",
+    "parse_error": "Не удалось разобрать «{step}». Проверьте скобки и знаки операций (умножение — *, степень — ^).",
+    "limit_error": "Предел выражения «{step}» вычислен неверно. Разделите числитель и знаменатель "
+                   "на старшую степень x и перейдите к пределу.",
+    "timeout": "Шаг «{step}» слишком сложен для проверки. Разбейте преобразование на несколько шагов.",
+}
+DEFAULT_STUB_HINT = "Проверьте шаг «{step}»: сравните его с предыдущим и с условием задачи «{expression}»."
+
+
+def _prompt(task, step, error_type):
+    return (
+        "Ты помогаешь студенту, который ищет предел. Дай короткую подсказку (2–3 предложения) "
+        "на русском языке, не называя ответа. Не повторяй шаг студента — вместо него пиши "
+        f"{STEP_MARK}.\n"
+        f"Задача: {task.title}\nВыражение: {task.expression}, {task.limitVar}\n"
+        f"Шаг студента: {step}\nТип ошибки: {error_type}"
+    )
+
+
+class StubHintBackend:
+    """Локальная заглушка: шаблонные подсказки без внешних вызовов (разработка и тесты)."""
+    name = "stub"
+
+    def generate(self, task, step, error_type):
+        template = STUB_HINTS.get(error_type, DEFAULT_STUB_HINT)
+        return template.format(step=STEP_MARK, expression=task.expression)
+
+
+class GeminiHintBackend:
+    name = "gemini"
+
+    def __init__(self, api_key, model_name):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self._model = genai.GenerativeModel(model_name)
+
+    def generate(self, task, step, error_type):
+        response = self._model.generate_content(
+            _prompt(task, step, error_type), request_options={"timeout": Config.HINT_TIMEOUT}
+        )
+        return response.text.strip()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                choice = Config.HINT_BACKEND
+                if choice == "auto":
+                    choice = "gemini" if Config.GEMINI_API_KEY else "stub"
+                _backend = (GeminiHintBackend(Config.GEMINI_API_KEY, Config.HINT_MODEL) if choice == "gemini"
+                            else StubHintBackend())
+    return _backend
+
+
+def set_backend(backend):
+    """Подменяет бэкенд (например, StubHintBackend в тестах). None — снова выбрать по конфигу."""
+    global _backend
+    _backend = backend
+
+
+def _digest(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def step_key(step):
+    """
+    Каноническая форма шага для ключа кэша: отпечаток эквивалентности (одинаков для любых
+    записей одного выражения) или хэш дерева разбора — оба считаются в CAS-пуле с таймаутом
+    (checker.step_key), иначе хэш текста без пробелов.
+    """
+    try:
+        key = cas_pool.run("step_key", step, timeout=Config.CAS_STEP_TIMEOUT)
+    except CASError:
+        key = None
+    return key or "r:" + _digest("".join(step.split()))
+
+
+def _template(hint, step):
+    """Текст подсказки для кэша: шаг студента заменяется меткой STEP_MARK."""
+    for variant in {step, step.strip(), "".join(step.split())}:
+        if variant:
+            hint = hint.replace(variant, STEP_MARK)
+    return hint
+
+
+def render(template, step):
+    """Подсказка для конкретного студента: его шаг на месте STEP_MARK."""
+    return template.replace(STEP_MARK, step)
+
+
+# Полосатые блокировки: одновременные запросы одной и той же подсказки в процессе
+# ждут первого вместо параллельных вызовов бэкенда
+_key_locks = [threading.Lock() for _ in range(64)]
+
+
+def _cached(task_id, error_type, key):
+    return db.session.execute(
+        select(HintCache.hint).where(HintCache.task_id == task_id, HintCache.error_type == error_type,
+                                     HintCache.step_key == key)
+    ).scalar()
+
+
+def get_hint(task, step, error_type):
+    """Подсказка к ошибке error_type в шаге step задачи task. Возвращает (текст, взята ли из кэша)."""
+    key = step_key(step)
+    hint = _cached(task.id, error_type, key)
+    if hint is not None:
+        metrics.hint_requests.inc(source="cache")
+        return render(hint, step), True
+
+    with _key_locks[hash((task.id, error_type, key)) % len(_key_locks)]:
+        hint = _cached(task.id, error_type, key)
+        if hint is not None:
+            metrics.hint_requests.inc(source="cache")
+            return render(hint, step), True
+        backend = get_backend()
+        try:
+            hint = _template(backend.generate(task, step, error_type), step)
+        except Exception as e:
+            # Бэкенд недоступен: шаблонная подсказка, в кэш не попадает
+            logging.error("Ошибка генерации подсказки (%s): %s", backend.name, e)
+            return render(StubHintBackend().generate(task, step, error_type), step), False
+        metrics.hint_requests.inc(source="backend")
+        try:
+            with write_transaction():
+                db.session.add(HintCache(task_id=task.id, error_type=error_type, step_key=key,
+                                         hint=hint, backend=backend.name))
+        except IntegrityError:
+            # Ту же подсказку уже сохранил другой воркер — используем её
+            hint = _cached(task.id, error_type, key) or hint
+    return render(hint, step), False
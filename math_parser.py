@@ -0,0 +1,315 @@
+"""
+Разбор выражений, которые вводят студенты: обычная запись (x^2, 2x, (x+1)/(x-1), ln(x), sqrt(x))
+и подмножество LaTeX (\\frac{a}{b}, \\sqrt{x}, \\sqrt[n]{x}, e^{...}, \\ln x, \\left( \\right), \\cdot).
+
+Дерево sympy строится напрямую из токенов, без eval и без общего sympify.
+
+Степени с числовым основанием и целым показателем sympy вычисляет сразу (10^10^10 — это
+число из десяти миллиардов цифр), поэтому результат больше MAX_POWER_BITS бит отвергается
+ещё при разборе.
+
+Грамматика (по убыванию приоритета связывания):
+    expr    := term (('+' | '-') term)*
+    term    := unary (('*' | '/') unary | <неявное умножение> power)*
+    unary   := ('+' | '-') unary | power
+    power   := primary (('^' | '**') unary)?         — правоассоциативно, -x^2 = -(x^2)
+    primary := число | имя | функция аргумент | '(' expr ')' | '{' expr '}' | '[' expr ']'
+               | \\frac{expr}{expr} | \\sqrt[expr]{expr}
+"""
+import re
+import sympy as sp
+
+
+class ParseError(ValueError):
+    """Выражение не соответствует допустимой грамматике."""
+
+
+# Наибольший размер (в битах) числа, которое может получиться из степени при разборе
+MAX_POWER_BITS = 4096
+
+
+# Однобуквенные имена и известные многобуквенные; остальные слова разбиваются на буквы (2xy = 2*x*y)
+FUNCTIONS = {
+    "exp": sp.exp,
+    "ln": sp.log,
+    "log": sp.log,
+    "sqrt": sp.sqrt,
+    "sin": sp.sin,
+    "cos": sp.cos,
+    "tan": sp.tan,
+    "tg": sp.tan,
+    "cot": sp.cot,
+    "ctg": sp.cot,
+    "arcsin": sp.asin,
+    "arccos": sp.acos,
+    "arctan": sp.atan,
+    "arctg": sp.atan,
+    "sinh": sp.sinh,
+    "cosh": sp.cosh,
+    "tanh": sp.tanh,
+    "abs": sp.Abs,
+}
+CONSTANTS = {
+    "e": sp.E,
+    "E": sp.E,
+    "pi": sp.pi,
+    "oo": sp.oo,
+    "inf": sp.oo,
+    "infty": sp.oo,
+    "infinity": sp.oo,
+}
+# Команды LaTeX, которые ничего не означают для дерева выражения
+IGNORED_COMMANDS = {"left", "right", "displaystyle", "limits", "!", ",", ";", ":", " "}
+OPERATOR_COMMANDS = {"cdot": "*", "times": "*", "div": "/"}
+FRACTION_COMMANDS = {"frac", "dfrac", "tfrac"}
+
+UNICODE_REPLACEMENTS = {
+    "−": "-", "–": "-", "·": "*", "×": "*", "∙": "*", "÷": "/", "∞": "oo", "π": "pi",
+}
+
+_TOKEN_RE = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<number>\d+\.?\d*(?:[eE][+-]?\d+(?![A-Za-z]))?|\.\d+)
+  | (?P<command>\\(?:[A-Za-z]+|[!,;:\ ]))
+  | (?P<name>[A-Za-z]+)
+  | (?P<op>\*\*|[-+*/^(){}\[\]_,|])
+""", re.VERBOSE)
+
+_symbols = {}
+
+
+def _symbol(name):
+    # Те же символы без допущений, что создаёт sympify: канонические формы совпадают
+    symbol = _symbols.get(name)
+    if symbol is None:
+        symbol = _symbols[name] = sp.Symbol(name)
+    return symbol
+
+
+def tokenize(text):
+    """Возвращает список токенов (вид, значение)."""
+    for src, dst in UNICODE_REPLACEMENTS.items():
+        if src in text:
+            text = text.replace(src, dst)
+    tokens = []
+    position = 0
+    length = len(text)
+    while position < length:
+        match = _TOKEN_RE.match(text, position)
+        if match is None:
+            raise ParseError(f"Недопустимый символ {text[position]!r} в позиции {position + 1}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        position = match.end()
+        if kind == "space":
+            continue
+        if kind == "command":
+            name = value[1:]
+            if name in IGNORED_COMMANDS:
+                continue
+            if name in OPERATOR_COMMANDS:
+                tokens.append(("op", OPERATOR_COMMANDS[name]))
+                continue
+            tokens.append(("command", name))
+        elif kind == "name":
+            _split_name(value, tokens)
+        else:
+            tokens.append((kind, value))
+    return tokens
+
+
+def _split_name(word, tokens):
+    """Слово из букв: известное имя целиком, иначе самое длинное известное начало или отдельная буква."""
+    i = 0
+    while i < len(word):
+        for end in range(len(word), i, -1):
+            piece = word[i:end]
+            if piece in FUNCTIONS or piece in CONSTANTS:
+                tokens.append(("name", piece))
+                i = end
+                break
+        else:
+            tokens.append(("name", word[i]))
+            i += 1
+
+
+class _Parser:
+    __slots__ = ("tokens", "pos")
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise ParseError("Неожиданный конец выражения")
+        self.pos += 1
+        return token
+
+    def expect(self, value):
+        kind, got = self.next()
+        if got != value:
+            raise ParseError(f"Ожидалось {value!r}, получено {got!r}")
+
+    def accept(self, value):
+        if self.peek()[1] == value and self.peek()[0] == "op":
+            self.pos += 1
+            return True
+        return False
+
+    def parse(self):
+        if not self.tokens:
+            raise ParseError("Пустое выражение")
+        result = self.expr()
+        if self.pos != len(self.tokens):
+            raise ParseError(f"Лишний токен {self.peek()[1]!r}")
+        return result
+
+    def expr(self):
+        terms = [self.term()]
+        while True:
+            if self.accept("+"):
+                terms.append(self.term())
+            elif self.accept("-"):
+                terms.append(-self.term())
+            else:
+                break
+        return terms[0] if len(terms) == 1 else sp.Add(*terms)
+
+    def term(self):
+        factors = [self.unary()]
+        while True:
+            kind, value = self.peek()
+            if kind == "op" and value == "*":
+                self.pos += 1
+                factors.append(self.unary())
+            elif kind == "op" and value == "/":
+                self.pos += 1
+                factors.append(sp.Pow(self.unary(), -1))
+            elif self._starts_primary(kind, value):
+                factors.append(self.power())
+            else:
+                break
+        return factors[0] if len(factors) == 1 else sp.Mul(*factors)
+
+    @staticmethod
+    def _starts_primary(kind, value):
+        if kind in ("number", "name", "command"):
+            return True
+        return kind == "op" and value in ("(", "{", "[")
+
+    def unary(self):
+        if self.accept("-"):
+            return -self.unary()
+        if self.accept("+"):
+            return self.unary()
+        return self.power()
+
+    def power(self):
+        base = self.primary()
+        if self.accept("^") or self.accept("**"):
+            return _checked_pow(base, self.unary())
+        return base
+
+    def group(self):
+        """Выражение в скобках любого вида; для LaTeX-аргументов — в фигурных."""
+        kind, value = self.next()
+        closing = {"(": ")", "{": "}", "[": "]"}.get(value) if kind == "op" else None
+        if closing is None:
+            raise ParseError(f"Ожидалась скобка, получено {value!r}")
+        result = self.expr()
+        self.expect(closing)
+        return result
+
+    def argument(self):
+        """Аргумент функции: в скобках или без них (\\ln x^2 = ln(x^2))."""
+        kind, value = self.peek()
+        if kind == "op" and value in ("(", "{", "["):
+            return self.group()
+        return self.power()
+
+    def primary(self):
+        kind, value = self.next()
+        if kind == "number":
+            return sp.Float(value) if any(c in value for c in ".eE") else sp.Integer(value)
+        if kind == "op":
+            if value in ("(", "{", "["):
+                self.pos -= 1
+                return self.group()
+            if value == "|":
+                result = self.expr()
+                self.expect("|")
+                return sp.Abs(result)
+            raise ParseError(f"Неожиданный оператор {value!r}")
+        if kind == "command":
+            return self.command(value)
+        # Имя: функция, константа или переменная
+        if value in FUNCTIONS:
+            return self.function(value)
+        if value in CONSTANTS:
+            return CONSTANTS[value]
+        return _symbol(value)
+
+    def function(self, name):
+        if name in ("log", "ln") and self.accept("_"):
+            base = self.argument()
+            return sp.log(self.argument(), base)
+        return FUNCTIONS[name](self.argument())
+
+    def command(self, name):
+        if name in FRACTION_COMMANDS:
+            numerator = self.group()
+            denominator = self.group()
+            return sp.Mul(numerator, sp.Pow(denominator, -1))
+        if name == "sqrt":
+            if self.peek() == ("op", "["):
+                self.pos += 1
+                degree = self.expr()
+                self.expect("]")
+                return _checked_pow(self.argument(), sp.Pow(degree, -1))
+            return sp.sqrt(self.argument())
+        if name in FUNCTIONS:
+            return self.function(name)
+        if name in CONSTANTS:
+            return CONSTANTS[name]
+        raise ParseError(f"Неизвестная команда \\{name}")
+
+
+def _checked_pow(base, exponent):
+    """sp.Pow, но без вычисления огромных чисел: (±p/q)^n при |n|·бит(p, q) > MAX_POWER_BITS — ParseError."""
+    if base.is_Rational and exponent.is_Integer:
+        size = max(abs(base.p), base.q)
+        if size > 1 and abs(int(exponent)) * size.bit_length() > MAX_POWER_BITS:
+            raise ParseError(f"Слишком большое число: {base}^{exponent}")
+    return sp.Pow(base, exponent)
+
+
+def parse_math(text):
+    """Разбирает строку выражения в дерево sympy. Ошибки — ParseError."""
+    return _Parser(tokenize(text)).parse()
+
+
+_LIMIT_VAR_RE = re.compile(r"^\s*([A-Za-z])\s*(?:->|→|\\to\b|\\rightarrow\b)\s*(.+?)\s*$")
+
+
+def parse_limit_var(text):
+    """
+    Разбирает limitVar задачи: "x->∞", "x → -oo", "x->0+", "x->2", "x \\to \\infty".
+    Возвращает (символ, точка, направление): направление "+" или "-" для односторонних
+    пределов ("0+", "0-"), иначе "+-". Ошибки — ParseError.
+    """
+    match = _LIMIT_VAR_RE.match(text or "")
+    if match is None:
+        raise ParseError(f"Ожидалась запись вида x->∞ или x->0+, получено {text!r}")
+    name, target = match.groups()
+    direction = "+-"
+    if len(target) > 1 and target[-1] in "+-":
+        target, direction = target[:-1].strip(), target[-1]
+    point = parse_math(target)
+    if point.free_symbols:
+        raise ParseError(f"Точка предела должна быть числом: {target!r}")
+    return _symbol(name), point, direction
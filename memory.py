@@ -0,0 +1,160 @@
+"""
+Контроль памяти долгоживущих процессов с sympy: воркеров gunicorn и процессов CAS-пула.
+
+Кэш sympy (cacheit) и разобранные выражения растут вместе с числом различных выражений,
+которые видел процесс. MemoryGovernor периодически (не чаще MEMORY_CHECK_SECONDS)
+смотрит RSS и число записей в кэше sympy:
+  * записей больше SYMPY_CACHE_MAX_ENTRIES или RSS выше мягкого лимита — кэши очищаются;
+  * RSS выше жёсткого лимита и после очистки — процесс перезапускается штатно: воркер
+    gunicorn получает SIGTERM, дообрабатывает текущие запросы, и мастер поднимает новый;
+    CAS-процесс возвращает результат текущей операции и пул заменяет его свежим.
+
+Модуль не зависит от Flask: его импортируют и процессы CAS-пула. Эндпоинт — admin.py.
+"""
+import os
+import gc
+import time
+import signal
+import logging
+import threading
+from config import Config
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes(pid=None):
+    """Текущий RSS процесса (Linux: /proc/<pid>/statm); иначе пиковый RSS этого процесса или None."""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        if pid is not None:
+            return None
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return None
+
+
+def sympy_cache_entries():
+    """Число записей во всех кэшах sympy.core.cache (0, если sympy ещё не загружен)."""
+    import sys
+    cache = sys.modules.get("sympy.core.cache")
+    if cache is None:
+        return 0
+    return sum(func.cache_info().currsize for func in cache.CACHE)
+
+
+def clear_caches():
+    """Очищает кэш sympy, кэш разобранных выражений и планов задач checker, затем собирает мусор."""
+    import sys
+    cache = sys.modules.get("sympy.core.cache")
+    if cache is not None:
+        cache.clear_cache()
+    checker = sys.modules.get("checker")
+    if checker is not None:
+        checker.expr_cache.clear()
+        checker.clear_plans()
+    gc.collect()
+
+
+class MemoryGovernor:
+    def __init__(self, soft_limit, hard_limit, cache_max_entries, check_seconds):
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.cache_max_entries = cache_max_entries
+        self.check_seconds = check_seconds
+        self.recyclable = False      # воркер gunicorn (выставляет post_fork): можно перезапустить по SIGTERM
+        self.recycle_requested = False
+        self._recycle_sent = False
+        self.cache_clears = 0
+        self.last_rss = None
+        self.last_cache_entries = 0
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def maybe_check(self):
+        """Дешёвая проверка по таймеру — для вызова после каждого запроса или операции."""
+        now = time.monotonic()
+        if now - self._last_check < self.check_seconds:
+            return self.recycle_requested
+        if not self._lock.acquire(blocking=False):
+            return self.recycle_requested
+        try:
+            self._last_check = now
+            return self.check()
+        finally:
+            self._lock.release()
+
+    def check(self):
+        """Замер и, если нужно, очистка кэшей. Возвращает True, если процесс пора перезапустить."""
+        self.last_rss = rss_bytes()
+        self.last_cache_entries = sympy_cache_entries()
+        over_cache = self.cache_max_entries and self.last_cache_entries > self.cache_max_entries
+        over_soft = self.soft_limit and self.last_rss and self.last_rss > self.soft_limit
+        if over_cache or over_soft:
+            logging.info("Очистка кэшей sympy (pid %s): RSS %s МБ, записей в кэше %s",
+                         os.getpid(), _mb(self.last_rss), self.last_cache_entries)
+            clear_caches()
+            self.cache_clears += 1
+            self.last_rss = rss_bytes()
+            self.last_cache_entries = sympy_cache_entries()
+        if self.hard_limit and self.last_rss and self.last_rss > self.hard_limit and not self.recycle_requested:
+            logging.warning("Процесс %s превысил бюджет памяти (%s МБ > %s МБ) и будет перезапущен",
+                            os.getpid(), _mb(self.last_rss), _mb(self.hard_limit))
+            self.recycle_requested = True
+        return self.recycle_requested
+
+    def recycle_worker(self):
+        """Штатный перезапуск воркера gunicorn: SIGTERM себе, текущие запросы дообрабатываются."""
+        if self.recyclable and not self._recycle_sent:
+            self._recycle_sent = True
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    def stats(self):
+        return {
+            "pid": os.getpid(),
+            "rss_bytes": self.last_rss if self.last_rss is not None else rss_bytes(),
+            "sympy_cache_entries": self.last_cache_entries,
+            "soft_limit_bytes": self.soft_limit,
+            "hard_limit_bytes": self.hard_limit,
+            "cache_max_entries": self.cache_max_entries,
+            "cache_clears": self.cache_clears,
+            "recycle_requested": self.recycle_requested,
+        }
+
+
+def _mb(value):
+    return round(value / (1024 * 1024), 1) if value else value
+
+
+def _megabytes(value):
+    return int(value * 1024 * 1024)
+
+
+governor = MemoryGovernor(
+    soft_limit=_megabytes(Config.MEMORY_SOFT_LIMIT_MB),
+    hard_limit=_megabytes(Config.MEMORY_HARD_LIMIT_MB),
+    cache_max_entries=Config.SYMPY_CACHE_MAX_ENTRIES,
+    check_seconds=Config.MEMORY_CHECK_SECONDS,
+)
+
+
+def cas_worker_governor():
+    """Отдельный контроль для процесса CAS-пула: свой жёсткий лимит, проверка после каждой операции."""
+    return MemoryGovernor(
+        soft_limit=_megabytes(Config.MEMORY_SOFT_LIMIT_MB),
+        hard_limit=_megabytes(Config.CAS_WORKER_MEMORY_LIMIT_MB),
+        cache_max_entries=Config.SYMPY_CACHE_MAX_ENTRIES,
+        check_seconds=Config.MEMORY_CHECK_SECONDS,
+    )
+
+
+def init_app(app):
+    @app.after_request
+    def _govern_memory(response):
+        if governor.maybe_check() and governor.recyclable:
+            # Ответ уже сформирован; воркер дообработает текущие запросы и завершится
+            response.call_on_close(governor.recycle_worker)
+        return response
@@ -0,0 +1,202 @@
+import time
+import bisect
+import threading
+from flask import Blueprint, Response, request, g
+
+# Границы корзин гистограмм, в секундах
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: наблюдение — bisect и сложение под блокировкой."""
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [счётчики по корзинам..., +Inf], сумма
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+                cumulative += counts[-1]
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._gauge_callbacks = []
+
+    def counter(self, name, help_text):
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge_callback(self, name, help_text, callback):
+        """callback() возвращает число или словарь {значение метки: число} (метка — 'key')."""
+        self._gauge_callbacks.append((name, help_text, callback))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, help_text, callback in self._gauge_callbacks:
+            try:
+                value = callback()
+            except Exception:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            if isinstance(value, dict):
+                for key, item in sorted(value.items()):
+                    lines.append(f"{name}{_format_labels((('key', key),))} {item}")
+            else:
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Фазы проверки и отчётов: parse, numeric, simplify, equivalence, limit, persistence, query, render
+phase_seconds = registry.histogram("math_checker_phase_seconds", "Время фаз проверки решений и генерации отчётов")
+http_request_seconds = registry.histogram("math_checker_http_request_seconds", "Время обработки HTTP-запросов")
+step_verdicts = registry.counter("math_checker_step_verdicts_total", "Вердикты по парам шагов")
+limit_verdicts = registry.counter("math_checker_limit_verdicts_total", "Вердикты проверки предела")
+solution_verdicts = registry.counter("math_checker_solution_verdicts_total", "Итоговые статусы проверенных решений")
+parse_errors = registry.counter("math_checker_parse_errors_total", "Ошибки разбора выражений")
+limit_engines = registry.counter("math_checker_limit_engine_total", "Чем вычислен предел: fast (fast_limit) или sympy")
+admission_rejections = registry.counter("math_checker_admission_rejections_total", "Запросы к CAS-эндпоинтам, отклонённые с 429")
+hint_requests = registry.counter("math_checker_hint_requests_total", "Подсказки: из кэша (cache) или сгенерированные бэкендом (backend)")
+
+
+def observe_phases(timings):
+    """Переносит словарь {фаза: секунды} (из результатов checker) в гистограмму фаз."""
+    for phase, seconds in timings.items():
+        phase_seconds.observe(seconds, phase=phase)
+
+
+class timed:
+    """Контекстный менеджер: with timed("persistence"): ..."""
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        phase_seconds.observe(time.perf_counter() - self.started, phase=self.phase)
+        return False
+
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Метрики в текстовом формате Prometheus. Значения относятся к текущему процессу
+    (каждый воркер gunicorn отдаёт свои; метка instance различает их на стороне Prometheus).
+    """
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+def init_app(app):
+    @app.before_request
+    def _start_timer():
+        g._request_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        started = getattr(g, "_request_started", None)
+        if started is not None:
+            endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+            http_request_seconds.observe(time.perf_counter() - started, endpoint=endpoint,
+                                         method=request.method, status=response.status_code)
+        return response
+
+    app.register_blueprint(metrics_bp)
+    _register_state_gauges()
+
+
+def _numeric_items(stats):
+    return {key: value for key, value in stats.items() if isinstance(value, (int, float)) and not isinstance(value, bool)}
+
+
+def _register_state_gauges():
+    """Состояние пула, кэшей и сессий снимается в момент запроса /metrics."""
+    from cas_pool import cas_pool
+    from checker import expr_cache, stage_stats
+    from step_sessions import step_sessions
+    from admission import admission
+    from memory import governor
+
+    registry.gauge_callback("math_checker_cas_pool", "Состояние CAS-пула (size, alive, idle, timeouts, respawns)",
+                            lambda: _numeric_items(cas_pool.stats()))
+    # В режиме CAS_POOL_SIZE > 0 разбор идёт в рабочих процессах, и кэш этого процесса почти пуст
+    registry.gauge_callback("math_checker_expr_cache", "Кэш разобранных выражений в этом процессе",
+                            lambda: _numeric_items(expr_cache.stats()))
+    registry.gauge_callback("math_checker_step_sessions", "Сессии пошаговой проверки",
+                            lambda: _numeric_items(step_sessions.stats()))
+    registry.gauge_callback("math_checker_admission", "Допуск к CAS-эндпоинтам (inflight, queued, admitted)",
+                            lambda: _numeric_items(admission.stats()))
+    registry.gauge_callback("math_checker_memory", "Память этого процесса (rss_bytes, sympy_cache_entries, cache_clears)",
+                            lambda: _numeric_items(governor.stats()))
+    registry.gauge_callback("math_checker_decided_by", "Число вердиктов по шагам, вынесенных каждой стадией",
+                            lambda: {stage: item["count"] for stage, item in stage_stats.snapshot()["decided_by"].items()})
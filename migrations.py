@@ -0,0 +1,113 @@
+import logging
+from datetime import datetime
+import click
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+from models import db, TaskStats, StudentStats, ErrorTypeStats, DailyStats, ChatMessage, HintCache, DataVersion
+import analytics
+import chat
+
+
+def _create_index(name, table, columns):
+    def apply(conn):
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+    return apply
+
+
+def _add_column(table, column, ddl):
+    """ALTER TABLE ... ADD COLUMN, если такой колонки ещё нет (create_all мог создать её сам)."""
+    def apply(conn):
+        existing = {c["name"] for c in inspect(conn).get_columns(table)}
+        if column not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return apply
+
+
+def _clear_table(table):
+    """Удаляет все строки (для кэшей, которые заполнятся заново)."""
+    def apply(conn):
+        conn.execute(text(f"DELETE FROM {table}"))
+    return apply
+
+
+def _create_tables(models):
+    def apply(conn):
+        for model in models:
+            model.__table__.create(conn, checkfirst=True)
+    return apply
+
+
+# Версионированные миграции: (версия, описание, [шаги]).
+# Каждый шаг идемпотентен, поэтому повторный запуск на уже обновлённой базе безопасен.
+MIGRATIONS = [
+    (1, "Индексы для отчётов и загрузки шагов", [
+        _create_index("ix_solutions_user_created", "solutions", ["user_id", "created_at"]),
+        _create_index("ix_solutions_task_created", "solutions", ["task_id", "created_at"]),
+        _create_index("ix_solutions_created_at", "solutions", ["created_at"]),
+        _create_index("ix_steps_solution_step", "steps", ["solution_id", "step_number"]),
+    ]),
+    (2, "Отпечатки эквивалентности шагов", [
+        _add_column("steps", "fingerprint", "VARCHAR(32)"),
+        _create_index("ix_steps_fingerprint", "steps", ["fingerprint"]),
+    ]),
+    (3, "Агрегаты аналитики по задачам, студентам, типам ошибок и дням", [
+        _create_tables([TaskStats, StudentStats, ErrorTypeStats, DailyStats]),
+        analytics.rebuild,
+    ]),
+    (4, "История чата в отдельной таблице и кэш подсказок", [
+        _create_tables([ChatMessage, HintCache]),
+        chat.import_legacy_history,
+    ]),
+    (5, "Общий счётчик версии данных для кэша отчётов", [
+        _create_tables([DataVersion]),
+    ]),
+    (6, "Кэш подсказок без текста шага (старые записи содержали шаг другого студента)", [
+        _clear_table("hint_cache"),
+    ]),
+]
+
+
+def current_version(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, description VARCHAR(200), applied_at DATETIME)"
+    ))
+    return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+
+def run_migrations(engine=None):
+    """
+    Применяет все ещё не применённые миграции, каждую в своей транзакции.
+    Возвращает список применённых версий.
+    """
+    engine = engine or db.engine
+    applied = []
+    with engine.begin() as conn:
+        version = current_version(conn)
+    for number, description, steps in MIGRATIONS:
+        if number <= version:
+            continue
+        try:
+            with engine.begin() as conn:
+                for step in steps:
+                    step(conn)
+                conn.execute(
+                    text("INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)"),
+                    {"v": number, "d": description, "t": datetime.utcnow()},
+                )
+        except IntegrityError:
+            # Миграцию параллельно применил другой процесс (например, соседний воркер gunicorn)
+            logging.info("Миграция %s уже применена другим процессом", number)
+            continue
+        logging.info("Применена миграция %s: %s", number, description)
+        applied.append(number)
+    return applied
+
+
+def init_app(app):
+    @app.cli.command("db-upgrade")
+    def db_upgrade():
+        """Создаёт недостающие таблицы и применяет миграции схемы."""
+        db.create_all()
+        applied = run_migrations()
+        click.echo(f"Применены миграции: {applied}" if applied else "Схема уже актуальна")
@@ -14,7 +14,7 @@ class User(db.Model):
     bio = db.Column(db.Text, default="")
     image = db.Column(db.String(300), default="")
     role = db.Column(db.String(50), default="student")  # или "admin"
-    chat_history = db.Column(db.Text)  # можно хранить JSON как строку
+    chat_history = db.Column(db.Text)  # устарело: история чата хранится в chat_messages (миграция 4)
 
     solutions = db.relationship('Solution', backref='user', lazy=True)
 
@@ -39,6 +39,13 @@ class Solution(db.Model):
 
     steps = db.relationship('Step', backref='solution', lazy=True)
 
+    # Индексы под фильтры отчётов: по студенту/задаче за период и просто по периоду
+    __table_args__ = (
+        db.Index('ix_solutions_user_created', 'user_id', 'created_at'),
+        db.Index('ix_solutions_task_created', 'task_id', 'created_at'),
+        db.Index('ix_solutions_created_at', 'created_at'),
+    )
+
 class Step(db.Model):
     __tablename__ = 'steps'
     id = db.Column(db.Integer, primary_key=True)
@@ -48,3 +55,84 @@ class Step(db.Model):
     is_correct = db.Column(db.Boolean, default=True)
     error_type = db.Column(db.String(100))
     hint = db.Column(db.String(300))
+    fingerprint = db.Column(db.String(32))  # отпечаток эквивалентности (fingerprint.py), только для алгебраических шагов
+
+    # Загрузка Solution.steps и выборка шагов по порядку; поиск уже проверенных форм по отпечатку
+    __table_args__ = (
+        db.Index('ix_steps_solution_step', 'solution_id', 'step_number'),
+        db.Index('ix_steps_fingerprint', 'fingerprint'),
+    )
+
+# Агрегаты для аналитики (analytics.py). Обновляются в той же транзакции, что и решения/шаги,
+# поэтому запросы дашборда не сканируют историю solutions и steps.
+
+class TaskStats(db.Model):
+    __tablename__ = 'task_stats'
+    task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)      # начатые/отправленные решения
+    completions = db.Column(db.Integer, nullable=False, default=0)   # решения со статусом completed
+    errors = db.Column(db.Integer, nullable=False, default=0)        # решения со статусом error
+    error_steps = db.Column(db.Integer, nullable=False, default=0)   # шаги с is_correct = False
+
+class StudentStats(db.Model):
+    __tablename__ = 'student_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    completions = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+    error_steps = db.Column(db.Integer, nullable=False, default=0)
+
+class ErrorTypeStats(db.Model):
+    __tablename__ = 'error_type_stats'
+    task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), primary_key=True)
+    error_type = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class DailyStats(db.Model):
+    __tablename__ = 'daily_stats'
+    day = db.Column(db.Date, primary_key=True)  # день создания решения (UTC)
+    task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    completions = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+
+class ChatMessage(db.Model):
+    """Сообщение чата: только добавляется, история читается страницами (chat.py)."""
+    __tablename__ = 'chat_messages'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    role = db.Column(db.String(20), nullable=False)  # user или assistant
+    content = db.Column(db.Text, nullable=False)
+    task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Страницы истории пользователя (по убыванию id) и очистка по сроку хранения
+    __table_args__ = (
+        db.Index('ix_chat_messages_user_id', 'user_id', 'id'),
+        db.Index('ix_chat_messages_created_at', 'created_at'),
+    )
+
+class HintCache(db.Model):
+    """Сгенерированная подсказка для ошибки: одна на (задача, тип ошибки, каноническая форма шага)."""
+    __tablename__ = 'hint_cache'
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), nullable=False)
+    error_type = db.Column(db.String(100), nullable=False)
+    step_key = db.Column(db.String(64), nullable=False)  # см. hints.step_key
+    hint = db.Column(db.Text, nullable=False)
+    backend = db.Column(db.String(50))  # кто сгенерировал: gemini или stub
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('task_id', 'error_type', 'step_key', name='uq_hint_cache_key'),
+    )
+
+class DataVersion(db.Model):
+    """
+    Счётчик изменений данных, общий для всех процессов (строка "reports" — версия данных
+    отчётов в ключе кэша reports.py, "users" — версия пользователей для кэша utils/Auth/auth.py).
+    Увеличивается в той же транзакции, что и изменение.
+    """
+    __tablename__ = 'data_versions'
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
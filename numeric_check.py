@@ -0,0 +1,130 @@
+import mpmath
+import numpy as np
+import sympy as sp
+
+# Точки выборки: обычный диапазон, отрицательные значения и большие x (пределы при x -> ∞).
+# Сдвиг на иррациональную добавку уводит точки от целых полюсов вида 1/(x - 1).
+_OFFSET = 0.0731415926
+SMALL_POINTS = np.concatenate([
+    np.linspace(0.5, 20.0, 128) + _OFFSET,
+    -np.linspace(0.5, 20.0, 32) - _OFFSET,
+    np.geomspace(20.0, 1e4, 48) + _OFFSET,
+])
+LARGE_POINTS = np.geomspace(1e4, 1e8, 48) + _OFFSET
+SAMPLE_POINTS = np.concatenate([SMALL_POINTS, LARGE_POINTS])
+
+# На малых x сравниваем строго, на больших — с допуском на потерю точности
+SMALL_RTOL = 1e-7
+LARGE_RTOL = 1e-3
+ATOL = 1e-12
+# Сколько расхождений на малых x достаточно, чтобы считать шаги заведомо разными
+MIN_MISMATCHES = 3
+# Расхождение в double может быть потерей точности при вычитании близких чисел
+# (sqrt(x^4+1) - x^2), поэтому DIFFERENT выносится, только если расхождение
+# подтвердилось при вычислении с CONFIRM_DPS знаками
+CONFIRM_DPS = 30
+CONFIRM_RTOL = 1e-10
+
+DIFFERENT = "different"
+PLAUSIBLE = "plausible"
+INCONCLUSIVE = "inconclusive"
+
+
+def compile_numeric(expr):
+    """
+    Компилирует выражение в векторизованную NumPy-функцию.
+    Возвращает (имена переменных, функция) или None, если выражение не поддаётся lambdify.
+    """
+    symbols = sorted(expr.free_symbols, key=lambda s: s.name)
+    try:
+        func = sp.lambdify(symbols, expr, modules="numpy")
+    except Exception:
+        return None
+    return [s.name for s in symbols], func
+
+
+def _samples_for(names):
+    # Для каждой переменной — свой циклический сдвиг тех же точек
+    return {name: np.roll(SAMPLE_POINTS, 37 * i) for i, name in enumerate(names)}
+
+
+def _evaluate(compiled, samples):
+    names, func = compiled
+    with np.errstate(all="ignore"):
+        values = func(*[samples[name] for name in names])
+    values = np.asarray(values)
+    if np.iscomplexobj(values):
+        # Комплексные значения (например, дробная степень отрицательного числа) не сравниваем
+        values = np.where(np.abs(values.imag) < ATOL, values.real, np.nan)
+    return np.broadcast_to(values.astype(float), SAMPLE_POINTS.shape)
+
+
+def confirm_different(prev_expr, curr_expr, names, samples, indices):
+    """
+    Перепроверяет расхождение в точках выборки с номерами indices с CONFIRM_DPS знаками (mpmath).
+    True — выражения различаются во всех этих точках; если хоть в одной они совпали
+    или значение не вычислилось, расхождение не подтверждено.
+    """
+    symbols = [sp.Symbol(name) for name in names]
+    try:
+        funcs = [sp.lambdify(symbols, expr, modules="mpmath") for expr in (prev_expr, curr_expr)]
+    except Exception:
+        return False
+    with mpmath.workdps(CONFIRM_DPS):
+        for index in indices:
+            point = [mpmath.mpf(float(samples[name][index])) for name in names]
+            try:
+                a, b = (mpmath.mpmathify(func(*point)) for func in funcs)
+            except Exception:
+                return False
+            if not (mpmath.isfinite(a) and mpmath.isfinite(b)) or mpmath.im(a) or mpmath.im(b):
+                return False
+            if abs(a - b) <= CONFIRM_RTOL * max(abs(a), abs(b)) + ATOL:
+                return False
+    return True
+
+
+def numeric_compare(prev_compiled, curr_compiled, prev_expr=None, curr_expr=None):
+    """
+    Быстрое сравнение двух скомпилированных выражений на SAMPLE_POINTS одним векторным вызовом.
+    DIFFERENT — выражения заведомо не эквивалентны (расхождение подтверждено с повышенной
+    точностью, для этого нужны prev_expr и curr_expr), PLAUSIBLE — совпали во всех сравнимых
+    точках, INCONCLUSIVE — сравнить не удалось (ошибка вычисления, мало конечных значений
+    или расхождение не подтвердилось).
+    """
+    if prev_compiled is None or curr_compiled is None:
+        return INCONCLUSIVE
+    names = sorted(set(prev_compiled[0]) | set(curr_compiled[0]))
+    samples = _samples_for(names)
+    try:
+        a = _evaluate(prev_compiled, samples)
+        b = _evaluate(curr_compiled, samples)
+    except Exception:
+        return INCONCLUSIVE
+
+    comparable = np.isfinite(a) & np.isfinite(b)
+    with np.errstate(all="ignore"):
+        diff = np.abs(a - b)
+        scale = np.maximum(np.abs(a), np.abs(b))
+    small = slice(0, len(SMALL_POINTS))
+    large = slice(len(SMALL_POINTS), None)
+
+    small_cmp = comparable[small]
+    small_bad = small_cmp & (diff[small] > SMALL_RTOL * scale[small] + ATOL)
+    large_cmp = comparable[large]
+    large_bad = large_cmp & (diff[large] > LARGE_RTOL * scale[large] + ATOL)
+
+    if small_bad.sum() >= MIN_MISMATCHES:
+        mismatches = np.flatnonzero(small_bad)
+    elif large_cmp.sum() and large_bad.sum() > large_cmp.sum() // 2:
+        mismatches = np.flatnonzero(large_bad) + len(SMALL_POINTS)
+    else:
+        mismatches = None
+    if mismatches is not None:
+        if prev_expr is not None and curr_expr is not None and \
+                confirm_different(prev_expr, curr_expr, names, samples, mismatches[:MIN_MISMATCHES]):
+            return DIFFERENT
+        return INCONCLUSIVE
+    if small_cmp.sum() < MIN_MISMATCHES or small_bad.any():
+        return INCONCLUSIVE
+    return PLAUSIBLE
@@ -0,0 +1,114 @@
+from sqlalchemy import insert, select, and_
+from sqlalchemy.orm import aliased
+from models import db, Solution, Step
+from metrics import timed
+from db_config import write_transaction
+from analytics import StatsDelta, DEFAULT_ERROR_TYPE
+
+
+def build_step_rows(steps, errors, fingerprints=None):
+    """
+    Формирует строки таблицы steps для проверенного решения.
+    Если в решении есть ошибки, все шаги считаются некорректными (как и раньше), но тип ошибки
+    (error_type из errors) получают только шаги с ошибочным вердиктом; у остальных он пустой,
+    и в статистику ошибок они не попадают.
+    fingerprints — отпечатки алгебраических шагов (до LIMIT) по порядку.
+    """
+    step_error_types = {e["step"]: e.get("error_type") or DEFAULT_ERROR_TYPE for e in errors}
+    fingerprints = fingerprints or []
+    rows = []
+    for i, step in enumerate(steps, start=1):
+        is_correct = not errors
+        rows.append({
+            "step_number": i,
+            "input_expr": step,
+            "is_correct": is_correct,
+            "error_type": step_error_types.get(i),
+            "hint": "",
+            "fingerprint": fingerprints[i - 1] if i <= len(fingerprints) else None,
+        })
+    return rows
+
+
+def save_checked_solution(task_id, user_id, steps, errors, fingerprints=None):
+    """
+    Сохраняет решение, все его шаги и итоговый статус одной транзакцией
+    (один COMMIT вместо отдельного на решение, шаги и каждую смену статуса).
+    Шаги вставляются пакетно, агрегаты аналитики обновляются в той же транзакции. Возвращает id решения.
+    """
+    with timed("persistence"), write_transaction():
+        solution = Solution(task_id=task_id, user_id=user_id, status="error" if errors else "completed")
+        db.session.add(solution)
+        db.session.flush()  # нужен solution.id для шагов
+
+        rows = build_step_rows(steps, errors, fingerprints)
+        for row in rows:
+            row["solution_id"] = solution.id
+        if rows:
+            db.session.execute(insert(Step), rows)
+
+        delta = StatsDelta()
+        delta.checked_solution(solution, rows)
+        delta.apply()
+    return solution.id
+
+
+def save_checked_solutions(entries):
+    """
+    Пакетный вариант save_checked_solution: entries — список (task_id, user_id, steps, errors, fingerprints).
+    Все решения и все их шаги записываются одной транзакцией. Возвращает список id в том же порядке.
+    """
+    if not entries:
+        return []
+    with timed("persistence"), write_transaction():
+        solutions = [
+            Solution(task_id=task_id, user_id=user_id, status="error" if errors else "completed")
+            for task_id, user_id, _, errors, _ in entries
+        ]
+        db.session.add_all(solutions)
+        db.session.flush()
+
+        rows = []
+        delta = StatsDelta()
+        for solution, (_, _, steps, errors, fingerprints) in zip(solutions, entries):
+            solution_rows = build_step_rows(steps, errors, fingerprints)
+            for row in solution_rows:
+                row["solution_id"] = solution.id
+            rows.extend(solution_rows)
+            delta.checked_solution(solution, solution_rows)
+        if rows:
+            db.session.execute(insert(Step), rows)
+        delta.apply()
+    return [solution.id for solution in solutions]
+
+
+def known_equivalent_pairs(pairs):
+    """
+    Какие из пар отпечатков (prev, curr) уже встречались как два соседних корректных шага,
+    то есть их эквивалентность была проверена раньше. Возвращает множество пар в исходном
+    порядке. Поиск идёт по индексу ix_steps_fingerprint, затем к соседнему шагу — по
+    ix_steps_solution_step.
+    """
+    pairs = {(a, b) for a, b in pairs if a and b and a != b}
+    if not pairs:
+        return set()
+    prev_step = aliased(Step)
+    curr_step = aliased(Step)
+    wanted = pairs | {(b, a) for a, b in pairs}
+    curr_values = sorted({b for _, b in wanted})
+    prev_values = {a for a, _ in wanted}
+    seen = set()
+    # Пары отбираются в Python: IN по порядкам отпечатков, без длинной цепочки OR в SQL
+    for start in range(0, len(curr_values), 500):
+        rows = db.session.execute(
+            select(prev_step.fingerprint, curr_step.fingerprint)
+            .join(prev_step, and_(prev_step.solution_id == curr_step.solution_id,
+                                  prev_step.step_number == curr_step.step_number - 1))
+            .where(curr_step.fingerprint.in_(curr_values[start:start + 500]),
+                   prev_step.fingerprint.in_(prev_values),
+                   curr_step.is_correct.is_(True), prev_step.is_correct.is_(True))
+            .distinct()
+        ).all()
+        seen.update((a, b) for a, b in rows if (a, b) in wanted)
+    # Эквивалентность симметрична: пара засчитывается в любом порядке
+    return {(a, b) for a, b in pairs if (a, b) in seen or (b, a) in seen}
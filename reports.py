@@ -1,144 +1,428 @@
 import os
-import logging
 import io
+import csv
+import json
+import zlib
+import shutil
+import hashlib
+import logging
+import tempfile
+import time
+import threading
 from datetime import datetime
-from flask import Blueprint, request, send_file, jsonify
-from models import db, Solution, User, Task, Step
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from functools import lru_cache
+from flask import Blueprint, request, send_file, jsonify, Response, stream_with_context, g
+from sqlalchemy import event, func, select, update, insert
+from sqlalchemy.orm import Session, configure_mappers, joinedload, selectinload
+from config import Config
+from models import db, Solution, User, Task, Step, DataVersion
+import metrics
+from utils.Auth.auth import login_required
 
 reports_bp = Blueprint('reports', __name__, url_prefix='/api/reports')
 
+# backref-атрибуты (Solution.user, Solution.task) появляются только после конфигурации мапперов
+configure_mappers()
+
 # Определяем базовую директорию
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 font_regular_path = os.path.join(BASE_DIR, "fonts", "DejaVuSans.ttf")
 font_bold_path = os.path.join(BASE_DIR, "fonts", "DejaVuSans-Bold.ttf")
-logging.info("Путь к DejaVuSans: %s", font_regular_path)
-logging.info("Путь к DejaVuSans-Bold: %s", font_bold_path)
 
-if not os.path.exists(font_regular_path) or not os.path.exists(font_bold_path):
-    logging.error("Файл шрифта не найден. Проверьте пути к файлам шрифтов.")
-else:
-    pdfmetrics.registerFont(TTFont('DejaVuSans', font_regular_path))
-    pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', font_bold_path))
+# reportlab и шрифты нужны только отчётам: загружаются при первом отчёте или при прогреве
+_fonts_loaded = False
+_fonts_lock = threading.Lock()
+
+def load_fonts():
+    """Импортирует reportlab и регистрирует TTF-шрифты (один раз на процесс)."""
+    global _fonts_loaded
+    if _fonts_loaded:
+        return
+    with _fonts_lock:
+        if _fonts_loaded:
+            return
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        logging.info("Путь к DejaVuSans: %s", font_regular_path)
+        logging.info("Путь к DejaVuSans-Bold: %s", font_bold_path)
+        if not os.path.exists(font_regular_path) or not os.path.exists(font_bold_path):
+            logging.error("Файл шрифта не найден. Проверьте пути к файлам шрифтов.")
+        else:
+            pdfmetrics.registerFont(TTFont('DejaVuSans', font_regular_path))
+            pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', font_bold_path))
+        _fonts_loaded = True
+
+@lru_cache(maxsize=16384)
+def _word_width(word, font, font_size):
+    from reportlab.pdfbase import pdfmetrics
+    return pdfmetrics.stringWidth(word, font, font_size)
 
 def wrap_text(text, max_width, c_obj, font, font_size):
     """
     Разбивает текст на строки так, чтобы ширина каждой строки не превышала max_width.
+    Ширина строки складывается из закэшированных ширин слов и пробелов,
+    поэтому stringWidth не вызывается заново для каждой растущей строки.
     """
-    words = text.split()
+    space_width = _word_width(" ", font, font_size)
     lines = []
-    current_line = ""
-    for word in words:
-        test_line = f"{current_line} {word}".strip() if current_line else word
-        if c_obj.stringWidth(test_line, font, font_size) <= max_width:
-            current_line = test_line
+    current_words = []
+    current_width = 0.0
+    for word in text.split():
+        word_width = _word_width(word, font, font_size)
+        test_width = current_width + space_width + word_width if current_words else word_width
+        if test_width <= max_width or not current_words:
+            current_words.append(word)
+            current_width = test_width
         else:
-            if current_line:
-                lines.append(current_line)
-            current_line = word
-    if current_line:
-        lines.append(current_line)
+            lines.append(" ".join(current_words))
+            current_words = [word]
+            current_width = word_width
+    if current_words:
+        lines.append(" ".join(current_words))
     return lines
 
+# Версия данных отчётов хранится в БД (data_versions): файлы кэша общие для всех воркеров
+# в REPORT_CACHE_DIR и переживают перезапуск, поэтому счётчик в памяти процесса не годится.
+# Счётчик увеличивается в транзакции, меняющей строки отчёта (статус решения, название задачи,
+# имя пользователя); вставки учитываются через число строк и наибольший id.
+REPORTS_VERSION = "reports"
+_versions = DataVersion.__table__
+
+@event.listens_for(Session, "after_flush")
+def _bump_data_version(session, flush_context):
+    touched = list(session.dirty) + list(session.deleted)
+    if any(isinstance(obj, (Solution, Step, User, Task)) for obj in touched):
+        conn = session.connection()
+        bumped = conn.execute(update(_versions).where(_versions.c.name == REPORTS_VERSION)
+                              .values(version=_versions.c.version + 1))
+        if not bumped.rowcount:
+            conn.execute(insert(_versions).values(name=REPORTS_VERSION, version=1))
+
+def data_version():
+    """Штамп версии данных для ключа кэша отчётов (все значения читаются одним запросом)."""
+    row = db.session.execute(select(
+        select(func.count(Solution.id)).scalar_subquery(),
+        select(func.max(Solution.id)).scalar_subquery(),
+        select(func.count(Step.id)).scalar_subquery(),
+        select(func.max(Step.id)).scalar_subquery(),
+        select(_versions.c.version).where(_versions.c.name == REPORTS_VERSION).scalar_subquery(),
+    )).one()
+    return ".".join(str(value or 0) for value in row)
+
+def _report_cache_path(filters):
+    key = json.dumps({"filters": filters, "version": data_version()}, sort_keys=True, default=str)
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return os.path.join(Config.REPORT_CACHE_DIR, f"report-{digest}.pdf")
+
+def _store_in_cache(fileobj, path):
+    """Атомарно сохраняет готовый отчёт в кэш и удаляет самые старые файлы сверх лимита."""
+    os.makedirs(Config.REPORT_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=Config.REPORT_CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as out:
+        fileobj.seek(0)
+        shutil.copyfileobj(fileobj, out)
+    os.replace(tmp_path, path)
+
+    cached = sorted(
+        (os.path.join(Config.REPORT_CACHE_DIR, name) for name in os.listdir(Config.REPORT_CACHE_DIR)
+         if name.startswith("report-")),
+        key=os.path.getmtime,
+    )
+    for old in cached[:-Config.REPORT_CACHE_MAX_FILES]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+
+def _stream_file(fileobj, chunk_size=64 * 1024):
+    try:
+        fileobj.seek(0)
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+class _TimedRows:
+    """Итератор по строкам запроса, накапливающий время, проведённое в БД (выборка порций)."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            return next(self._rows)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+def render_report(solutions, out):
+    """
+    Рисует PDF-отчёт в файловый объект out. solutions — итератор решений
+    с уже загруженными user, task и steps; страницы формируются по мере чтения.
+    """
+    load_fonts()
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(out, pagesize=letter)
+    width, height = letter
+    margin = 50
+    max_text_width = width - 2 * margin
+    y = height - margin
+
+    # Функция для отрисовки шапки на каждой странице
+    def draw_header(c_obj):
+        c_obj.setFont("DejaVuSans-Bold", 20)
+        c_obj.drawCentredString(width / 2, height - margin + 20, "Отчет по решениям студентов")
+        c_obj.line(margin, height - margin + 10, width - margin, height - margin + 10)
+
+    draw_header(c)
+    y -= 40
+    c.setFont("DejaVuSans", 12)
+
+    empty = True
+    for sol in solutions:
+        empty = False
+        if y < margin + 120:
+            c.showPage()
+            draw_header(c)
+            y = height - margin - 30
+
+        # Формируем заголовок решения
+        solution_header = (
+            f"Решение ID: {sol.id} | Пользователь: {sol.user.username} | "
+            f"Задача: {sol.task.title} | Статус: {sol.status} | Дата: {sol.created_at.strftime('%Y-%m-%d %H:%M')}"
+        )
+        header_lines = wrap_text(solution_header, max_text_width, c, "DejaVuSans-Bold", 12)
+        c.setFont("DejaVuSans-Bold", 12)
+        for line in header_lines:
+            c.drawString(margin, y, line)
+            y -= 15
+        y -= 5
+
+        c.setFont("DejaVuSans", 11)
+        # Вывод шагов решения
+        for step in sorted(sol.steps, key=lambda s: s.step_number):
+            step_text = f"Шаг {step.step_number}: {step.input_expr} — " + ("Корректно" if step.is_correct else "Некорректно")
+            if not step.is_correct and step.error_type:
+                step_text += f" (Ошибка: {step.error_type}; Подсказка: {step.hint})"
+            step_lines = wrap_text(step_text, max_text_width - 20, c, "DejaVuSans", 11)
+            for line in step_lines:
+                c.drawString(margin + 20, y, line)
+                y -= 12
+            if y < margin + 50:
+                c.showPage()
+                draw_header(c)
+                y = height - margin - 30
+                c.setFont("DejaVuSans", 11)
+
+        y -= 10
+        c.line(margin, y, width - margin, y)
+        y -= 20
+
+    if empty:
+        wrapped = wrap_text("Нет решений для заданного периода или фильтров.", max_text_width, c, "DejaVuSans", 12)
+        for line in wrapped:
+            c.drawString(margin, y, line)
+            y -= 15
+
+    c.showPage()
+    c.save()
+
+def _apply_filters(query, period=None, task_id=None, student_id=None):
+    """Фильтры отчётов: period "YYYY-MM-DD:YYYY-MM-DD", task_id, student_id. Неверный период — ValueError."""
+    if period:
+        start_str, end_str = period.split(":")
+        start_date = datetime.strptime(start_str, "%Y-%m-%d")
+        end_date = datetime.strptime(end_str, "%Y-%m-%d")
+        # Расширяем конец периода до конца дня
+        end_date = end_date.replace(hour=23, minute=59, second=59)
+        query = query.filter(Solution.created_at >= start_date, Solution.created_at <= end_date)
+    if task_id:
+        query = query.filter(Solution.task_id == task_id)
+    if student_id:
+        query = query.filter(Solution.user_id == student_id)
+    return query
+
+def _scoped_student_id(student_id):
+    """
+    student_id для фильтра отчёта: администратору — запрошенный (или все), студенту — всегда свой.
+    Запрос чужих решений студентом — PermissionError.
+    """
+    if g.current_user["role"] == "admin":
+        return student_id
+    if student_id not in (None, "") and str(student_id) != str(g.current_user["id"]):
+        raise PermissionError(student_id)
+    return g.current_user["id"]
+
 @reports_bp.route('/pdf', methods=['POST'])
+@login_required
 def generate_pdf_report():
     """
     Генерирует PDF-отчет с историей решений студентов, разбором ошибок и подсказками.
     Ожидается JSON с параметрами фильтрации: period (например, "2024-01-01:2024-02-01"),
-    task_id и student_id (опционально).
+    task_id и student_id (опционально). Студент получает отчёт только по своим решениям.
+    Решения читаются порциями вместе с пользователями, задачами и шагами, отчёт собирается
+    во временном файле и отдаётся потоком. Готовые отчёты кэшируются по фильтрам и версии данных.
     """
+    data = request.get_json(silent=True) or {}
+    try:
+        student_id = _scoped_student_id(data.get("student_id"))
+    except PermissionError:
+        return jsonify({"message": "Forbidden"}), 403
     try:
-        data = request.json
         period = data.get("period")  # формат "YYYY-MM-DD:YYYY-MM-DD"
         task_id = data.get("task_id")
-        student_id = data.get("student_id")
-
-        query = Solution.query
-        if period:
-            try:
-                start_str, end_str = period.split(":")
-                start_date = datetime.strptime(start_str, "%Y-%m-%d")
-                end_date = datetime.strptime(end_str, "%Y-%m-%d")
-                # Расширяем конец периода до конца дня
-                end_date = end_date.replace(hour=23, minute=59, second=59)
-                query = query.filter(Solution.created_at >= start_date, Solution.created_at <= end_date)
-            except Exception as e:
-                logging.error("Ошибка разбора периода: %s", e)
-                return jsonify({"message": "Invalid period format. Use YYYY-MM-DD:YYYY-MM-DD"}), 400
-        if task_id:
-            query = query.filter(Solution.task_id == task_id)
-        if student_id:
-            query = query.filter(Solution.user_id == student_id)
-
-        solutions = query.all()
-
-        buffer = io.BytesIO()
-        c = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-        margin = 50
-        max_text_width = width - 2 * margin
-        y = height - margin
-
-        # Функция для отрисовки шапки на каждой странице
-        def draw_header(c_obj):
-            c_obj.setFont("DejaVuSans-Bold", 20)
-            c_obj.drawCentredString(width / 2, height - margin + 20, "Отчет по решениям студентов")
-            c_obj.line(margin, height - margin + 10, width - margin, height - margin + 10)
-
-        draw_header(c)
-        y -= 40
-        c.setFont("DejaVuSans", 12)
-
-        if not solutions:
-            wrapped = wrap_text("Нет решений для заданного периода или фильтров.", max_text_width, c, "DejaVuSans", 12)
-            for line in wrapped:
-                c.drawString(margin, y, line)
-                y -= 15
-        else:
-            for sol in solutions:
-                if y < margin + 120:
-                    c.showPage()
-                    draw_header(c)
-                    y = height - margin - 30
-
-                # Формируем заголовок решения
-                solution_header = (
-                    f"Решение ID: {sol.id} | Пользователь: {sol.user.username} | "
-                    f"Задача: {sol.task.title} | Статус: {sol.status} | Дата: {sol.created_at.strftime('%Y-%m-%d %H:%M')}"
-                )
-                header_lines = wrap_text(solution_header, max_text_width, c, "DejaVuSans-Bold", 12)
-                c.setFont("DejaVuSans-Bold", 12)
-                for line in header_lines:
-                    c.drawString(margin, y, line)
-                    y -= 15
-                y -= 5
 
-                c.setFont("DejaVuSans", 11)
-                # Вывод шагов решения
-                for step in sorted(sol.steps, key=lambda s: s.step_number):
-                    step_text = f"Шаг {step.step_number}: {step.input_expr} — " + ("Корректно" if step.is_correct else "Некорректно")
-                    if not step.is_correct:
-                        step_text += f" (Ошибка: {step.error_type}; Подсказка: {step.hint})"
-                    step_lines = wrap_text(step_text, max_text_width - 20, c, "DejaVuSans", 11)
-                    for line in step_lines:
-                        c.drawString(margin + 20, y, line)
-                        y -= 12
-                    if y < margin + 50:
-                        c.showPage()
-                        draw_header(c)
-                        y = height - margin - 30
-
-                y -= 10
-                c.line(margin, y, width - margin, y)
-                y -= 20
-
-        c.showPage()
-        c.save()
-        buffer.seek(0)
-        return send_file(buffer, as_attachment=True, download_name="report.pdf", mimetype="application/pdf")
+        query = select(Solution).options(
+            joinedload(Solution.user),
+            joinedload(Solution.task),
+            selectinload(Solution.steps),
+        ).order_by(Solution.id)
+        try:
+            query = _apply_filters(query, period, task_id, student_id)
+        except ValueError as e:
+            logging.error("Ошибка разбора периода: %s", e)
+            return jsonify({"message": "Invalid period format. Use YYYY-MM-DD:YYYY-MM-DD"}), 400
+
+        cache_path = None
+        if Config.REPORT_CACHE_ENABLED:
+            cache_path = _report_cache_path({"period": period, "task_id": task_id, "student_id": student_id})
+            if os.path.exists(cache_path):
+                return send_file(cache_path, as_attachment=True, download_name="report.pdf", mimetype="application/pdf")
+
+        started = time.perf_counter()
+        solutions = _TimedRows(db.session.execute(query.execution_options(yield_per=Config.REPORT_CHUNK_SIZE)).scalars())
+        spool = tempfile.SpooledTemporaryFile(max_size=Config.REPORT_SPOOL_MAX_BYTES)
+        try:
+            render_report(solutions, spool)
+        except Exception:
+            spool.close()
+            raise
+        # Выборка и отрисовка чередуются порциями, поэтому время запроса считается внутри итератора
+        metrics.phase_seconds.observe(solutions.seconds, phase="query")
+        metrics.phase_seconds.observe(time.perf_counter() - started - solutions.seconds, phase="render")
+
+        if cache_path:
+            _store_in_cache(spool, cache_path)
+            spool.close()
+            return send_file(cache_path, as_attachment=True, download_name="report.pdf", mimetype="application/pdf")
+
+        size = spool.tell()
+        return Response(
+            _stream_file(spool),
+            mimetype="application/pdf",
+            headers={
+                "Content-Disposition": "attachment; filename=report.pdf",
+                "Content-Length": str(size),
+            },
+        )
     except Exception as e:
         logging.error("Ошибка генерации отчета: %s", e)
         return jsonify({"message": "Не удалось сгенерировать отчёт", "details": str(e)}), 500
+
+EXPORT_COLUMNS = [
+    "solution_id", "created_at", "status", "user_id", "username", "task_id", "task_title",
+    "step_number", "input_expr", "is_correct", "error_type", "hint",
+]
+
+def _export_rows(query):
+    """Строки выгрузки порциями по EXPORT_CHUNK_SIZE через серверный курсор (stream_results)."""
+    result = db.session.execute(query.execution_options(stream_results=True, yield_per=Config.EXPORT_CHUNK_SIZE))
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+def _export_values(row):
+    values = list(row)
+    values[1] = values[1].isoformat() if values[1] else None  # created_at
+    return values
+
+def _csv_chunks(partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in partitions:
+        writer.writerows(_export_values(row) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def _jsonl_chunks(partitions):
+    for rows in partitions:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, _export_values(row))), ensure_ascii=False) + "\n"
+            for row in rows
+        )
+
+def _encode(chunks, compress):
+    """Кодирует текст в UTF-8 и при необходимости сжимает gzip на лету (без буферизации всего файла)."""
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31 — формат gzip
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            yield data
+    if compressor:
+        yield compressor.flush()
+
+@reports_bp.route('/export', methods=['GET', 'POST'])
+@login_required
+def export_solutions():
+    """
+    Выгрузка решений вместе с шагами: одна строка на шаг (решение без шагов — одна строка с пустыми
+    полями шага). Параметры (JSON-тело или строка запроса): period, task_id, student_id — как у /pdf,
+    format — "csv" (по умолчанию) или "jsonl", gzip — true/1 для сжатого файла.
+    Строки читаются серверным курсором порциями и сразу отдаются клиенту, поэтому память
+    не зависит от объёма выгрузки. Студент выгружает только свои решения, администратор — любые.
+    """
+    data = request.get_json(silent=True) or request.args
+    try:
+        student_id = _scoped_student_id(data.get("student_id"))
+    except PermissionError:
+        return jsonify({"message": "Forbidden"}), 403
+    export_format = str(data.get("format", "csv")).lower()
+    if export_format not in ("csv", "jsonl"):
+        return jsonify({"message": "format must be csv or jsonl"}), 400
+    compress = str(data.get("gzip", "")).lower() in ("1", "true", "yes")
+
+    query = (
+        select(Solution.id, Solution.created_at, Solution.status, Solution.user_id, User.username,
+               Solution.task_id, Task.title, Step.step_number, Step.input_expr, Step.is_correct,
+               Step.error_type, Step.hint)
+        .join(User, User.id == Solution.user_id)
+        .join(Task, Task.id == Solution.task_id)
+        .outerjoin(Step, Step.solution_id == Solution.id)
+        .order_by(Solution.id, Step.step_number)
+    )
+    try:
+        query = _apply_filters(query, data.get("period"), data.get("task_id"), student_id)
+    except ValueError as e:
+        logging.error("Ошибка разбора периода: %s", e)
+        return jsonify({"message": "Invalid period format. Use YYYY-MM-DD:YYYY-MM-DD"}), 400
+
+    def generate():
+        started = time.perf_counter()
+        chunks = _csv_chunks if export_format == "csv" else _jsonl_chunks
+        yield from _encode(chunks(_export_rows(query)), compress)
+        metrics.phase_seconds.observe(time.perf_counter() - started, phase="export")
+
+    filename = f"solutions.{export_format}" + (".gz" if compress else "")
+    mimetype = "application/gzip" if compress else ("text/csv" if export_format == "csv" else "application/x-ndjson")
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}", "X-Accel-Buffering": "no"},
+    )
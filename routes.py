@@ -1,51 +1,224 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+import threading
+from flask import Blueprint, request, jsonify, g
+from config import Config
 from models import db, Task, Solution, Step
-from checker import check_step
+from db_config import write_transaction
+from cas_pool import CASTimeout
+from checker import stage_stats
+from persistence import known_equivalent_pairs
+from analytics import StatsDelta
+from solutions import run_cas, prejudge_pair, pairs_to_look_up, plan_spec
+import metrics
+from step_sessions import step_sessions, StepSession
+from utils.Auth.auth import login_required
+from admission import admission_required
 
-app = Flask(__name__)
-app.config.from_object("config.Config")
-db.init_app(app)
-CORS(app)
+# Пошаговая проверка решения. Список задач отдаёт tasks_bp (/api/tasks).
+routes_bp = Blueprint('routes', __name__, url_prefix='/api')
 
-@app.route("/tasks", methods=["GET"])
-def get_tasks():
-    tasks = Task.query.all()
-    return jsonify([{"id": t.id, "title": t.title, "description": t.description} for t in tasks])
+# Полосатые блокировки по решению: шаги одного решения в процессе проверяются по очереди
+_solution_locks = [threading.Lock() for _ in range(64)]
 
-@app.route("/tasks/<int:task_id>/start", methods=["POST"])
+class StepConflict(Exception):
+    """Шаг не записан: решение изменилось (шаг записал другой запрос) или его не восстановить."""
+    def __init__(self, message, **extra):
+        super().__init__(message)
+        self.extra = extra
+
+def _last_step(solution_id):
+    """Последняя строка steps решения (id, номер, выражение) или None."""
+    return (db.session.query(Step.id, Step.step_number, Step.input_expr)
+            .filter(Step.solution_id == solution_id)
+            .order_by(Step.step_number.desc(), Step.id.desc()).first())
+
+def _restore_session(solution, last_step, prev_expr=None):
+    """
+    Создаёт сессию решения по БД: если её нет в памяти процесса или она отстала от сохранённых
+    шагов (last_step — последняя строка steps, см. _last_step).
+    Предыдущий шаг — последний корректный шаг в БД. prev_expr клиента (старые клиенты)
+    принимается, только пока у решения нет ни одного сохранённого шага, иначе исходное
+    выражение задачи: вердикты сохраняются и переиспользуются (known_equivalent_pairs),
+    поэтому пару для проверки определяет сервер.
+    """
+    step_number = last_step.step_number if last_step else 0
+    last_correct = (Step.query.filter(Step.solution_id == solution.id, Step.is_correct.is_(True),
+                                      Step.input_expr != "LIMIT")
+                    .order_by(Step.step_number.desc()).first())
+    if last_correct is not None:
+        prev_expr, fingerprint = last_correct.input_expr, last_correct.fingerprint
+    elif last_step is not None or not prev_expr:
+        prev_expr, fingerprint = solution.task.expression, None
+    else:
+        fingerprint = None
+    if not prev_expr:
+        raise StepConflict("Не найден предыдущий шаг решения")
+    # Каноническая форма появится после первого сравнения в CAS (compare_steps её не требует)
+    session = StepSession(solution.id, solution.task_id, solution.user_id, prev_expr, None, step_number,
+                          fingerprint)
+    session.after_limit = bool(last_step and last_step.input_expr == "LIMIT")
+    session.last_step_id = last_step.id if last_step else None
+    step_sessions.put(session)
+    return session
+
+def _check_next_step(session, curr_expr):
+    """
+    Проверяет очередной шаг относительно сессии и при успехе сдвигает её.
+    Возвращает (вердикт, отпечаток шага или None). Отпечатки считаются в CAS-пуле; по ним
+    вердикт выносится без simplify (совпадение отпечатков или сохранённый вердикт), иначе —
+    сравнение в CAS-пуле: с канонической формой предыдущего шага, если она уже известна, иначе compare_steps.
+    """
+    if curr_expr == "LIMIT":
+        session.after_limit = True
+        return {"is_correct": True, "error_type": None, "hint": ""}, None
+
+    if session.after_limit:
+        # После LIMIT студент пишет значение предела
+        task = Task.query.get(session.task_id)
+        result = run_cas("evaluate_task_limit", plan_spec(task), session.last_expr, curr_expr,
+                         timeout=Config.CAS_LIMIT_TIMEOUT)
+        if not result["limit_ok"]:
+            metrics.limit_verdicts.inc(verdict="wrong_limit")
+            return {"is_correct": False, "error_type": "limit_error",
+                    "hint": f"Ожидаемый предел: {result['expected']}"}, None
+        if not result["answer_ok"]:
+            metrics.limit_verdicts.inc(verdict="wrong_answer")
+            return {"is_correct": False, "error_type": "answer_error",
+                    "hint": f"После 'LIMIT' результат должен быть: {result['computed']}"}, None
+        metrics.limit_verdicts.inc(verdict="correct")
+        return {"is_correct": True, "error_type": None, "hint": ""}, None
+
+    if session.fingerprint is None:
+        prev_fingerprint, curr_fingerprint = run_cas("step_fingerprints", [session.last_expr, curr_expr],
+                                                     timeout=Config.CAS_STEP_TIMEOUT)
+    else:
+        prev_fingerprint = session.fingerprint
+        curr_fingerprint, = run_cas("step_fingerprints", [curr_expr], timeout=Config.CAS_STEP_TIMEOUT)
+    verdict = prejudge_pair(prev_fingerprint, curr_fingerprint,
+                            known_equivalent_pairs(pairs_to_look_up([prev_fingerprint, curr_fingerprint])))
+    if verdict is not None:
+        equivalent, decided_by = verdict
+        stage_stats.record({"decided_by": decided_by})
+        canonical = None
+    elif session.canonical is not None:
+        result = run_cas("compare_with_canonical", session.canonical, curr_expr, timeout=Config.CAS_STEP_TIMEOUT)
+        equivalent, canonical = result["equivalent"], result["canonical"]
+        curr_fingerprint = curr_fingerprint or result["curr_fingerprint"]
+    else:
+        result = run_cas("compare_steps", session.last_expr, curr_expr, timeout=Config.CAS_STEP_TIMEOUT)
+        equivalent, canonical = result["equivalent"], None
+        curr_fingerprint = curr_fingerprint or result["curr_fingerprint"]
+    metrics.step_verdicts.inc(verdict="equivalent" if equivalent else "not_equivalent")
+    if not equivalent:
+        return {
+            "is_correct": False,
+            "error_type": "algebraic_error",
+            "hint": "Ошибка в алгебраических преобразованиях. Проверьте сокращение или вынесение множителя."
+        }, curr_fingerprint
+    session.advance(curr_expr, canonical, curr_fingerprint)
+    return {"is_correct": True, "error_type": None, "hint": ""}, curr_fingerprint
+
+@routes_bp.route("/tasks/<int:task_id>/start", methods=["POST"])
+@login_required
 def start_solution(task_id):
-    solution = Solution(task_id=task_id, status="in_progress")
-    db.session.add(solution)
-    db.session.commit()
+    task = Task.query.get(task_id)
+    if not task:
+        return jsonify({"message": "Task not found"}), 404
+    with write_transaction():
+        solution = Solution(task_id=task_id, user_id=g.current_user["id"], status="in_progress")
+        db.session.add(solution)
+        db.session.flush()  # created_at нужен для дневного агрегата
+        delta = StatsDelta()
+        delta.solution(task_id, solution.user_id, solution.created_at)
+        delta.apply()
     return jsonify({"solution_id": solution.id})
 
-@app.route("/solutions/<int:solution_id>/check_step", methods=["POST"])
+@routes_bp.route("/solutions/<int:solution_id>/check_step", methods=["POST"])
+@login_required
+@admission_required
 def check_solution_step(solution_id):
-    data = request.json
-    step_number = data.get("step_number")
-    prev_expr = data.get("prev_expr", "")
+    """
+    Проверяет очередной шаг решения. Ожидается JSON {"curr_expr": "...", "step_number": N}.
+    Предыдущий принятый шаг хранится на сервере в сессии решения (уже упрощённым),
+    поэтому prev_expr передавать не нужно; если он передан, используется только для восстановления
+    сессии решения, у которого ещё нет сохранённых шагов.
+    Номер шага назначает сервер (следующий после сохранённых); step_number клиента, если передан,
+    должен с ним совпадать, иначе — 409 с ожидаемым номером. Сессия в памяти процесса сверяется
+    с последним сохранённым шагом при каждом запросе: шаги могли записать другие воркеры.
+    """
+    data = request.json or {}
     curr_expr = data.get("curr_expr", "")
 
-    result = check_step(prev_expr, curr_expr)
-    
-    step = Step(solution_id=solution_id, step_number=step_number,
-                input_expr=curr_expr, is_correct=result["is_correct"],
-                error_type=result["error_type"], hint=result["hint"])
-    
-    db.session.add(step)
-    db.session.commit()
+    solution = Solution.query.get(solution_id)
+    if not solution:
+        return jsonify({"message": "Solution not found"}), 404
+    owner_id = solution.user_id
+    if owner_id != g.current_user["id"]:
+        return jsonify({"message": "Forbidden"}), 403
 
+    with _solution_locks[solution_id % len(_solution_locks)]:
+        try:
+            result = _check_and_store(solution, curr_expr, data)
+        except StepConflict as e:
+            step_sessions.drop(solution_id)
+            return jsonify({"message": str(e), **e.extra}), 409
     return jsonify(result)
 
-@app.route("/solutions/<int:solution_id>/finish", methods=["POST"])
+def _check_and_store(solution, curr_expr, data):
+    """Проверяет шаг относительно актуальной сессии и записывает его; расхождение с БД — StepConflict."""
+    last_step = _last_step(solution.id)
+    session = step_sessions.get(solution.id)
+    if session is None or session.last_step_id != (last_step.id if last_step else None):
+        session = _restore_session(solution, last_step, data.get("prev_expr"))
+    step_number = session.step_number + 1
+    if data.get("step_number") not in (None, step_number):
+        raise StepConflict(f"Ожидался шаг {step_number}", expected_step_number=step_number)
+
+    curr_fingerprint = None
+    try:
+        result, curr_fingerprint = _check_next_step(session, curr_expr)
+    except CASTimeout as e:
+        metrics.step_verdicts.inc(verdict="timeout")
+        result = {"is_correct": False, "error_type": "timeout",
+                  "hint": f"Превышено время проверки: {e}. Попробуйте упростить шаг."}
+    except Exception as e:
+        metrics.step_verdicts.inc(verdict="parse_error")
+        metrics.parse_errors.inc(source="step")
+        result = {"is_correct": False, "error_type": "parse_error", "hint": f"Ошибка парсинга: {str(e)}"}
+
+    with write_transaction():
+        # Пока шла проверка, шаг мог записать запрос в другом воркере
+        latest = _last_step(solution.id)
+        if (latest.id if latest else None) != session.last_step_id:
+            raise StepConflict("Решение изменилось во время проверки, повторите шаг")
+        step = Step(solution_id=solution.id, step_number=step_number,
+                    input_expr=curr_expr, is_correct=result["is_correct"],
+                    error_type=result["error_type"], hint=result["hint"],
+                    fingerprint=curr_fingerprint)
+        db.session.add(step)
+        if not result["is_correct"]:
+            delta = StatsDelta()
+            delta.solution(solution.task_id, solution.user_id, None, attempts=0,
+                           error_types=[result["error_type"]])
+            delta.apply()
+        db.session.flush()
+        step_id = step.id
+    session.last_step_id = step_id
+    session.step_number = step_number
+    return result
+
+@routes_bp.route("/solutions/<int:solution_id>/finish", methods=["POST"])
+@login_required
 def finish_solution(solution_id):
-    solution = Solution.query.get(solution_id)
-    solution.status = "completed"
-    db.session.commit()
+    with write_transaction():
+        solution = Solution.query.get(solution_id)
+        if not solution:
+            return jsonify({"message": "Solution not found"}), 404
+        if solution.user_id != g.current_user["id"]:
+            return jsonify({"message": "Forbidden"}), 403
+        if solution.status != "completed":
+            delta = StatsDelta()
+            delta.solution(solution.task_id, solution.user_id, solution.created_at, "completed", attempts=0)
+            delta.apply()
+        solution.status = "completed"
+    step_sessions.drop(solution_id)
     return jsonify({"message": "Решение завершено!"})
-
-if __name__ == "__main__":
-    with app.app_context():
-        db.create_all()
-    app.run(debug=True)
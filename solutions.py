@@ -1,146 +1,465 @@
+import json
 import logging
-import sympy as sp
-from flask import Blueprint, request, jsonify
-from models import db, Task, Solution, Step
-from checker import safe_sympify  # функции проверки из checker.py
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from flask import Blueprint, Response, request, jsonify, g, stream_with_context
+from config import Config
+from models import Task
+from persistence import save_checked_solution, save_checked_solutions, known_equivalent_pairs
+from cas_pool import cas_pool, CASError, CASTimeout  # проверки из checker.py выполняются в пуле процессов
+from checker import stage_stats, normalize_expr_text
+import fingerprint as fp
+import metrics
+from utils.Auth.auth import login_required
+from admission import admission_required
 
 solutions_bp = Blueprint('solutions', __name__, url_prefix='/api/solutions')
 
-@solutions_bp.route('/check', methods=['POST'])
-def check_solution():
-    """
-    Проверяет полное решение (с шагами) студента и сохраняет его в БД.
-    Ожидается JSON вида:
-    {
-        "taskId": <идентификатор задачи>,
-        "steps": [
-            "шаг 1", "шаг 2", ..., "LIMIT", "окончательный ответ"
-        ]
+def _timeout_error(step_number, exc):
+    """Отдельный вердикт для шага, проверка которого не уложилась в таймаут."""
+    return {
+        "step": step_number,
+        "error": "Превышено время проверки",
+        "error_type": "timeout",
+        "details": str(exc),
+        "hint": "Выражение слишком сложное для автоматической проверки. Попробуйте упростить шаг."
     }
-    Если ошибок нет – возвращает success: true, иначе success: false с описанием ошибок.
+
+def run_cas(op, *args, timeout):
     """
-    data = request.json
-    logging.info("Получен запрос на проверку решения: %s", data)
+    Вызов операции checker в CAS-пуле с учётом статистики стадий проверки шагов
+    и гистограмм времени фаз (timings из результата).
+    """
+    result = cas_pool.run(op, *args, timeout=timeout)
+    if isinstance(result, dict):
+        if "decided_by" in result:
+            stage_stats.record(result)
+        if "timings" in result:
+            metrics.observe_phases(result["timings"])
+        if "limit_engine" in result:
+            metrics.limit_engines.inc(engine=result["limit_engine"])
+    return result
 
-    if not data or "taskId" not in data or "steps" not in data:
-        return jsonify({"error": "Неверный формат запроса"}), 400
+def split_steps(steps):
+    """Возвращает (алгебраические шаги до маркера LIMIT, найден ли LIMIT)."""
+    algebraic_steps = []
+    for step in steps:
+        if step == "LIMIT":
+            return algebraic_steps, True
+        algebraic_steps.append(step)
+    return algebraic_steps, False
 
-    task_id = data["taskId"]
-    steps = data["steps"]
+def step_fingerprints(steps, run=run_cas):
+    """
+    Отпечатки алгебраических шагов (до LIMIT) по порядку. Считаются в CAS-пуле с таймаутом шага:
+    разбор и вычисление в точках зависят от ввода и в потоке веб-сервера не выполняются.
+    Если операция не уложилась в таймаут, отпечатков нет (None) — iter_verdicts дополнит их
+    из результатов сравнения шагов.
+    """
+    algebraic_steps = split_steps(steps)[0]
+    if not algebraic_steps:
+        return []
+    try:
+        return run("step_fingerprints", algebraic_steps, timeout=Config.CAS_STEP_TIMEOUT)
+    except CASError as e:
+        logging.warning("Отпечатки шагов не вычислены: %s", e)
+        return [None] * len(algebraic_steps)
 
-    if not isinstance(steps, list) or any(not isinstance(s, str) for s in steps):
-        return jsonify({"error": "steps должен быть массивом строк"}), 400
+def pairs_to_look_up(fingerprints):
+    """Соседние пары, которые отпечатки не решили и которые стоит поискать среди проверенных ранее."""
+    return {(a, b) for a, b in zip(fingerprints, fingerprints[1:]) if fp.compare(a, b) is None and a and b}
 
-    task = Task.query.get(task_id)
-    if not task:
-        return jsonify({"error": "Задача не найдена"}), 404
+def plan_spec(task):
+    """
+    Ключ плана проверки задачи (checker.compile_plan): план собирается один раз на процесс
+    и перестраивается сам, если у задачи изменились выражение, limitVar или ожидаемый предел.
+    """
+    return (task.expression, task.limitVar, task.expected_limit)
 
-    x = sp.Symbol('x')
-    errors = []  # соберем ошибки по шагам
-    algebraic_steps = []
-    found_limit = False
+def prejudge_pair(prev_fingerprint, curr_fingerprint, known_pairs):
+    """
+    Вердикт по паре шагов без CAS: (эквивалентны ли, чем решено) или None.
+    Отпечатки решают сами; иначе помогает сохранённый вердикт прежней проверки той же пары форм.
+    """
+    same = fp.compare(prev_fingerprint, curr_fingerprint)
+    if same is not None:
+        return same, "fingerprint"
+    if (prev_fingerprint, curr_fingerprint) in known_pairs:
+        return True, "stored_verdict"
+    return None
 
-    for step in steps:
-        if step == "LIMIT":
-            found_limit = True
-            break
-        algebraic_steps.append(step)
+def _transformation_error(step_number, prev, curr):
+    return {
+        "step": step_number,
+        "error": "Некорректное преобразование",
+        "error_type": "algebraic_error",
+        "expected": prev,
+        "received": curr,
+        "hint": f"Допустимая эквивалентная форма: {prev}"
+    }
+
+def iter_verdicts(steps, plan, run=run_cas, fingerprints=None, known_pairs=frozenset(),
+                  stop_at_first_error=False):
+    """
+    Проверяет цепочку шагов и предел, выдавая вердикты по мере вычисления:
+    {"event": "step", "step": N, "equivalent": bool | None, "error": {...} | None} для каждой пары шагов
+    и {"event": "limit", "step": N, "computed": str | None, "error": {...} | None} для предела.
+    У каждой ошибки есть error_type (algebraic_error, parse_error, timeout, limit_error, answer_error) —
+    его сохраняют шаги и по нему считается статистика ошибок.
+    plan — описание задачи из plan_spec(task): предел считается в точке её limitVar.
+    run(op, *args, timeout=...) выполняет операцию checker (по умолчанию в CAS-пуле; пакетная
+    проверка подставляет вариант с дедупликацией). fingerprints — отпечатки алгебраических шагов,
+    Недостающие отпечатки (None) дополняются на месте из результатов compare_steps.
+    known_pairs — пары отпечатков, эквивалентность которых уже подтверждалась (known_equivalent_pairs);
+    такие пары в CAS не отправляются. При stop_at_first_error после первой ошибки остальные пары
+    и предел не проверяются.
+    """
+    algebraic_steps, found_limit = split_steps(steps)
 
     if not algebraic_steps:
-        return jsonify({
-            "success": False,
-            "errors": [{"step": 1, "error": "Нет алгебраических шагов", "hint": "Добавьте хотя бы один шаг"}]
-        }), 200
+        metrics.solution_verdicts.inc(status="empty")
+        yield {"event": "step", "step": 1, "equivalent": None,
+               "error": {"step": 1, "error": "Нет алгебраических шагов", "error_type": "empty_solution",
+                         "hint": "Добавьте хотя бы один шаг"}}
+        return
 
-    # Проверка последовательных алгебраических шагов
+    if fingerprints is None:
+        fingerprints = step_fingerprints(steps)
+
+    has_errors = False
+    # Проверка последовательных алгебраических шагов (в CAS-пуле, с таймаутом на шаг)
     for i in range(len(algebraic_steps) - 1):
         prev_expr = algebraic_steps[i]
         curr_expr = algebraic_steps[i + 1]
-        try:
-            prev_sym = sp.simplify(safe_sympify(prev_expr))
-            curr_sym = sp.simplify(safe_sympify(curr_expr))
-            if not prev_sym.equals(curr_sym):
-                errors.append({
+        equivalent = None
+        error = None
+        verdict = prejudge_pair(fingerprints[i], fingerprints[i + 1], known_pairs)
+        if verdict is not None:
+            equivalent, decided_by = verdict
+            stage_stats.record({"decided_by": decided_by})
+            metrics.step_verdicts.inc(verdict="equivalent" if equivalent else "not_equivalent")
+            if not equivalent:
+                error = _transformation_error(i + 1, prev_expr, curr_expr)
+        else:
+            try:
+                result = run("compare_steps", prev_expr, curr_expr, timeout=Config.CAS_STEP_TIMEOUT)
+                fingerprints[i] = fingerprints[i] or result["prev_fingerprint"]
+                fingerprints[i + 1] = fingerprints[i + 1] or result["curr_fingerprint"]
+                equivalent = result["equivalent"]
+                metrics.step_verdicts.inc(verdict="equivalent" if equivalent else "not_equivalent")
+                if not equivalent:
+                    error = _transformation_error(i + 1, result["prev"], result["curr"])
+            except CASTimeout as e:
+                metrics.step_verdicts.inc(verdict="timeout")
+                error = _timeout_error(i + 1, e)
+            except Exception as e:
+                metrics.step_verdicts.inc(verdict="parse_error")
+                metrics.parse_errors.inc(source="step")
+                error = {
                     "step": i + 1,
-                    "error": "Некорректное преобразование",
-                    "expected": str(prev_sym),
-                    "received": str(curr_sym),
-                    "hint": f"Допустимая эквивалентная форма: {prev_sym}"
-                })
-        except Exception as e:
-            errors.append({
-                "step": i + 1,
-                "error": "Ошибка в выражении",
-                "details": str(e),
-                "hint": "Проверьте правильность записи"
-            })
+                    "error": "Ошибка в выражении",
+                    "error_type": "parse_error",
+                    "details": str(e),
+                    "hint": "Проверьте правильность записи"
+                }
+        has_errors = has_errors or error is not None
+        yield {"event": "step", "step": i + 1, "equivalent": equivalent, "error": error}
+        if error is not None and stop_at_first_error:
+            metrics.solution_verdicts.inc(status="error")
+            return
 
-    computed_limit = None
     # Если найден маркер LIMIT – проверяем предел
     if found_limit:
+        # Окончательный ответ сравниваем, только если в шагах ошибок нет
+        answer = steps[-1] if steps[-1] != "LIMIT" and not has_errors else None
+        computed_limit = None
+        error = None
         try:
-            last_expr = sp.simplify(safe_sympify(algebraic_steps[-1]))
-            computed_limit = sp.limit(last_expr, x, sp.oo)
-            expected_limit = sp.simplify(safe_sympify(task.expected_limit))
+            result = run("evaluate_task_limit", plan, algebraic_steps[-1], answer,
+                         timeout=Config.CAS_LIMIT_TIMEOUT)
+            computed_limit = result["computed"]
             logging.info(f"Вычисленный предел: {computed_limit}")
-            if not sp.simplify(computed_limit - expected_limit).is_zero:
-                errors.append({
+            metrics.limit_verdicts.inc(verdict=_limit_verdict(result))
+            if not result["limit_ok"]:
+                error = {
                     "step": len(steps),
                     "error": "Неверный предел",
-                    "expected": str(expected_limit),
-                    "received": str(computed_limit),
-                    "hint": f"Ожидаемый результат: {expected_limit}"
-                })
-            # Если последний шаг не равен "LIMIT" и ошибок нет – сравниваем окончательный ответ
-            if steps[-1] != "LIMIT" and not errors:
-                student_result = sp.simplify(safe_sympify(steps[-1]))
-                if not sp.simplify(student_result - computed_limit).is_zero:
-                    errors.append({
-                        "step": len(steps),
-                        "error": "Некорректный окончательный ответ",
-                        "expected": str(computed_limit),
-                        "received": str(student_result),
-                        "hint": f"После 'LIMIT' результат должен быть: {computed_limit}"
-                    })
+                    "error_type": "limit_error",
+                    "expected": result["expected"],
+                    "received": computed_limit,
+                    "hint": f"Ожидаемый результат: {result['expected']}"
+                }
+            elif result["answer_ok"] is False:
+                error = {
+                    "step": len(steps),
+                    "error": "Некорректный окончательный ответ",
+                    "error_type": "answer_error",
+                    "expected": computed_limit,
+                    "received": result["answer"],
+                    "hint": f"После 'LIMIT' результат должен быть: {computed_limit}"
+                }
+        except CASTimeout as e:
+            metrics.limit_verdicts.inc(verdict="timeout")
+            error = _timeout_error(len(steps), e)
         except Exception as e:
+            metrics.limit_verdicts.inc(verdict="parse_error")
+            metrics.parse_errors.inc(source="limit")
             logging.error(f"Ошибка вычисления предела: {str(e)}")
-            errors.append({
+            error = {
                 "step": len(steps),
                 "error": "Ошибка предельного перехода",
+                "error_type": "parse_error",
                 "details": str(e),
                 "hint": "Проверьте выражение перед LIMIT"
-            })
-
-    # Создаем запись решения (замените user_id на актуальный, например, из сессии)
-    solution = Solution(task_id=task.id, user_id=1, status="in_progress")
-    db.session.add(solution)
-    db.session.commit()
-
-    # Сохраняем каждый шаг решения в таблице Step
-    for i, step in enumerate(steps, start=1):
-        # Если для данного шага есть ошибка, её можно передать из errors (если таковая найдена для этого шага)
-        # Здесь для упрощения: если глобальные ошибки обнаружены – все шаги считаются некорректными
-        is_correct = False if errors else True
-        new_step = Step(
-            solution_id=solution.id,
-            step_number=i,
-            input_expr=step,
-            is_correct=is_correct,
-            error_type=None if is_correct else "ошибка",  # Можно дополнить более детально
-            hint=""
-        )
-        db.session.add(new_step)
-    db.session.commit()
+            }
+        has_errors = has_errors or error is not None
+        yield {"event": "limit", "step": len(steps), "computed": computed_limit, "error": error}
+
+    metrics.solution_verdicts.inc(status="error" if has_errors else "completed")
+
+def evaluate_solution(steps, plan, run=run_cas, fingerprints=None, known_pairs=frozenset()):
+    """
+    Проверяет цепочку шагов и предел целиком (см. iter_verdicts).
+    Возвращает (errors, computed_limit).
+    """
+    errors = []  # соберем ошибки по шагам
+    computed_limit = None
+    for verdict in iter_verdicts(steps, plan, run, fingerprints, known_pairs):
+        if verdict["error"] is not None:
+            errors.append(verdict["error"])
+        if verdict["event"] == "limit":
+            computed_limit = verdict["computed"]
+    return errors, computed_limit
+
+def _limit_verdict(result):
+    if not result["limit_ok"]:
+        return "wrong_limit"
+    if result["answer_ok"] is False:
+        return "wrong_answer"
+    return "correct"
+
+def _success_message(computed_limit):
+    return f"Решение верное. Предел = {computed_limit}" if computed_limit is not None else "Решение верное"
+
+def _load_submission(data):
+    """Проверяет формат запроса на проверку решения: (task, steps, None) или (None, None, ответ с ошибкой)."""
+    if not data or "taskId" not in data or "steps" not in data:
+        return None, None, (jsonify({"error": "Неверный формат запроса"}), 400)
+
+    steps = data["steps"]
+    if not isinstance(steps, list) or any(not isinstance(s, str) for s in steps):
+        return None, None, (jsonify({"error": "steps должен быть массивом строк"}), 400)
+
+    task = Task.query.get(data["taskId"])
+    if not task:
+        return None, None, (jsonify({"error": "Задача не найдена"}), 404)
+    return task, steps, None
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+@solutions_bp.route('/check', methods=['POST'])
+@login_required
+@admission_required
+def check_solution():
+    """
+    Проверяет полное решение (с шагами) студента и сохраняет его в БД.
+    Ожидается JSON вида:
+    {
+        "taskId": <идентификатор задачи>,
+        "steps": [
+            "шаг 1", "шаг 2", ..., "LIMIT", "окончательный ответ"
+        ]
+    }
+    Если ошибок нет – возвращает success: true, иначе success: false с описанием ошибок.
+    """
+    data = request.json
+    logging.info("Получен запрос на проверку решения: %s", data)
+    task, steps, error_response = _load_submission(data)
+    if error_response:
+        return error_response
+
+    fingerprints = step_fingerprints(steps)
+    known_pairs = known_equivalent_pairs(pairs_to_look_up(fingerprints))
+    errors, computed_limit = evaluate_solution(steps, plan_spec(task),
+                                               fingerprints=fingerprints, known_pairs=known_pairs)
+    if not split_steps(steps)[0]:
+        # Решение без алгебраических шагов не сохраняем
+        return jsonify({"success": False, "errors": errors}), 200
+
+    # Решение, шаги, их отпечатки и итоговый статус сохраняются одной транзакцией
+    solution_id = save_checked_solution(task.id, g.current_user["id"], steps, errors, fingerprints)
 
     if errors:
-        solution.status = "error"
-        db.session.commit()
-        return jsonify({"success": False, "errors": errors, "solution_id": solution.id}), 200
+        return jsonify({"success": False, "errors": errors, "solution_id": solution_id}), 200
 
-    solution.status = "completed"
-    db.session.commit()
     return jsonify({
         "success": True,
-        "message": f"Решение верное. Предел = {computed_limit}" if computed_limit is not None else "Решение верное",
-        "solution_id": solution.id
+        "message": _success_message(computed_limit),
+        "solution_id": solution_id
+    }), 200
+
+@solutions_bp.route('/check_stream', methods=['POST'])
+@login_required
+@admission_required
+def check_solution_stream():
+    """
+    Потоковая проверка решения (Server-Sent Events). Тело запроса — как у /check, плюс
+    необязательный "stopAtFirstError": true (или ?stop_at_first_error=1): после первой ошибки
+    остальные шаги и предел не проверяются.
+    События: "step" — вердикт по паре шагов сразу после проверки, "limit" — предел,
+    "result" — итог в формате /check (с "stopped": true, если проверка остановлена досрочно).
+    """
+    data = request.json
+    task, steps, error_response = _load_submission(data)
+    if error_response:
+        return error_response
+    stop_at_first_error = bool(data.get("stopAtFirstError")) or request.args.get("stop_at_first_error") == "1"
+
+    task_id, plan, user_id = task.id, plan_spec(task), g.current_user["id"]
+    fingerprints = step_fingerprints(steps)
+    known_pairs = known_equivalent_pairs(pairs_to_look_up(fingerprints))
+
+    def generate():
+        errors = []
+        computed_limit = None
+        stopped = False
+        for verdict in iter_verdicts(steps, plan, fingerprints=fingerprints, known_pairs=known_pairs,
+                                     stop_at_first_error=stop_at_first_error):
+            if verdict["error"] is not None:
+                errors.append(verdict["error"])
+                stopped = stop_at_first_error and verdict["event"] == "step"
+            if verdict["event"] == "limit":
+                computed_limit = verdict["computed"]
+            yield _sse(verdict["event"], verdict)
+
+        result = {"success": not errors}
+        if errors:
+            result["errors"] = errors
+        else:
+            result["message"] = _success_message(computed_limit)
+        if stopped:
+            result["stopped"] = True
+        if split_steps(steps)[0]:
+            result["solution_id"] = save_checked_solution(task_id, user_id, steps, errors, fingerprints)
+        yield _sse("result", result)
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+class _DedupRunner:
+    """
+    Обёртка над run_cas для пакетной проверки: одинаковые операции (с точностью до пробелов
+    в выражениях) выполняются один раз, остальные потоки ждут и получают тот же результат
+    или то же исключение.
+    """
+
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+        self.requested = 0
+
+    def __call__(self, op, *args, timeout):
+        key = (op,) + tuple(normalize_expr_text(a) if isinstance(a, str) else a for a in args)
+        with self._lock:
+            self.requested += 1
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._futures[key] = future
+        if owner:
+            try:
+                future.set_result(run_cas(op, *args, timeout=timeout))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    @property
+    def unique(self):
+        return len(self._futures)
+
+def _task_key(task_id):
+    try:
+        return int(task_id)
+    except (TypeError, ValueError):
+        return None
+
+@solutions_bp.route('/check_batch', methods=['POST'])
+@login_required
+@admission_required
+def check_batch():
+    """
+    Пакетная проверка решений. Ожидается JSON {"submissions": [{"taskId": ..., "steps": [...]}, ...]}.
+    Одинаковые пары шагов и пределы во всём пакете проверяются один раз (параллельно в CAS-пуле),
+    вердикты раздаются всем решениям, а все решения и шаги сохраняются одной транзакцией.
+    Ответ — список результатов в том же порядке, в формате /check.
+    """
+    data = request.json
+    submissions = data.get("submissions") if isinstance(data, dict) else None
+    if not isinstance(submissions, list) or not submissions:
+        return jsonify({"error": "submissions должен быть непустым массивом"}), 400
+    if len(submissions) > Config.BATCH_MAX_SUBMISSIONS:
+        return jsonify({"error": f"Не более {Config.BATCH_MAX_SUBMISSIONS} решений в одном пакете"}), 400
+
+    task_ids = {_task_key(s.get("taskId")) for s in submissions if isinstance(s, dict)}
+    tasks = {t.id: t for t in Task.query.filter(Task.id.in_(task_ids - {None})).all()}
+
+    results = [None] * len(submissions)
+    to_check = []
+    for index, submission in enumerate(submissions):
+        if not isinstance(submission, dict) or "taskId" not in submission or "steps" not in submission:
+            results[index] = {"error": "Неверный формат запроса"}
+            continue
+        steps = submission["steps"]
+        if not isinstance(steps, list) or any(not isinstance(s, str) for s in steps):
+            results[index] = {"error": "steps должен быть массивом строк"}
+            continue
+        task = tasks.get(_task_key(submission["taskId"]))
+        if not task:
+            results[index] = {"error": "Задача не найдена"}
+            continue
+        to_check.append((index, task, steps))
+
+    runner = _DedupRunner()
+    workers = max(1, min(len(to_check), Config.BATCH_THREADS))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Отпечатки — в CAS-пуле, сохранённые вердикты — в этом потоке (нужен контекст приложения)
+        fingerprints = list(executor.map(lambda item: step_fingerprints(item[2]), to_check))
+        known_pairs = known_equivalent_pairs(set().union(*map(pairs_to_look_up, fingerprints)))
+        checked = list(executor.map(
+            lambda item: evaluate_solution(item[0][2], plan_spec(item[0][1]), runner, item[1], known_pairs),
+            zip(to_check, fingerprints)))
+
+    to_save = []
+    for (index, task, steps), step_fps, (errors, computed_limit) in zip(to_check, fingerprints, checked):
+        if not split_steps(steps)[0]:
+            results[index] = {"success": False, "errors": errors}
+            continue
+        results[index] = {"success": not errors, "errors": errors, "computed_limit": computed_limit}
+        to_save.append((index, task.id, steps, errors, step_fps))
+
+    user_id = g.current_user["id"]
+    solution_ids = save_checked_solutions([(task_id, user_id, steps, errors, step_fps)
+                                           for _, task_id, steps, errors, step_fps in to_save])
+    for (index, *_), solution_id in zip(to_save, solution_ids):
+        result = results[index]
+        result["solution_id"] = solution_id
+        computed_limit = result.pop("computed_limit")
+        if result["success"]:
+            del result["errors"]
+            result["message"] = _success_message(computed_limit)
+
+    return jsonify({
+        "results": results,
+        "checks_requested": runner.requested,
+        "checks_performed": runner.unique,
     }), 200
+
+@solutions_bp.route('/stats', methods=['GET'])
+def check_stats():
+    """
+    Статистика проверки шагов в этом процессе: время по стадиям (parse, numeric, simplify, equivalence)
+    и доля вердиктов, вынесенных каждой стадией, а также состояние CAS-пула.
+    """
+    return jsonify({"steps": stage_stats.snapshot(), "cas_pool": cas_pool.stats()}), 200
@@ -0,0 +1,89 @@
+import time
+import threading
+from collections import OrderedDict
+from config import Config
+
+
+class StepSession:
+    """
+    Состояние пошаговой проверки одного решения: последний принятый шаг, его каноническая форма
+    и отпечаток (оба вычисляются в CAS-пуле; None — ещё не известны). last_step_id — id последней
+    строки steps, которую видела сессия: если в БД последним оказался другой шаг (его записал
+    другой воркер), сессия устарела и восстанавливается из БД.
+    """
+    __slots__ = ("solution_id", "task_id", "user_id", "last_expr", "canonical", "fingerprint", "step_number",
+                 "after_limit", "last_step_id", "touched")
+
+    def __init__(self, solution_id, task_id, user_id, last_expr, canonical, step_number=0, fingerprint=None):
+        self.solution_id = solution_id
+        self.task_id = task_id
+        self.user_id = user_id
+        self.last_expr = last_expr
+        self.canonical = canonical
+        self.fingerprint = fingerprint
+        self.step_number = step_number
+        self.after_limit = False
+        self.last_step_id = None
+        self.touched = time.monotonic()
+
+    def advance(self, expr, canonical, fingerprint=None):
+        """Делает шаг expr последним принятым (canonical и fingerprint могут быть None — ещё не посчитаны)."""
+        self.last_expr = expr
+        self.canonical = canonical
+        self.fingerprint = fingerprint
+
+
+class StepSessionStore:
+    """
+    Ограниченное хранилище сессий с вытеснением по TTL и по LRU при переполнении.
+    Хранится в памяти процесса; если сессии нет (истекла или запрос попал в другой воркер),
+    её восстанавливают из БД.
+    """
+
+    def __init__(self, max_sessions=10000, ttl=1800):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _expire(self, now):
+        while self._sessions:
+            solution_id, session = next(iter(self._sessions.items()))
+            if now - session.touched <= self.ttl:
+                break
+            del self._sessions[solution_id]
+            self.evictions += 1
+
+    def get(self, solution_id):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(solution_id)
+            if session is not None:
+                session.touched = now
+                self._sessions.move_to_end(solution_id)
+            return session
+
+    def put(self, session):
+        now = time.monotonic()
+        with self._lock:
+            session.touched = now
+            self._sessions[session.solution_id] = session
+            self._sessions.move_to_end(session.solution_id)
+            self._expire(now)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def drop(self, solution_id):
+        with self._lock:
+            self._sessions.pop(solution_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"sessions": len(self._sessions), "max_sessions": self.max_sessions,
+                    "ttl": self.ttl, "evictions": self.evictions}
+
+
+step_sessions = StepSessionStore(max_sessions=Config.STEP_SESSION_MAX, ttl=Config.STEP_SESSION_TTL)
@@ -0,0 +1,182 @@
+"""
+Пакетный импорт задач из JSON или CSV (POST /api/tasks/import в tasks.py и flask tasks-import).
+
+Каждая задача проверяется: обязательные поля, разбор expression, limitVar и expected_limit.
+Эталонный предел (checker.reference_limit) считается в пуле процессов, и расхождения
+с expected_limit помечаются. Допустимые задачи вставляются одной транзакцией.
+
+Режимы для расхождений (mismatch): "skip" — не импортировать (по умолчанию),
+"keep" — импортировать с указанным expected_limit, "fix" — с вычисленным пределом.
+"""
+import io
+import os
+import csv
+import json
+import signal
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import click
+from sqlalchemy import select
+from config import Config
+from models import db, Task
+from db_config import write_transaction
+from math_parser import parse_math, parse_limit_var
+
+REQUIRED_FIELDS = ["title", "expression", "limitVar", "expected_limit"]
+MISMATCH_MODES = ("skip", "keep", "fix")
+
+
+class ImportFormatError(ValueError):
+    """Файл задач не удалось прочитать как JSON или CSV."""
+
+
+def load_records(text, fmt=None):
+    """Список задач-словарей из JSON (список или {"tasks": [...]}) или CSV с заголовком."""
+    fmt = fmt or ("json" if text.lstrip()[:1] in ("[", "{") else "csv")
+    if fmt == "json":
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise ImportFormatError(f"Некорректный JSON: {e}")
+        records = data.get("tasks") if isinstance(data, dict) else data
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            raise ImportFormatError('Ожидался список задач или {"tasks": [...]}')
+        return records
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(text))
+        missing = [f for f in REQUIRED_FIELDS if f not in (reader.fieldnames or [])]
+        if missing:
+            raise ImportFormatError(f"В заголовке CSV нет колонок: {', '.join(missing)}")
+        return list(reader)
+    raise ImportFormatError("format: json или csv")
+
+
+def _static_error(record):
+    """Ошибка, найденная без вычисления предела (поля и разбор), или None."""
+    for field in REQUIRED_FIELDS:
+        if not str(record.get(field) or "").strip():
+            return f"{field} is required"
+    for field, parse in (("expression", parse_math), ("limitVar", parse_limit_var), ("expected_limit", parse_math)):
+        try:
+            parse(str(record[field]))
+        except Exception as e:
+            return f"{field}: {e}"
+    return None
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise _Timeout()
+
+
+def _reference_worker(args):
+    """Задание пула: эталонный предел одной задачи с ограничением времени (SIGALRM)."""
+    expression, limit_var, expected = args
+    import checker
+    use_alarm = hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, Config.IMPORT_LIMIT_TIMEOUT)
+    try:
+        return checker.reference_limit(expression, limit_var, expected)
+    except _Timeout:
+        return {"error": f"Предел не вычислен за {Config.IMPORT_LIMIT_TIMEOUT} с"}
+    except Exception as e:
+        return {"error": f"Ошибка вычисления предела: {e}"}
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def compute_reference_limits(jobs, processes=None):
+    """Эталонные пределы для [(expression, limitVar, expected_limit), ...] в пуле процессов."""
+    if not jobs:
+        return []
+    processes = max(1, min(processes or Config.IMPORT_PROCESSES or os.cpu_count() or 1, len(jobs)))
+    context = multiprocessing.get_context(Config.CAS_START_METHOD)
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+        return list(pool.map(_reference_worker, jobs, chunksize=max(1, len(jobs) // (processes * 4))))
+
+
+def import_tasks(records, mismatch="skip", dry_run=False, processes=None):
+    """
+    Проверяет задачи и вставляет допустимые одной транзакцией. Возвращает отчёт:
+    {"imported": N, "results": [{"row", "title", "status", ...}]}, где status — imported,
+    mismatch, invalid, duplicate или ok (при dry_run).
+    """
+    existing = set(db.session.execute(select(Task.title)).scalars())
+    results = []
+    jobs = []
+    seen = set()
+    for row, record in enumerate(records, start=1):
+        result = {"row": row, "title": record.get("title")}
+        error = _static_error(record)
+        if error:
+            result.update(status="invalid", error=error)
+        elif record["title"] in existing or record["title"] in seen:
+            result.update(status="duplicate", error="Задача с таким названием уже есть")
+        else:
+            seen.add(record["title"])
+            jobs.append((row - 1, (str(record["expression"]), str(record["limitVar"]), str(record["expected_limit"]))))
+        results.append(result)
+
+    for (index, _), reference in zip(jobs, compute_reference_limits([job for _, job in jobs], processes)):
+        result = results[index]
+        if "error" in reference:
+            result.update(status="invalid", error=reference["error"])
+            continue
+        result.update(computed=reference["computed"], expected=str(records[index]["expected_limit"]),
+                      status="ok" if reference["matches"] else "mismatch")
+
+    to_insert = []
+    for result, record in zip(results, records):
+        if result["status"] == "ok" or (result["status"] == "mismatch" and mismatch != "skip"):
+            expected = result["computed"] if result["status"] == "mismatch" and mismatch == "fix" \
+                else str(record["expected_limit"])
+            to_insert.append((result, Task(
+                title=record["title"],
+                description=record.get("description") or "",
+                expression=str(record["expression"]),
+                limitVar=str(record["limitVar"]),
+                expected_limit=expected,
+            )))
+
+    if to_insert and not dry_run:
+        with write_transaction():
+            db.session.add_all([task for _, task in to_insert])
+            db.session.flush()
+            for result, task in to_insert:
+                result["task_id"] = task.id
+                result["mismatch"] = result["status"] == "mismatch"
+                result["status"] = "imported"
+    return {"imported": 0 if dry_run else len(to_insert), "results": results}
+
+
+def _describe(result):
+    if result["status"] == "mismatch" or result.get("mismatch"):
+        return f"expected_limit = {result['expected']}, вычислено {result['computed']}"
+    return result.get("error", "")
+
+
+def init_app(app):
+    @app.cli.command("tasks-import")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "fmt", type=click.Choice(["json", "csv"]), default=None)
+    @click.option("--mismatch", type=click.Choice(MISMATCH_MODES), default="skip")
+    @click.option("--dry-run", is_flag=True, help="Только проверить, ничего не записывать")
+    @click.option("--processes", type=int, default=None, help="Число процессов для вычисления пределов")
+    def tasks_import(path, fmt, mismatch, dry_run, processes):
+        """Импортирует задачи из JSON- или CSV-файла."""
+        with open(path, encoding="utf-8-sig") as f:
+            try:
+                records = load_records(f.read(), fmt)
+            except ImportFormatError as e:
+                raise click.ClickException(str(e))
+        report = import_tasks(records, mismatch=mismatch, dry_run=dry_run, processes=processes)
+        for result in report["results"]:
+            if result["status"] not in ("imported", "ok") or result.get("mismatch"):
+                click.echo(f"строка {result['row']} ({result['title']}): {result['status']}: {_describe(result)}")
+        click.echo(f"Импортировано задач: {report['imported']} из {len(records)}")
@@ -1,47 +1,127 @@
-from flask import Blueprint, request, jsonify
+import json
+import logging
+import time
+import bisect
+import hashlib
+import threading
+from flask import Blueprint, request, jsonify, Response
+from config import Config
 from models import db, Task
+from db_config import write_transaction
+from utils.Auth.auth import login_required, admin_required
+import task_import
+from cas_pool import cas_pool, CASTimeout
 
 tasks_bp = Blueprint('tasks', __name__, url_prefix='/api/tasks')
 
+def _task_to_dict(t):
+    return {
+        "id": t.id,
+        "title": t.title,
+        "description": t.description,
+        "expression": t.expression,
+        "limitVar": t.limitVar,
+        "expected_limit": t.expected_limit
+    }
+
+def _etag_for(payload):
+    return hashlib.sha1(payload).hexdigest()
+
+class _CatalogueSnapshot:
+    """Сериализованный список задач: готовое JSON-тело, задачи по id и ETag."""
+
+    def __init__(self, tasks):
+        self.tasks = [_task_to_dict(t) for t in tasks]
+        self.by_id = {t["id"]: t for t in self.tasks}
+        self.body = json.dumps({"tasks": self.tasks}, ensure_ascii=False).encode("utf-8")
+        # ETag вычисляется по содержимому, поэтому совпадает во всех воркерах
+        self.etag = _etag_for(self.body)
+        self.built_at = time.monotonic()
+
+_catalogue = None
+_catalogue_lock = threading.Lock()
+
+def get_catalogue():
+    """
+    Возвращает снимок каталога задач, перестраивая его при инвалидации или по истечении
+    TASK_CATALOGUE_TTL (изменения, сделанные другими воркерами, видны не позже чем через TTL).
+    """
+    global _catalogue
+    snapshot = _catalogue
+    if snapshot is not None and time.monotonic() - snapshot.built_at < Config.TASK_CATALOGUE_TTL:
+        return snapshot
+    with _catalogue_lock:
+        if _catalogue is snapshot:
+            _catalogue = _CatalogueSnapshot(Task.query.order_by(Task.id).all())
+        return _catalogue
+
+def invalidate_catalogue():
+    global _catalogue
+    with _catalogue_lock:
+        _catalogue = None
+
+def _json_response(body, etag):
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
 @tasks_bp.route('', methods=['GET'])
 def get_tasks():
-    tasks = Task.query.all()
-    tasks_list = []
-    for t in tasks:
-        tasks_list.append({
-            "id": t.id,
-            "title": t.title,
-            "description": t.description,
-            "expression": t.expression,
-            "limitVar": t.limitVar,
-            "expected_limit": t.expected_limit
-        })
-    return jsonify({"tasks": tasks_list}), 200
+    """
+    Список задач из снимка каталога. Поддерживает If-None-Match (304) и необязательную
+    пагинацию по курсору: ?limit=N&cursor=<id последней полученной задачи>.
+    """
+    catalogue = get_catalogue()
+    limit = request.args.get("limit", type=int)
+    cursor = request.args.get("cursor", type=int)
+    if limit is None and cursor is None:
+        return _json_response(catalogue.body, catalogue.etag)
+
+    limit = max(1, min(limit or Config.TASK_PAGE_MAX, Config.TASK_PAGE_MAX))
+    start = bisect.bisect_right([t["id"] for t in catalogue.tasks], cursor) if cursor is not None else 0
+    page = catalogue.tasks[start:start + limit]
+    next_cursor = page[-1]["id"] if start + limit < len(catalogue.tasks) and page else None
+    body = json.dumps({"tasks": page, "next_cursor": next_cursor}, ensure_ascii=False).encode("utf-8")
+    return _json_response(body, f"{catalogue.etag}-{start}-{limit}")
 
 @tasks_bp.route('/<int:task_id>', methods=['GET'])
 def get_task(task_id):
     """
     Добавленный эндпоинт для получения одной задачи по ID.
+    Отдаётся из того же снимка каталога.
     """
-    task = Task.query.get(task_id)
+    task = get_catalogue().by_id.get(task_id)
     if not task:
         return jsonify({"message": "Task not found"}), 404
-    return jsonify({
-        "id": task.id,
-        "title": task.title,
-        "description": task.description,
-        "expression": task.expression,
-        "limitVar": task.limitVar,
-        "expected_limit": task.expected_limit
-    }), 200
+    body = json.dumps(task, ensure_ascii=False).encode("utf-8")
+    return _json_response(body, _etag_for(body))
+
+def _validate_task(expression, limit_var, expected_limit):
+    """
+    Разбирает задачу и собирает её план проверки в CAS-пуле (с таймаутом, до открытия
+    транзакции записи). Ответ 400 при ошибке разбора или таймауте, иначе None.
+    """
+    try:
+        cas_pool.run("validate_task", expression, limit_var, expected_limit, timeout=Config.CAS_LIMIT_TIMEOUT)
+    except CASTimeout:
+        return jsonify({"message": "Invalid task: проверка не уложилась в отведённое время"}), 400
+    except Exception as e:  # CASError из пула, ошибка разбора — при CAS_POOL_SIZE=0
+        return jsonify({"message": f"Invalid task: {e}"}), 400
+    return None
 
 @tasks_bp.route('', methods=['POST'])
+@login_required
+@admin_required
 def create_task():
     data = request.json
     required_fields = ['title', 'expression', 'limitVar', 'expected_limit']
     for field in required_fields:
         if field not in data:
             return jsonify({"message": f"{field} is required"}), 400
+    error_response = _validate_task(data['expression'], data['limitVar'], data['expected_limit'])
+    if error_response:
+        return error_response
 
     new_task = Task(
         title=data['title'],
@@ -50,29 +130,69 @@ def create_task():
         limitVar=data['limitVar'],
         expected_limit=data['expected_limit']
     )
-    db.session.add(new_task)
-    db.session.commit()
+    with write_transaction():
+        db.session.add(new_task)
+    invalidate_catalogue()
     return jsonify({"message": "Task created successfully", "task_id": new_task.id}), 201
 
 @tasks_bp.route('/<int:task_id>', methods=['PUT'])
+@login_required
+@admin_required
 def update_task(task_id):
+    data = request.json
     task = Task.query.get(task_id)
     if not task:
         return jsonify({"message": "Task not found"}), 404
-    data = request.json
-    task.title = data.get('title', task.title)
-    task.description = data.get('description', task.description)
-    task.expression = data.get('expression', task.expression)
-    task.limitVar = data.get('limitVar', task.limitVar)
-    task.expected_limit = data.get('expected_limit', task.expected_limit)
-    db.session.commit()
+    spec = (data.get('expression', task.expression), data.get('limitVar', task.limitVar),
+            data.get('expected_limit', task.expected_limit))
+    error_response = _validate_task(*spec)
+    if error_response:
+        return error_response
+    with write_transaction():
+        task = Task.query.get(task_id)
+        if not task:
+            return jsonify({"message": "Task not found"}), 404
+        task.title = data.get('title', task.title)
+        task.description = data.get('description', task.description)
+        task.expression, task.limitVar, task.expected_limit = spec
+    invalidate_catalogue()
     return jsonify({"message": "Task updated successfully"}), 200
 
 @tasks_bp.route('/<int:task_id>', methods=['DELETE'])
+@login_required
+@admin_required
 def delete_task(task_id):
-    task = Task.query.get(task_id)
-    if not task:
-        return jsonify({"message": "Task not found"}), 404
-    db.session.delete(task)
-    db.session.commit()
+    with write_transaction():
+        task = Task.query.get(task_id)
+        if not task:
+            return jsonify({"message": "Task not found"}), 404
+        db.session.delete(task)
+    invalidate_catalogue()
     return jsonify({"message": "Task deleted successfully"}), 200
+
+@tasks_bp.route('/import', methods=['POST'])
+@login_required
+@admin_required
+def import_tasks_endpoint():
+    """
+    Пакетный импорт: JSON-тело (список задач или {"tasks": [...]}), CSV-тело (text/csv)
+    или файл в поле "file" (multipart). Параметры строки запроса: mismatch=skip|keep|fix,
+    dry_run=1 — только проверить, format=json|csv — если не определяется автоматически.
+    """
+    mismatch = request.args.get("mismatch", "skip")
+    if mismatch not in task_import.MISMATCH_MODES:
+        return jsonify({"message": "mismatch: skip, keep или fix"}), 400
+    upload = request.files.get("file")
+    text = upload.read().decode("utf-8-sig") if upload else request.get_data(as_text=True)
+    fmt = request.args.get("format") or ("csv" if request.mimetype == "text/csv" else None)
+    try:
+        records = task_import.load_records(text, fmt)
+    except task_import.ImportFormatError as e:
+        return jsonify({"message": str(e)}), 400
+    if len(records) > Config.IMPORT_MAX_TASKS:
+        return jsonify({"message": f"Не более {Config.IMPORT_MAX_TASKS} задач за один импорт"}), 400
+    report = task_import.import_tasks(records, mismatch=mismatch, dry_run=request.args.get("dry_run") == "1")
+    if report["imported"]:
+        invalidate_catalogue()
+    logging.info("Импорт задач: %s из %s", report["imported"], len(records))
+    return jsonify(report), 200 if request.args.get("dry_run") == "1" else 201
@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+# Тесты работают с отдельной SQLite-базой и без CAS-пула и прогрева
+_db_dir = tempfile.mkdtemp(prefix="math-checker-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ["CAS_POOL_SIZE"] = "0"
+os.environ["WARMUP_ENABLED"] = "0"
+os.environ["REPORT_CACHE_DIR"] = os.path.join(_db_dir, "reports")
+
+import itertools
+import pytest
+
+_names = itertools.count()
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    """login(role="student") — регистрирует нового пользователя и возвращает заголовки с его токеном."""
+    def make(role="student"):
+        from app import app
+        from models import db, User
+        from utils.Auth import auth
+        name = f"user{next(_names)}"
+        client.post("/api/auth/signup", json={"firstname": "A", "lastname": "B", "username": name,
+                                              "email": f"{name}@example.com", "password": "pw"})
+        if role != "student":
+            with app.app_context():
+                user = User.query.filter_by(username=name).first()
+                user.role = role
+                db.session.commit()
+            auth._user_cache._data.clear()
+        token = client.post("/api/auth/login", json={"username": name, "password": "pw"}).json["token"]
+        return {"Authorization": f"Bearer {token}"}
+    return make
@@ -0,0 +1,50 @@
+import threading
+import time
+
+import pytest
+
+import admission as admission_module
+from admission import AdmissionController, Overloaded
+
+
+def test_limits_per_user_queue_and_timeout():
+    controller = AdmissionController(max_inflight=1, max_queue=1, per_user=1, queue_timeout=0.05)
+    ticket = controller.acquire("alice")
+    with pytest.raises(Overloaded) as limited:
+        controller.acquire("alice")
+    assert limited.value.reason == "user_limit"
+    with pytest.raises(Overloaded) as timed_out:
+        controller.acquire("bob")
+    assert timed_out.value.reason == "timeout" and timed_out.value.retry_after >= 1
+    ticket.release()
+    ticket.release()  # повторное освобождение ничего не меняет
+    controller.acquire("bob").release()
+    assert controller.stats()["inflight"] == 0
+
+
+def test_full_queue_is_rejected_immediately():
+    controller = AdmissionController(max_inflight=1, max_queue=1, per_user=0, queue_timeout=5)
+    ticket = controller.acquire("a")
+    waiter = threading.Thread(target=lambda: controller.acquire("b").release())
+    waiter.start()
+    while controller.stats()["queued"] == 0:
+        time.sleep(0.01)
+    with pytest.raises(Overloaded) as full:
+        controller.acquire("c")
+    assert full.value.reason == "queue_full"
+    ticket.release()
+    waiter.join()
+    assert controller.stats()["inflight"] == 0
+
+
+def test_endpoint_answers_429_with_retry_after(client, login, monkeypatch):
+    controller = AdmissionController(max_inflight=1, max_queue=0, per_user=0, queue_timeout=0)
+    monkeypatch.setattr(admission_module, "admission", controller)
+    ticket = controller.acquire("someone else")
+    response = client.post("/api/solutions/check", headers=login(), json={"taskId": 1, "steps": ["x"]})
+    assert response.status_code == 429
+    assert response.json["reason"] == "queue_full"
+    assert int(response.headers["Retry-After"]) >= 1
+    ticket.release()
+    assert client.post("/api/solutions/check", headers=login(), json={"taskId": 10 ** 6, "steps": ["x"]}).status_code == 404
+    assert controller.stats()["inflight"] == 0
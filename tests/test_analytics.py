@@ -0,0 +1,55 @@
+import pytest
+from app import app
+from models import db, Task, TaskStats, ErrorTypeStats
+from db_config import write_transaction
+import analytics
+
+
+@pytest.fixture
+def task():
+    with app.app_context():
+        with write_transaction():
+            task = Task(title="stats", description="", expression="(2*x + 1)/(x - 1)",
+                        limitVar="x->∞", expected_limit="2")
+            db.session.add(task)
+        yield task.id
+
+
+
+def _error_types(task_id):
+    rows = ErrorTypeStats.query.filter_by(task_id=task_id).all()
+    return {row.error_type: row.count for row in rows}
+
+
+def test_mixed_solution_counts_only_failing_steps_by_type(client, login, task):
+    steps = ["(2*x + 1)/(x - 1)", "(2*x + 3)/(x - 1)", "(4*x + 6)/(2*x - 2)", "2*x+)", "LIMIT", "2"]
+    response = client.post("/api/solutions/check", headers=login(),
+                           json={"taskId": task, "steps": steps})
+    errors = response.json["errors"]
+    assert all(error["error_type"] for error in errors)
+
+    with app.app_context():
+        assert _error_types(task) == {"algebraic_error": 1, "parse_error": 2}
+        stats = db.session.get(TaskStats, task)
+        assert (stats.attempts, stats.errors, stats.error_steps) == (1, 1, 3)
+
+        # Полный пересчёт даёт те же числа, что и живые счётчики
+        with write_transaction():
+            analytics.rebuild(db.session)
+        assert _error_types(task) == {"algebraic_error": 1, "parse_error": 2}
+        assert db.session.get(TaskStats, task).error_steps == 3
+
+
+def test_dashboard_is_admin_only_and_students_see_themselves(client, login, task):
+    student, other = login(), login()
+    admin = login("admin")
+    for path in ["/api/analytics/tasks", f"/api/analytics/tasks/{task}", "/api/analytics/error_types",
+                 "/api/analytics/daily"]:
+        assert client.get(path, headers=student).status_code == 403
+        assert client.get(path, headers=admin).status_code == 200
+
+    own_id = client.get("/api/auth/me", headers=student).json["user"]["id"]
+    other_id = client.get("/api/auth/me", headers=other).json["user"]["id"]
+    assert client.get(f"/api/analytics/students/{own_id}", headers=student).status_code == 200
+    assert client.get(f"/api/analytics/students/{other_id}", headers=student).status_code == 403
+    assert client.get(f"/api/analytics/students/{other_id}", headers=admin).status_code == 200
@@ -0,0 +1,32 @@
+from app import app
+from config import Config
+from utils.Auth import auth
+
+
+def test_role_change_from_another_process_reaches_the_cache(client, login, monkeypatch):
+    headers = login()
+    me = client.get("/api/auth/me", headers=headers).json["user"]
+    assert me["role"] == "student"
+    stale = auth._user_cache.get(me["id"])
+
+    monkeypatch.setattr(Config, "AUTH_USER_VERSION_INTERVAL", 0)
+    result = app.test_cli_runner().invoke(args=["user-role", me["username"], "admin"])
+    assert result.exit_code == 0
+    # Этот процесс вычищает запись после commit
+    assert auth._user_cache.get(me["id"]) is None
+    assert client.get("/api/auth/me", headers=headers).json["user"]["role"] == "admin"
+
+    # Другой воркер всё ещё держит старую запись: её сбрасывает сверка версии "users"
+    auth._user_cache.put(me["id"], stale, float("inf"))
+    result = app.test_cli_runner().invoke(args=["user-role", me["username"], "student"])
+    assert result.exit_code == 0
+    auth._user_cache.put(me["id"], {**stale, "role": "admin"}, float("inf"))
+    assert client.get("/api/auth/me", headers=headers).json["user"]["role"] == "student"
+
+
+def test_verified_token_is_cached(client, login):
+    headers = login()
+    token = headers["Authorization"].split()[1]
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+    assert auth._token_cache.get(token)["user_id"]
+    assert client.get("/api/auth/me", headers={"Authorization": "Bearer nope"}).status_code == 401
@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+import cas_pool as cas_pool_module
+import checker
+from cas_pool import CASPool, CASError, CASTimeout
+
+
+@pytest.fixture
+def pool():
+    pools = []
+
+    def make(**kwargs):
+        kwargs.setdefault("spawn_backoff", 0.01)
+        pool = CASPool(size=1, start_method="fork", startup_timeout=10, **kwargs)
+        pools.append(pool)
+        return pool
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def _wait(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_hung_operation_times_out_and_worker_is_replaced(pool, monkeypatch):
+    # fork: подмена попадает и в рабочий процесс
+    monkeypatch.setattr(checker, "canonicalize", lambda expr: time.sleep(30))
+    cas = pool()
+    cas.start()
+    with pytest.raises(CASTimeout):
+        cas.run("canonicalize", "x", timeout=0.2)
+    assert cas.stats()["respawns"] == 1
+    _wait(lambda: cas.stats()["alive"] == 1)
+    assert cas.run("step_key", "x+x") == checker.step_key("x+x")
+
+
+def test_failed_spawns_are_retried_and_replaced_on_next_run(pool, monkeypatch):
+    real_worker = cas_pool_module._Worker
+
+    class BrokenWorker:
+        def __init__(self, *args):
+            raise OSError("fork failed")
+
+    monkeypatch.setattr(cas_pool_module, "_Worker", BrokenWorker)
+    cas = pool(spawn_attempts=2)
+    cas.start()
+    _wait(lambda: cas.stats()["starting"] == 0)
+    assert cas.stats()["spawn_failures"] == 2
+    # Процессов не осталось: ошибка сразу, без ожидания CAS_QUEUE_TIMEOUT
+    with pytest.raises(CASError):
+        cas.run("step_key", "x", queue_timeout=30)
+
+    # run() снова занял место в пуле; запуск (или его повтор) проходит, как только fork работает
+    monkeypatch.setattr(cas_pool_module, "_Worker", real_worker)
+    assert cas.run("step_key", "x+x", queue_timeout=10) == checker.step_key("x+x")
@@ -0,0 +1,15 @@
+from app import app
+from models import ChatMessage
+
+
+def test_client_messages_are_always_from_the_user(client, login):
+    response = client.post("/api/chat/messages", headers=login(), json={"content": "ответ", "role": "assistant"})
+    assert response.status_code == 201
+    assert response.json["role"] == "user"
+    with app.app_context():
+        assert ChatMessage.query.get(response.json["id"]).role == "user"
+
+
+def test_message_for_unknown_task_is_rejected(client, login):
+    response = client.post("/api/chat/messages", headers=login(), json={"content": "?", "task_id": 999999})
+    assert response.status_code == 404
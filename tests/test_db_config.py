@@ -0,0 +1,50 @@
+import threading
+
+import pytest
+from sqlalchemy import text
+
+from app import app
+from db_config import write_transaction
+from models import db, Task
+
+
+def test_sqlite_connections_use_wal_and_tuned_pragmas():
+    with app.app_context():
+        with db.engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+            assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+            assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() > 0
+
+
+def test_concurrent_writers_are_serialized():
+    errors = []
+
+    def write(n):
+        try:
+            with app.app_context():
+                # Читающая транзакция перед записью — как у обработчиков запросов
+                db.session.execute(text("SELECT COUNT(*) FROM tasks")).scalar()
+                with write_transaction():
+                    db.session.add(Task(title=f"concurrent{n}", expression="x", limitVar="x->∞",
+                                        expected_limit="oo"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    with app.app_context():
+        assert Task.query.filter(Task.title.like("concurrent%")).count() == 16
+
+
+def test_write_transaction_rolls_back_on_error():
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            with write_transaction():
+                db.session.add(Task(title="rolled-back", expression="x", limitVar="x->∞", expected_limit="oo"))
+                db.session.flush()
+                raise RuntimeError("stop")
+        assert Task.query.filter_by(title="rolled-back").count() == 0
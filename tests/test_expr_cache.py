@@ -0,0 +1,38 @@
+import pytest
+
+import checker
+from expr_cache import ExpressionCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ExpressionCache(max_entries=2)
+    for key in ("a", "b"):
+        cache.get_or_create(key, lambda: key.upper())
+    assert cache.get_or_create("a", lambda: "new") == "A"  # "a" стал самым свежим
+    cache.get_or_create("c", lambda: "C")
+    assert cache.get_or_create("b", lambda: "B2") == "B2"
+    stats = cache.stats()
+    assert (stats["hits"], stats["evictions"]) == (1, 2)
+    assert stats["entries"] == 2
+
+
+def test_byte_budget_and_oversized_values():
+    cache = ExpressionCache(max_entries=100, max_bytes=10)
+    assert cache.get_or_create("big", lambda: "x", sizeof=lambda k, v: 11) == "x"
+    assert cache.stats()["entries"] == 0
+    for key in "abc":
+        cache.get_or_create(key, lambda: key, sizeof=lambda k, v: 4)
+    assert cache.stats()["bytes"] <= 10
+
+
+def test_errors_are_not_cached():
+    cache = ExpressionCache()
+    with pytest.raises(ValueError):
+        cache.get_or_create("bad", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert cache.get_or_create("bad", lambda: 1) == 1
+
+
+def test_parse_expression_shares_normalized_entries():
+    first = checker.parse_expression("(x+1)^2 /  (x-1)")
+    assert checker.parse_expression("  (x+1)^2 / (x-1) ") is first
+    assert first.simplified is first.simplified
@@ -0,0 +1,43 @@
+import pytest
+import sympy as sp
+
+from fast_limit import limit_at_infinity, limit_at
+from math_parser import parse_math
+
+x = sp.Symbol("x")
+
+FAST_CASES = [
+    "(2*x + 1)/(x - 1)",
+    "(3*x^2 - x)/(x^3 + 1)",
+    "(x^3 + 1)/(2 - x^2)",
+    "((2*x + 3)/(5*x + 7))^(x+1)",
+    "((2*x + 1)/(x - 1))^(3*x)",
+    "((x + 1)/(x - 2))^(2*x + 5)",
+    "((x + 1)/(3*x + 7))^(4*x)",
+    "(1 + 1/x)^x * (2*x + 1)/x",
+    "((x - 1)/(x + 1))^(-x)",
+]
+
+
+@pytest.mark.parametrize("text", FAST_CASES)
+def test_fast_path_agrees_with_sympy(text):
+    expr = parse_math(text)
+    value = limit_at_infinity(expr, x)
+    assert value is not None
+    expected = sp.limit(expr, x, sp.oo)
+    assert value == expected or sp.simplify(value - expected) == 0
+
+
+@pytest.mark.parametrize("text", ["sin(x)/x", "x*log(1 + 1/x)", "((x^2 + 1)/(x^2 - 3))^(x^2)", "(x + y)/x"])
+def test_unknown_families_fall_back_to_sympy(text):
+    expr = parse_math(text)
+    assert limit_at_infinity(expr, x) is None
+    if expr.free_symbols == {x}:
+        value, engine = limit_at(expr, x)
+        assert (value, engine) == (sp.limit(expr, x, sp.oo), "sympy")
+
+
+def test_minus_infinity_and_finite_points():
+    expr = parse_math("(2*x + 1)/(x - 1)")
+    assert limit_at(expr, x, -sp.oo) == (2, "fast")
+    assert limit_at(parse_math("1/x"), x, sp.Integer(0), "+") == (sp.oo, "sympy")
@@ -0,0 +1,69 @@
+import checker
+import fingerprint as fp
+from app import app
+from math_parser import parse_math
+from models import Step
+from persistence import known_equivalent_pairs
+from solutions import prejudge_pair
+
+TASK = {"title": "fingerprints", "expression": "(2*x + 1)/(x - 1)", "limitVar": "x->∞", "expected_limit": "2"}
+
+
+def _fp(text):
+    return fp.fingerprint(parse_math(text))
+
+
+def test_equivalent_forms_share_a_fingerprint():
+    assert _fp("((2*x + 3)/(5*x + 7))^(x+1)") == _fp("((2 + 3/x)/(5 + 7/x))^(x+1)")
+    assert _fp("(x^2 - 1)/(x - 1)").startswith("m:")
+    assert _fp("exp(x)*exp(x)") == _fp("exp(2*x)")
+    assert _fp("exp(x)").startswith("f:")
+
+
+def test_compare_decides_only_when_reliable():
+    assert fp.compare(_fp("x + 1"), _fp("(x^2 - 1)/(x - 1)")) is True
+    assert fp.compare(_fp("x + 1"), _fp("x + 2")) is False
+    # Различие в режиме "f" может быть артефактом округления
+    assert fp.compare(_fp("exp(x)"), _fp("exp(x) + 1")) is None
+    assert fp.compare(None, _fp("x")) is None
+
+
+def test_checked_steps_store_fingerprints_and_later_checks_reuse_them(client, login, monkeypatch):
+    task_id = client.post("/api/tasks", headers=login("admin"), json=TASK).json["task_id"]
+    steps = ["(2*x + 1)/(x - 1)", "(2 + 1/x)/(1 - 1/x)", "LIMIT", "2"]
+    solution_id = client.post("/api/solutions/check", headers=login(),
+                              json={"taskId": task_id, "steps": steps}).json["solution_id"]
+    with app.app_context():
+        stored = [s.fingerprint for s in Step.query.filter_by(solution_id=solution_id).order_by(Step.step_number)]
+        assert stored[0] == stored[1] == checker.step_fingerprint(steps[0])
+        assert stored[2:] == [None, None]
+
+    # Одинаковые отпечатки решают пару без compare_steps
+    def fail(*args):
+        raise AssertionError("compare_steps не должен вызываться")
+    monkeypatch.setattr(checker, "compare_steps", fail)
+    response = client.post("/api/solutions/check", headers=login(), json={"taskId": task_id, "steps": steps})
+    assert response.json["success"] is True
+
+
+def test_stored_verdicts_decide_pairs_the_fingerprints_cannot(client, login):
+    from db_config import write_transaction
+    from models import db, Solution
+
+    task_id = client.post("/api/tasks", headers=login("admin"), json={**TASK, "title": "stored"}).json["task_id"]
+    user_id = client.get("/api/auth/me", headers=login()).json["user"]["id"]
+    with app.app_context():
+        with write_transaction():
+            for correct, (a, b) in ((True, ("f:prev", "f:curr")), (False, ("f:bad", "f:worse"))):
+                solution = Solution(task_id=task_id, user_id=user_id, status="completed")
+                db.session.add(solution)
+                db.session.flush()
+                db.session.add_all([Step(solution_id=solution.id, step_number=n, input_expr="x",
+                                         is_correct=correct, fingerprint=value)
+                                    for n, value in ((1, a), (2, b))])
+        pairs = {("f:prev", "f:curr"), ("f:curr", "f:prev"), ("f:bad", "f:worse")}
+        known = known_equivalent_pairs(pairs)
+    # Эквивалентность симметрична; пары из ошибочных решений не засчитываются
+    assert known == {("f:prev", "f:curr"), ("f:curr", "f:prev")}
+    assert prejudge_pair("f:prev", "f:curr", known) == (True, "stored_verdict")
+    assert prejudge_pair("f:bad", "f:worse", known) is None
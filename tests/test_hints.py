@@ -0,0 +1,40 @@
+import pytest
+from app import app
+from models import db, Task
+from db_config import write_transaction
+import hints
+
+
+@pytest.fixture
+def task():
+    hints.set_backend(hints.StubHintBackend())
+    with app.app_context():
+        with write_transaction():
+            task = Task(title="hints", description="", expression="(2*x + 3)/(x - 1)",
+                        limitVar="x->∞", expected_limit="2")
+            db.session.add(task)
+        yield task
+    hints.set_backend(None)
+
+
+def test_equivalent_steps_share_key():
+    assert hints.step_key("(2x+3)/(x-1)") == hints.step_key("(4*x + 6)/(2*x - 2)")
+    assert hints.step_key("(2x+3)/(x-1)") != hints.step_key("(2x+3)/(x+1)")
+
+
+def test_unparseable_step_falls_back_to_text_hash():
+    assert hints.step_key("2*x+)") == hints.step_key("2 * x + )")
+    assert hints.step_key("2*x+)").startswith("r:")
+
+
+def test_cached_hint_shows_the_requesters_own_step(task):
+    first, cached = hints.get_hint(task, "(2x+3)/(x-1)", "algebraic_error")
+    assert not cached and "(2x+3)/(x-1)" in first
+    second, cached = hints.get_hint(task, "(4x+6)/(2x-2)", "algebraic_error")
+    assert cached
+    assert "(4x+6)/(2x-2)" in second and "(2x+3)/(x-1)" not in second
+
+
+def test_backend_text_is_cached_without_the_step():
+    hint = "В шаге (2x+3)/(x-1) потерян множитель"
+    assert hints.render(hints._template(hint, "(2x+3)/(x-1)"), "y") == "В шаге y потерян множитель"
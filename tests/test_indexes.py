@@ -0,0 +1,62 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event, select, text
+from sqlalchemy.orm import selectinload
+
+from app import app
+from models import db, Solution
+from persistence import known_equivalent_pairs
+from reports import _apply_filters
+from routes import _last_step
+
+TASK = {"title": "indexes", "expression": "sin(x)/x", "limitVar": "x->0", "expected_limit": "1"}
+
+
+@contextmanager
+def _query_plans():
+    """Собирает EXPLAIN QUERY PLAN для каждого SELECT, выполненного внутри блока."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    plans = []
+    try:
+        yield plans
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+    with db.engine.connect() as conn:
+        for statement, parameters in statements:
+            rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+            plans.append(" | ".join(row[-1] for row in rows))
+
+
+def _plan_of(run):
+    with _query_plans() as plans:
+        run()
+    return " || ".join(plans)
+
+
+def test_report_filters_use_solution_indexes(client):
+    def filtered(**filters):
+        return lambda: db.session.execute(_apply_filters(select(Solution.id), **filters)).all()
+
+    with app.app_context():
+        assert "ix_solutions_user_created" in _plan_of(filtered(period="2024-01-01:2024-02-01", student_id=1))
+        assert "ix_solutions_task_created" in _plan_of(filtered(period="2024-01-01:2024-02-01", task_id=1))
+        assert "ix_solutions_created_at" in _plan_of(filtered(period="2024-01-01:2024-02-01"))
+
+
+def test_step_lookups_use_step_indexes(client, login):
+    task_id = client.post("/api/tasks", headers=login("admin"), json=TASK).json["task_id"]
+    solution_id = client.post(f"/api/tasks/{task_id}/start", headers=login()).json["solution_id"]
+    with app.app_context():
+        load_steps = _plan_of(lambda: db.session.execute(
+            select(Solution).where(Solution.id == solution_id).options(selectinload(Solution.steps))).all())
+        assert "ix_steps_solution_step" in load_steps
+        assert "ix_steps_solution_step" in _plan_of(lambda: _last_step(solution_id))
+        pairs_plan = _plan_of(lambda: known_equivalent_pairs({("f:a", "f:b")}))
+        assert "ix_steps_fingerprint" in pairs_plan
+        assert "ix_steps_solution_step" in pairs_plan
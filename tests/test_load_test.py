@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("requests")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks"))
+import load_test  # noqa: E402
+
+
+def test_nearest_rank_percentiles():
+    values = list(range(1, 101))
+    assert [load_test.percentile(values, p) for p in (50, 95, 99, 100)] == [50, 95, 99, 100]
+    assert load_test.percentile([7], 99) == 7
+    assert load_test.percentile([], 50) is None
+
+
+def test_endpoint_names_group_ids():
+    assert load_test.endpoint_name("POST", "/api/solutions/12/check_step?x=1") == "POST /api/solutions/<id>/check_step"
+
+
+def test_summary_and_regression_check():
+    recorder = load_test.Recorder()
+    for ms in (10, 20, 30, 40):
+        recorder.record("GET /api/tasks", ms / 1000, 200)
+    recorder.record("GET /api/tasks", 0.05, 500)
+    summary = recorder.summary(elapsed=1.0)
+    stats = summary["endpoints"]["GET /api/tasks"]
+    assert (stats["count"], stats["errors"], stats["p50_ms"], stats["p95_ms"]) == (5, 1, 30.0, 50.0)
+    assert summary["error_rate"] == 0.2
+
+    baseline = {"endpoints": {"GET /api/tasks": {**stats, "p95_ms": 25.0, "error_rate": 0.2}}}
+    assert load_test.compare(summary, baseline, max_regression=0.5) == ["GET /api/tasks"]
+    assert load_test.compare(summary, {"endpoints": {"GET /api/tasks": stats}}, max_regression=0.5) == []
@@ -0,0 +1,49 @@
+import time
+import pytest
+import sympy as sp
+from math_parser import parse_math, ParseError
+
+x = sp.Symbol("x")
+
+
+@pytest.mark.parametrize("text", ["10^10^10", "x^(10^10^10)", "9^9^9^9", "2^(2^40)", "10**10**10"])
+def test_huge_integer_power_is_rejected_quickly(text):
+    started = time.perf_counter()
+    with pytest.raises(ParseError):
+        parse_math(text)
+    assert time.perf_counter() - started < 1
+
+
+def test_ordinary_powers_still_parse():
+    assert parse_math("2^100") == sp.Integer(2) ** 100
+    assert parse_math("1^(10^100)") == 1
+    assert parse_math("x^2^3") == x ** 8
+    assert parse_math("\\sqrt[3]{8}") == 2
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2x(x+1)", "2*x*(x+1)"),
+    ("((2*x + 3)/(5*x + 7))**(x+1)", "((2*x + 3)/(5*x + 7))**(x+1)"),
+    ("ln(x) + sin x^2 - e^x", "log(x) + sin(x**2) - exp(x)"),
+    ("−x·π", "-x*pi"),
+    ("\\frac{x+1}{\\sqrt{x}} \\cdot \\left(1+\\frac{1}{x}\\right)^{2x}", "(x+1)/sqrt(x)*(1+1/x)**(2*x)"),
+    ("\\log_{2}(x)", "log(x, 2)"),
+    ("|x-1|", "Abs(x-1)"),
+])
+def test_notation_matches_sympy(text, expected):
+    assert parse_math(text) == sp.sympify(expected)
+
+
+@pytest.mark.parametrize("text", ["", "x +", "(x", "__import__('os')", "x $ 2", "\\unknown{x}", "x)"])
+def test_invalid_input_raises_parse_error(text):
+    with pytest.raises(ParseError):
+        parse_math(text)
+
+
+def test_limit_var_forms():
+    from math_parser import parse_limit_var
+    assert parse_limit_var("x->∞") == (x, sp.oo, "+-")
+    assert parse_limit_var("x \\to 0+") == (x, 0, "+")
+    assert parse_limit_var("t → -oo")[1] == -sp.oo
+    with pytest.raises(ParseError):
+        parse_limit_var("x->y")
@@ -0,0 +1,49 @@
+import time
+
+import checker
+import memory
+from cas_pool import CASPool
+from memory import MemoryGovernor
+
+
+def test_cache_limit_clears_caches():
+    checker.parse_expression("x^3 + 7*x").simplified
+    assert checker.expr_cache.stats()["entries"] > 0
+    governor = MemoryGovernor(soft_limit=0, hard_limit=0, cache_max_entries=1, check_seconds=0)
+    assert governor.check() is False
+    assert governor.cache_clears == 1
+    assert checker.expr_cache.stats()["entries"] == 0
+
+
+def test_hard_limit_requests_recycle_and_checks_are_throttled():
+    governor = MemoryGovernor(soft_limit=0, hard_limit=1, cache_max_entries=0, check_seconds=3600)
+    assert governor.maybe_check() is True
+    assert governor.stats()["recycle_requested"] is True
+    relaxed = MemoryGovernor(soft_limit=0, hard_limit=0, cache_max_entries=0, check_seconds=3600)
+    relaxed.maybe_check()
+    relaxed.hard_limit = 1
+    assert relaxed.maybe_check() is False  # следующий замер — только через check_seconds
+
+
+def test_cas_worker_over_budget_is_replaced_after_returning_its_result(monkeypatch):
+    # fork: рабочий процесс получает governor с жёстким лимитом в 1 байт
+    monkeypatch.setattr(memory, "cas_worker_governor",
+                        lambda: MemoryGovernor(soft_limit=0, hard_limit=1, cache_max_entries=0, check_seconds=0))
+    pool = CASPool(size=1, start_method="fork", startup_timeout=10)
+    try:
+        pool.start()
+        assert pool.run("step_key", "x+x", queue_timeout=10) == checker.step_key("x+x")
+        assert pool.stats()["recycles"] == 1
+        deadline = time.time() + 10
+        while pool.stats()["alive"] < 1:
+            assert time.time() < deadline
+            time.sleep(0.01)
+        assert pool.run("step_key", "2*x", queue_timeout=10) == checker.step_key("2*x")
+    finally:
+        pool.shutdown()
+
+
+def test_memory_endpoint_is_admin_only(client, login):
+    assert client.get("/api/admin/memory", headers=login()).status_code == 403
+    stats = client.get("/api/admin/memory", headers=login("admin")).json
+    assert stats["worker"]["pid"] and "expr_cache" in stats
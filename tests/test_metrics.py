@@ -0,0 +1,27 @@
+from metrics import Histogram
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("t_seconds", "test", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, phase="parse")
+    lines = histogram.render()
+    assert 't_seconds_bucket{phase="parse",le="0.1"} 2' in lines
+    assert 't_seconds_bucket{phase="parse",le="1.0"} 3' in lines
+    assert 't_seconds_bucket{phase="parse",le="+Inf"} 4' in lines
+    assert 't_seconds_count{phase="parse"} 4' in lines
+
+
+def test_metrics_endpoint_reports_checks_and_requests(client, login):
+    task = {"title": "metrics", "expression": "(2*x + 1)/(x - 1)", "limitVar": "x->∞", "expected_limit": "2"}
+    task_id = client.post("/api/tasks", headers=login("admin"), json=task).json["task_id"]
+    client.post("/api/solutions/check", headers=login(),
+                json={"taskId": task_id, "steps": ["(2*x + 1)/(x - 1)", "(2 + 1/x)/(1 - 1/x)", "LIMIT", "2"]})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    assert 'math_checker_phase_seconds_count{phase="persistence"}' in text
+    assert 'math_checker_limit_verdicts_total{verdict="correct"}' in text
+    assert 'endpoint="/api/solutions/check"' in text
+    assert "math_checker_cas_pool{key=\"size\"} 0" in text
@@ -0,0 +1,42 @@
+from checker import compare_steps, parse_expression
+from numeric_check import numeric_compare, DIFFERENT, INCONCLUSIVE
+
+
+def _numeric(a, b, with_exprs=True):
+    prev, curr = parse_expression(a), parse_expression(b)
+    if with_exprs:
+        return numeric_compare(prev.numeric, curr.numeric, prev.expr, curr.expr)
+    return numeric_compare(prev.numeric, curr.numeric)
+
+
+def test_cancellation_is_not_a_difference():
+    prev = "(sqrt(x^4+1)-x^2)*ln(x-20)"
+    curr = "ln(x-20)/(sqrt(x^4+1)+x^2)"
+    assert _numeric(prev, curr) == INCONCLUSIVE
+    assert compare_steps(prev, curr)["equivalent"] is True
+
+
+def test_confirmed_difference_is_final():
+    assert _numeric("sin(x)+1/x", "sin(x)") == DIFFERENT
+    assert compare_steps("exp(x)*x", "exp(x)")["decided_by"] == "numeric"
+
+
+def test_difference_without_expressions_is_not_confirmed():
+    assert _numeric("sin(x)+1/x", "sin(x)", with_exprs=False) == INCONCLUSIVE
+
+
+def test_plausible_pair_is_equivalent_in_every_comparison(monkeypatch):
+    import sympy as sp
+    import checker
+    # equals не может доказать равенство, отпечатки и simplify ничего не решают
+    monkeypatch.setattr(checker.fp, "compare", lambda a, b: None)
+    monkeypatch.setattr(sp, "simplify", lambda expr, *args, **kwargs: expr)
+    monkeypatch.setattr(sp.Expr, "equals", lambda self, other, failing_expression=False: None)
+    prev, curr = "(x^3-8)/(x-2)+7", "x^2+2*x+11"
+
+    by_steps = checker.compare_steps(prev, curr)
+    assert by_steps["numeric"] == "plausible"
+    assert (by_steps["equivalent"], by_steps["decided_by"]) == (True, "numeric")
+    by_canonical = checker.compare_with_canonical(parse_expression(prev).canonical, curr)
+    assert (by_canonical["equivalent"], by_canonical["decided_by"]) == (True, "numeric")
+    assert checker.check_algebraic_step(prev, curr)["is_correct"] is True
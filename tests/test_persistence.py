@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import event
+
+import analytics
+from app import app
+from models import db, Solution, Step
+from persistence import save_checked_solution, save_checked_solutions
+
+TASK = {"title": "persistence", "expression": "sin(x)/x", "limitVar": "x->0", "expected_limit": "1"}
+
+
+@pytest.fixture
+def owner(client, login):
+    task_id = client.post("/api/tasks", headers=login("admin"), json=TASK).json["task_id"]
+    user_id = client.get("/api/auth/me", headers=login()).json["user"]["id"]
+    return task_id, user_id
+
+
+def test_solution_and_steps_are_written_in_one_commit(owner):
+    task_id, user_id = owner
+    commits = []
+
+    def count(conn):
+        commits.append(conn)
+
+    with app.app_context():
+        event.listen(db.engine, "commit", count)
+        try:
+            solution_id = save_checked_solution(task_id, user_id, ["sin(x)/x", "LIMIT", "1"], [])
+        finally:
+            event.remove(db.engine, "commit", count)
+        assert len(commits) == 1
+        assert db.session.get(Solution, solution_id).status == "completed"
+        assert [s.step_number for s in Step.query.filter_by(solution_id=solution_id)] == [1, 2, 3]
+
+
+def test_failed_write_leaves_nothing_behind(owner, monkeypatch):
+    task_id, user_id = owner
+
+    def fail(self, executor=None):
+        raise RuntimeError("stats unavailable")
+
+    monkeypatch.setattr(analytics.StatsDelta, "apply", fail)
+    with app.app_context():
+        before = Solution.query.count(), Step.query.count()
+        with pytest.raises(RuntimeError):
+            save_checked_solutions([(task_id, user_id, ["sin(x)/x"], [], None),
+                                    (task_id, user_id, ["sin(x)/x", "x"], [{"step": 2}], None)])
+        assert (Solution.query.count(), Step.query.count()) == before
@@ -0,0 +1,64 @@
+import csv
+import io
+
+TASK = {"title": "reports", "expression": "sin(x)/x", "limitVar": "x->0", "expected_limit": "1"}
+
+
+def _me(client, headers):
+    return client.get("/api/auth/me", headers=headers).json["user"]["id"]
+
+
+def _solve(client, headers, task_id):
+    return client.post(f"/api/tasks/{task_id}/start", headers=headers).json["solution_id"]
+
+
+def test_export_is_scoped_to_the_student(client, login):
+    task_id = client.post("/api/tasks", headers=login("admin"), json=TASK).json["task_id"]
+    alice, bob = login(), login()
+    _solve(client, alice, task_id)
+    bob_solution = _solve(client, bob, task_id)
+
+    assert client.get("/api/reports/export").status_code == 401
+    assert client.get(f"/api/reports/export?student_id={_me(client, alice)}", headers=bob).status_code == 403
+    rows = list(csv.DictReader(io.StringIO(client.get("/api/reports/export", headers=bob).get_data(as_text=True))))
+    assert [int(row["solution_id"]) for row in rows] == [bob_solution]
+
+
+def test_pdf_requires_login_and_is_scoped(client, login):
+    task_id = client.post("/api/tasks", headers=login("admin"), json=TASK).json["task_id"]
+    alice, bob = login(), login()
+    _solve(client, alice, task_id)
+
+    assert client.post("/api/reports/pdf", json={}).status_code == 401
+    assert client.post("/api/reports/pdf", headers=bob, json={"student_id": _me(client, alice)}).status_code == 403
+    response = client.post("/api/reports/pdf", headers=bob, json={"task_id": task_id})
+    assert response.status_code == 200
+    assert response.mimetype == "application/pdf"
+    response = client.post("/api/reports/pdf", headers=login("admin"), json={"student_id": _me(client, alice)})
+    assert response.status_code == 200
+
+
+def test_pdf_is_cached_until_the_data_changes(client, login, monkeypatch):
+    import reports
+    from app import app
+    from models import db, Task
+    from db_config import write_transaction
+
+    admin = login("admin")
+    task_id = client.post("/api/tasks", headers=admin, json={**TASK, "title": "cached"}).json["task_id"]
+    _solve(client, login(), task_id)
+    renders = []
+    render_report = reports.render_report
+    monkeypatch.setattr(reports, "render_report", lambda rows, out: (renders.append(1), render_report(rows, out)))
+
+    first = client.post("/api/reports/pdf", headers=admin, json={"task_id": task_id}).get_data()
+    assert client.post("/api/reports/pdf", headers=admin, json={"task_id": task_id}).get_data() == first
+    assert len(renders) == 1
+
+    with app.app_context():
+        version = reports.data_version()
+        with write_transaction():
+            db.session.get(Task, task_id).title = "renamed"
+        assert reports.data_version() != version
+    assert client.post("/api/reports/pdf", headers=admin, json={"task_id": task_id}).status_code == 200
+    assert len(renders) == 2
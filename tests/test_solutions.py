@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+TASK = {"title": "solutions", "expression": "(2*x + 1)/(x - 1)", "limitVar": "x->∞", "expected_limit": "2"}
+GOOD = ["(2*x + 1)/(x - 1)", "(2 + 1/x)/(1 - 1/x)", "LIMIT", "2"]
+
+
+@pytest.fixture
+def task_id(client, login):
+    return client.post("/api/tasks", headers=login("admin"), json=TASK).json["task_id"]
+
+
+def test_batch_checks_duplicate_work_once(client, login, task_id):
+    wrong = ["(2*x + 1)/(x - 1)", "(2*x + 3)/(x - 1)", "LIMIT", "2"]
+    submissions = [{"taskId": task_id, "steps": GOOD}, {"taskId": task_id, "steps": GOOD},
+                   {"taskId": task_id, "steps": wrong}, {"taskId": 10 ** 6, "steps": GOOD}, {"steps": []}]
+    response = client.post("/api/solutions/check_batch", headers=login(), json={"submissions": submissions})
+    assert response.status_code == 200
+    results = response.json["results"]
+    assert [r.get("success") for r in results[:3]] == [True, True, False]
+    assert results[0]["solution_id"] != results[1]["solution_id"]
+    assert results[2]["errors"][0]["error_type"] == "algebraic_error"
+    assert "error" in results[3] and "error" in results[4]
+    assert response.json["checks_performed"] < response.json["checks_requested"]
+
+
+def _events(response):
+    """События SSE из ответа; ответ закрывается, как это делает WSGI-сервер (освобождает место в admission)."""
+    events = []
+    body = response.get_data(as_text=True)
+    response.close()
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_sends_each_verdict_and_the_result(client, login, task_id):
+    response = client.post("/api/solutions/check_stream", headers=login(), json={"taskId": task_id, "steps": GOOD})
+    assert response.mimetype == "text/event-stream"
+    events = _events(response)
+    assert [name for name, _ in events] == ["step", "limit", "result"]
+    assert events[1][1]["computed"] == "2"
+    assert events[-1][1]["success"] is True and events[-1][1]["solution_id"]
+
+
+def test_stream_stops_at_the_first_error(client, login, task_id, monkeypatch):
+    import checker
+    steps = ["(2*x + 1)/(x - 1)", "(2*x + 3)/(x - 1)", "(4*x + 6)/(2*x - 2)", "LIMIT", "2"]
+    calls = []
+    compare_steps = checker.compare_steps
+    monkeypatch.setattr(checker, "compare_steps", lambda *args: (calls.append(args), compare_steps(*args))[1])
+
+    events = _events(client.post("/api/solutions/check_stream?stop_at_first_error=1", headers=login(),
+                                 json={"taskId": task_id, "steps": steps}))
+    assert [name for name, _ in events] == ["step", "result"]
+    assert events[-1][1]["stopped"] is True
+    assert events[-1][1]["errors"][0]["error_type"] == "algebraic_error"
+    assert len(calls) <= 1
@@ -0,0 +1,43 @@
+import copy
+
+from app import app
+from models import Step
+from step_sessions import step_sessions
+
+TASK = {"title": "sessions", "expression": "sin(x)/x", "limitVar": "x->0", "expected_limit": "1"}
+
+
+def _start(client, login):
+    task_id = client.post("/api/tasks", headers=login("admin"), json=TASK).json["task_id"]
+    headers = login()
+    solution_id = client.post(f"/api/tasks/{task_id}/start", headers=headers).json["solution_id"]
+    return headers, solution_id
+
+
+def _step(client, headers, solution_id, expr, **extra):
+    return client.post(f"/api/solutions/{solution_id}/check_step", headers=headers,
+                       json={"curr_expr": expr, **extra})
+
+
+def test_stale_session_is_restored_from_db(client, login):
+    headers, solution_id = _start(client, login)
+    assert _step(client, headers, solution_id, "sin(x)/x").json["is_correct"] is True
+    # Сессия «другого воркера»: она не видела шаг LIMIT
+    stale = copy.copy(step_sessions.get(solution_id))
+    assert _step(client, headers, solution_id, "LIMIT").json["is_correct"] is True
+    step_sessions.put(stale)
+
+    assert _step(client, headers, solution_id, "1").json["is_correct"] is True
+    with app.app_context():
+        numbers = [s.step_number for s in Step.query.filter_by(solution_id=solution_id).order_by(Step.id)]
+    assert numbers == [1, 2, 3]
+
+
+def test_stale_step_number_is_rejected(client, login):
+    headers, solution_id = _start(client, login)
+    assert _step(client, headers, solution_id, "sin(x)/x", step_number=1).status_code == 200
+    response = _step(client, headers, solution_id, "LIMIT", step_number=1)
+    assert response.status_code == 409
+    assert response.json["expected_step_number"] == 2
+    with app.app_context():
+        assert Step.query.filter_by(solution_id=solution_id).count() == 1
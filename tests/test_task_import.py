@@ -0,0 +1,50 @@
+import pytest
+
+from config import Config
+from models import Task
+from app import app
+import task_import
+
+RECORDS = [
+    {"title": "imp-ok", "expression": "(2*x + 1)/(x - 1)", "limitVar": "x->∞", "expected_limit": "2"},
+    {"title": "imp-wrong", "expression": "sin(x)/x", "limitVar": "x->0", "expected_limit": "0"},
+    {"title": "imp-bad", "expression": "sin(x", "limitVar": "x->0", "expected_limit": "1"},
+    {"title": "imp-ok", "expression": "x", "limitVar": "x->0", "expected_limit": "0"},
+]
+
+
+@pytest.fixture(autouse=True)
+def one_process(monkeypatch):
+    monkeypatch.setattr(Config, "IMPORT_PROCESSES", 1)
+
+
+def test_import_requires_admin(client, login):
+    assert client.post("/api/tasks/import", headers=login(), json=RECORDS).status_code == 403
+
+
+def test_import_reports_each_row_and_fixes_mismatches(client, login):
+    admin = login("admin")
+    dry = client.post("/api/tasks/import?dry_run=1", headers=admin, json={"tasks": RECORDS})
+    assert dry.status_code == 200
+    assert [r["status"] for r in dry.json["results"]] == ["ok", "mismatch", "invalid", "duplicate"]
+    assert dry.json["results"][1]["computed"] == "1"
+    with app.app_context():
+        assert Task.query.filter(Task.title.like("imp-%")).count() == 0
+
+    response = client.post("/api/tasks/import?mismatch=fix", headers=admin, json=RECORDS)
+    assert response.status_code == 201 and response.json["imported"] == 2
+    with app.app_context():
+        assert Task.query.filter_by(title="imp-wrong").one().expected_limit == "1"
+    # Повторный импорт: названия уже заняты
+    again = client.post("/api/tasks/import", headers=admin, json=RECORDS[:1]).json
+    assert again["results"][0]["status"] == "duplicate"
+
+
+def test_csv_records_and_format_errors(client, login):
+    text = "title,expression,limitVar,expected_limit\nimp-csv,(x+1)/x,x->∞,1\n"
+    response = client.post("/api/tasks/import", headers=login("admin"), data=text, content_type="text/csv")
+    assert response.json["imported"] == 1
+    with pytest.raises(task_import.ImportFormatError):
+        task_import.load_records("title,expression\na,b\n")
+    with pytest.raises(task_import.ImportFormatError):
+        task_import.load_records("[1, 2]")
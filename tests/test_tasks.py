@@ -0,0 +1,58 @@
+from app import app
+from models import Task
+
+TASK = {"title": "sin0", "expression": "sin(x)/x", "limitVar": "x->0", "expected_limit": "1"}
+
+
+def test_task_changes_require_admin(client, login):
+    headers = login()
+    assert client.post("/api/tasks", json=TASK).status_code == 401
+    assert client.post("/api/tasks", headers=headers, json=TASK).status_code == 403
+    assert client.put("/api/tasks/1", headers=headers, json={"title": "x"}).status_code == 403
+    assert client.delete("/api/tasks/1", headers=headers).status_code == 403
+
+
+def test_invalid_task_is_rejected_before_writing(client, login):
+    headers = login("admin")
+    assert client.post("/api/tasks", headers=headers, json={**TASK, "limitVar": "y=>"}).status_code == 400
+    assert client.post("/api/tasks", headers=headers, json={**TASK, "expression": "sin(x"}).status_code == 400
+
+    task_id = client.post("/api/tasks", headers=headers, json=TASK).json["task_id"]
+    assert client.put(f"/api/tasks/{task_id}", headers=headers, json={"limitVar": "zzz"}).status_code == 400
+    with app.app_context():
+        assert Task.query.get(task_id).limitVar == "x->0"
+    assert client.put(f"/api/tasks/{task_id}", headers=headers, json={"limitVar": "x->∞", "expected_limit": "0"}).status_code == 200
+    with app.app_context():
+        assert Task.query.get(task_id).limitVar == "x->∞"
+
+
+def test_plan_honours_limit_var(client, login):
+    task_id = client.post("/api/tasks", headers=login("admin"), json={**TASK, "title": "plan"}).json["task_id"]
+    response = client.post("/api/solutions/check", headers=login(),
+                           json={"taskId": task_id, "steps": ["sin(x)/x", "LIMIT", "1"]})
+    assert response.json["success"] is True
+
+
+def test_catalogue_etag_and_cursor_pages(client, login):
+    admin = login("admin")
+    for n in range(3):
+        client.post("/api/tasks", headers=admin, json={**TASK, "title": f"page{n}"})
+    full = client.get("/api/tasks")
+    etag = full.headers["ETag"]
+    assert client.get("/api/tasks", headers={"If-None-Match": etag}).status_code == 304
+
+    ids, cursor = [], None
+    while True:
+        query = "?limit=2" + (f"&cursor={cursor}" if cursor is not None else "")
+        page = client.get("/api/tasks" + query).json
+        assert len(page["tasks"]) <= 2
+        ids += [t["id"] for t in page["tasks"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert ids == [t["id"] for t in full.json["tasks"]]
+
+    client.post("/api/tasks", headers=admin, json={**TASK, "title": "new"})
+    changed = client.get("/api/tasks", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
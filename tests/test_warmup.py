@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+import checker
+import warmup
+from app import app
+from cas_pool import cas_pool
+
+TASK = {"title": "warm", "expression": "((x + 2)/(x + 5))**(3*x)", "limitVar": "x->∞", "expected_limit": "exp(-9)"}
+
+
+def test_warm_up_prepares_task_expressions_and_plans(client, login, monkeypatch):
+    client.post("/api/tasks", headers=login("admin"), json=TASK)
+    monkeypatch.setattr(cas_pool, "warm_expressions", ())
+    monkeypatch.setattr(cas_pool, "warm_plans", ())
+    checker.expr_cache.clear()
+    checker.clear_plans()
+
+    warmup.warm_up(app)
+    assert TASK["expression"] in cas_pool.warm_expressions
+    assert (TASK["expression"], TASK["limitVar"], TASK["expected_limit"]) in cas_pool.warm_plans
+    hits = checker.expr_cache.stats()["hits"]
+    checker.parse_expression(TASK["expression"])
+    assert checker.expr_cache.stats()["hits"] == hits + 1
+    assert (TASK["expression"], TASK["limitVar"], TASK["expected_limit"]) in checker._plans
+
+
+def test_reportlab_is_imported_only_for_reports():
+    env = {**os.environ, "WARMUP_ENABLED": "0"}
+    code = "import sys, app; print('reportlab' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env,
+                            cwd=os.path.join(os.path.dirname(__file__), os.pardir), check=True)
+    assert result.stdout.strip().splitlines()[-1] == "False"
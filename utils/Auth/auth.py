@@ -1,12 +1,163 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from werkzeug.security import generate_password_hash, check_password_hash
-from models import db, User
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.orm import Session
+from models import db, User, DataVersion
+from db_config import write_transaction
 import jwt
+import time
 import datetime
+import threading
+from functools import wraps
+from collections import OrderedDict
 from config import Config
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+class _ExpiringCache:
+    """Небольшой LRU-кэш, где у каждой записи свой срок годности (time.time())."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value, expires_at):
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+# Проверенные токены (до истечения exp) и компактные записи пользователей
+_token_cache = _ExpiringCache(Config.AUTH_TOKEN_CACHE_SIZE)
+_user_cache = _ExpiringCache(Config.AUTH_USER_CACHE_SIZE)
+
+def _user_record(user):
+    return {
+        "id": user.id,
+        "username": user.username,
+        "firstname": user.firstname,
+        "lastname": user.lastname,
+        "email": user.email,
+        "role": user.role
+    }
+
+# Изменение пользователя увеличивает версию "users" в data_versions в той же транзакции.
+# Процесс, сделавший изменение, вычищает запись после commit; остальные процессы (воркеры
+# gunicorn, flask user-role) не видят его событий и сверяют версию из БД не чаще раза
+# в AUTH_USER_VERSION_INTERVAL секунд, сбрасывая кэш пользователей при её изменении.
+USERS_VERSION = "users"
+_versions = DataVersion.__table__
+_seen_version = {"version": None, "checked_at": 0.0}
+_version_lock = threading.Lock()
+
+@event.listens_for(Session, "after_flush")
+def _bump_users_version(session, flush_context):
+    changed = [obj.id for obj in list(session.dirty) + list(session.deleted) if isinstance(obj, User)]
+    if changed:
+        conn = session.connection()
+        bumped = conn.execute(update(_versions).where(_versions.c.name == USERS_VERSION)
+                              .values(version=_versions.c.version + 1))
+        if not bumped.rowcount:
+            conn.execute(insert(_versions).values(name=USERS_VERSION, version=1))
+        session.info.setdefault("changed_users", set()).update(changed)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_users(session):
+    for user_id in session.info.pop("changed_users", ()):
+        _user_cache.pop(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session):
+    session.info.pop("changed_users", None)
+
+def _check_users_version():
+    """Сбрасывает кэш пользователей, если версия "users" в БД изменилась (не чаще раза в интервал)."""
+    now = time.time()
+    if now - _seen_version["checked_at"] < Config.AUTH_USER_VERSION_INTERVAL:
+        return
+    with _version_lock:
+        if now - _seen_version["checked_at"] < Config.AUTH_USER_VERSION_INTERVAL:
+            return
+        version = db.session.execute(
+            select(_versions.c.version).where(_versions.c.name == USERS_VERSION)).scalar() or 0
+        if version != _seen_version["version"]:
+            _user_cache.clear()
+        _seen_version.update(version=version, checked_at=now)
+
+def verify_token(token):
+    """Возвращает payload проверенного JWT (с кэшированием до exp) или бросает jwt.InvalidTokenError."""
+    payload = _token_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
+        _token_cache.put(token, payload, payload.get("exp", time.time() + Config.AUTH_USER_CACHE_TTL))
+    return payload
+
+def load_user(user_id):
+    """Компактная запись пользователя из кэша; в БД идём только при промахе (и за версией, см. выше)."""
+    _check_users_version()
+    record = _user_cache.get(user_id)
+    if record is None:
+        user = User.query.get(user_id)
+        if user is None:
+            return None
+        record = _user_record(user)
+        _user_cache.put(user_id, record, time.time() + Config.AUTH_USER_CACHE_TTL)
+    return record
+
+def login_required(view):
+    """
+    Требует заголовок Authorization: Bearer <token>.
+    Пользователь (словарь, см. _user_record) кладётся в g.current_user.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        header = request.headers.get("Authorization", "")
+        if not header.startswith("Bearer "):
+            return jsonify({"message": "Authorization token is required"}), 401
+        try:
+            payload = verify_token(header[len("Bearer "):].strip())
+        except jwt.ExpiredSignatureError:
+            return jsonify({"message": "Token expired"}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({"message": "Invalid token"}), 401
+        user = load_user(payload.get("user_id"))
+        if user is None:
+            return jsonify({"message": "User not found"}), 401
+        g.current_user = user
+        return view(*args, **kwargs)
+    return wrapper
+
+def admin_required(view):
+    """Доступ только для role == "admin"; ставится после login_required."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if g.current_user.get("role") != "admin":
+            return jsonify({"message": "Forbidden"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
 @auth_bp.route('/signup', methods=['POST'])
 def register():
     
@@ -28,10 +179,10 @@ def register():
         password=hashed_password,
         bio=data.get('bio', ''),
         image=data.get('image', ''),
-        role=data.get('role', 'student')
+        role='student'  # администраторы назначаются только через flask user-role
     )
-    db.session.add(new_user)
-    db.session.commit()
+    with write_transaction():
+        db.session.add(new_user)
 
     return jsonify({"message": "User registered successfully"}), 201
 
@@ -59,3 +210,8 @@ def login():
             }
         }), 200
     return jsonify({"message": "Invalid credentials"}), 401
+
+@auth_bp.route('/me', methods=['GET'])
+@login_required
+def me():
+    return jsonify({"user": g.current_user}), 200
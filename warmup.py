@@ -0,0 +1,91 @@
+import time
+import logging
+import metrics
+
+# Отсчёт времени до первого запроса: от импорта модуля (старт процесса)
+# или от fork воркера gunicorn (after_fork)
+_started_at = time.monotonic()
+_first_request_seconds = None
+_warmup_seconds = None
+
+
+def task_expressions():
+    """Исходные выражения задач и ожидаемые пределы (нужен контекст приложения)."""
+    from models import Task
+    expressions = []
+    for expression, expected_limit in Task.query.with_entities(Task.expression, Task.expected_limit):
+        expressions.extend(e for e in (expression, expected_limit) if e)
+    return expressions
+
+
+def task_plans():
+    """Описания планов проверки всех задач (solutions.plan_spec; нужен контекст приложения)."""
+    from models import Task
+    return [tuple(row) for row in Task.query.with_entities(Task.expression, Task.limitVar, Task.expected_limit)]
+
+
+def warm_up(app):
+    """
+    Прогревает процесс до первого запроса: sympy (simplify/limit) и разбор выражений задач,
+    шрифты отчётов и снимок каталога задач. С preload_app в gunicorn вызывается в мастере
+    до fork, и воркеры получают всё это готовым (copy-on-write). Выражения задач
+    и планы проверки задач также передаются CAS-процессам, которые готовят их при своём старте.
+    """
+    global _warmup_seconds
+    started = time.perf_counter()
+    import checker
+    import reports
+    import tasks
+    from cas_pool import cas_pool
+
+    with app.app_context():
+        expressions = task_expressions()
+        plans = task_plans()
+        tasks.get_catalogue()
+    prepared = checker.warm_up(expressions, plans)
+    reports.load_fonts()
+    cas_pool.warm_expressions = tuple(expressions)
+    cas_pool.warm_plans = tuple(plans)
+
+    _warmup_seconds = time.perf_counter() - started
+    logging.info("Прогрев завершён за %.2f с (выражений задач: %s из %s)",
+                 _warmup_seconds, prepared, len(expressions))
+
+
+def after_fork(app=None):
+    """
+    Вызывается в воркере gunicorn сразу после fork: соединения БД, открытые мастером,
+    не переиспользуются, а CAS-пул запускается заранее, а не на первом запросе.
+    """
+    global _started_at, _first_request_seconds
+    _started_at = time.monotonic()
+    _first_request_seconds = None
+    if app is not None:
+        from models import db
+        with app.app_context():
+            db.engine.dispose(close=False)
+    from cas_pool import cas_pool
+    cas_pool.start()
+
+
+def _startup_stats():
+    stats = {}
+    if _warmup_seconds is not None:
+        stats["warmup"] = round(_warmup_seconds, 4)
+    if _first_request_seconds is not None:
+        stats["first_request"] = round(_first_request_seconds, 4)
+    return stats
+
+
+def init_app(app):
+    @app.after_request
+    def _record_first_request(response):
+        global _first_request_seconds
+        if _first_request_seconds is None:
+            _first_request_seconds = time.monotonic() - _started_at
+            logging.info("Первый запрос обработан через %.2f с после старта процесса", _first_request_seconds)
+        return response
+
+    metrics.registry.gauge_callback("math_checker_startup_seconds",
+                                    "Длительность прогрева и время от старта процесса до первого ответа",
+                                    _startup_stats)